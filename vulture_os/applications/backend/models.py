@@ -33,6 +33,7 @@ from djongo import models
 from services.haproxy.haproxy import hot_action_frontend, hot_action_backend, test_haproxy_conf, HAPROXY_OWNER, HAPROXY_PATH, HAPROXY_PERMS, TEST_CONF_PATH
 from toolkit.http.headers import Header
 from system.cluster.models import Cluster, NetworkAddress, Node
+from system.config.models import RenderedConf
 from system.pki.models import TLSProfile
 from toolkit.network.network import JAIL_ADDRESSES
 
@@ -145,10 +146,6 @@ class Backend(models.Model):
         help_text=_("HTTP request Timeout"),
         verbose_name=_("Timeout")
     )
-    """ Save of generated configuration """
-    configuration = models.TextField(
-        default="{}"
-    )
     """ Status of frontend for each nodes """
     status = models.DictField(
         default={}
@@ -511,6 +508,28 @@ class Backend(models.Model):
         """
         return "{}/backend_{}.sock".format(UNIX_SOCKET_PATH, self.id)
 
+    @property
+    def configuration(self):
+        """ Generated configuration, the same on all nodes
+         Stored as a RenderedConf object, loaded only when used """
+        if getattr(self, '_configuration', None) is None:
+            self._configuration = RenderedConf.get_confs(self).get("", "") if self.pk else ""
+        return self._configuration
+
+    @configuration.setter
+    def configuration(self, value):
+        self._configuration = value
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Save the configuration only if it has been loaded or modified
+        if getattr(self, '_configuration', None) is not None:
+            RenderedConf.set_confs(self, {"": self._configuration})
+
+    def delete(self, *args, **kwargs):
+        RenderedConf.delete_confs(self)
+        return super().delete(*args, **kwargs)
+
     def save_conf(self):
         """ Write configuration on disk
         """
@@ -37,7 +37,7 @@ from applications.logfwd.form import (LogOMFileForm, LogOMRELPForm, LogOMHIREDIS
 from applications.logfwd.models import LogOMFile, LogOMRELP, LogOMHIREDIS, LogOMFWD, LogOMElasticSearch, LogOMMongoDB
 from gui.forms.form_utils import DivErrorList
 from services.frontend.models import Frontend, Listener
-from system.cluster.models import Node
+from system.cluster.models import Node, PRIORITY_BACKGROUND
 from toolkit.api.responses import build_response
 
 # Required exceptions imports
@@ -159,7 +159,7 @@ def logfwd_edit(request, fw_type, object_id=None, api=False):
                 # If at least one frontend uses this log_forwarder
                 # Write logrotate config
                 if len(frontends) > 0:
-                    node.api_request("services.logrotate.logrotate.reload_conf")
+                    node.api_request("services.logrotate.logrotate.reload_conf", priority=PRIORITY_BACKGROUND)
             if api:
                 return build_response(log_om.id, "applications.logfwd.api", COMMAND_LIST)
             return HttpResponseRedirect('/apps/logfwd')
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.3 on 2026-10-18 14:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0010_auto_20200602_1549'),
+        ('system', '0014_renderedconf'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='backend',
+            name='configuration',
+        ),
+    ]
@@ -174,11 +174,13 @@ class ReputationContext(models.Model):
         """
         return [ReputationContext(**{k:v for k,v in dico.items() if k != "_id"}) for dico in cls.objects.mongo_find(*args, **kwargs)]
 
-    def delete(self, delete=True):
-        """ Delete file on disk on all nodes """
+    def delete(self, delete=True, priority=None):
+        """ Delete file on disk on all nodes
+        :param priority: Priority of the cluster message, see Cluster.api_request
+        """
         from system.cluster.models import Cluster
         if delete:
-            Cluster.api_request("system.config.models.delete_conf", self.absolute_filename)
+            Cluster.api_request("system.config.models.delete_conf", self.absolute_filename, priority=priority)
         super().delete()
 
     @staticmethod
@@ -348,6 +350,7 @@ class ReputationContext(models.Model):
         from services.frontend.models import Listener
         from system.cluster.models import Cluster, NetworkAddress, Node
         res = []
+        requests = []
         # Loop on Nodes
         for node in Node.objects.all():
             frontends = []
@@ -356,10 +359,12 @@ class ReputationContext(models.Model):
                                                     frontend__reputation_ctxs=self.id,
                                                     network_address__nic__node=node.id).distinct():
                 if listener.frontend.id not in frontends:
-                    api_res = node.api_request("services.rsyslogd.rsyslog.build_conf", listener.frontend.id)
-                    if not api_res:
-                        raise ServiceConfigError("on node '{}' \n API request error.".format(node.name), "rsyslog",
-                                                 traceback=api_res.get('message'))
+                    requests.append((node, "services.rsyslogd.rsyslog.build_conf", listener.frontend.id))
                     frontends.append(listener.frontend.id)
                     res.append(node)
+
+        api_res = Cluster.api_requests(requests)
+        if not api_res.get('status'):
+            raise ServiceConfigError("on nodes '{}' \n API request error.".format(
+                ", ".join(set(node.name for node in res))), "rsyslog", traceback=api_res.get('message'))
         return res
@@ -41,19 +41,68 @@ import logging
 logging.config.dictConfig(settings.LOG_SETTINGS)
 logger = logging.getLogger('daemon')
 
-from system.cluster.models import Cluster
+from system.cluster.models import Cluster, MESSAGE_QUEUE_CHANNEL
+from toolkit.redis.redis_base import RedisBase
 from services.pf.pf import PFService
+from daemons.dispatcher import MessageDispatcher
 from daemons.monitor import MonitorJob
 from daemons.reconcile import ReconcileJob
 from services.exceptions import ServiceExit
 from signal import signal, SIGTERM, SIGINT
 
 
+# Maximum time to wait for a notification before polling the MessageQueue
+POLL_INTERVAL = 5
+
+
 def service_shutdown(signum, frame):
     print('Caught signal %d' % signum)
     raise ServiceExit
 
 
+def subscribe_messages():
+    """ Subscribe to MessageQueue notifications on the local Redis
+     Notifications are published on the master and propagated to replicas
+    :return: A PubSub object, or None if Redis is not available
+    """
+    try:
+        redis = RedisBase()
+        listener = redis.redis.pubsub()
+        listener.subscribe([MESSAGE_QUEUE_CHANNEL])
+        logger.info("Cluster::daemon: Listening on {} channel".format(MESSAGE_QUEUE_CHANNEL))
+        return listener
+    except Exception as e:
+        logger.error("Cluster::daemon: Cannot subscribe to {} channel, "
+                     "falling back to polling: {}".format(MESSAGE_QUEUE_CHANNEL, str(e)))
+        return None
+
+
+def wait_messages(listener, node_name, timeout=POLL_INTERVAL):
+    """ Block until a notification for the given node is received, or until timeout expires
+    :param listener:  PubSub object returned by subscribe_messages, or None
+    :param node_name: Name of the current node
+    :param timeout:   Maximum time to wait, in seconds
+    :return: True if a notification has been received, False in case of timeout
+    :raise: Redis exceptions in case of connection failure
+    """
+    if not listener:
+        time.sleep(timeout)
+        return False
+
+    deadline = time.time() + timeout
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+
+        message = listener.get_message(ignore_subscribe_messages=True, timeout=remaining)
+        if message and message['data'].decode('utf-8') == node_name:
+            # Drain pending notifications, the whole queue will be processed at once
+            while listener.get_message(ignore_subscribe_messages=True):
+                pass
+            return True
+
+
 """ This is for the cluster daemon process """
 if __name__ == '__main__':
     daemon_context = daemon.DaemonContext(pidfile=lockfile.FileLock('/var/run/vulture/vultured.pid'),)
@@ -63,15 +112,20 @@ if __name__ == '__main__':
     monitor_job = MonitorJob(10)
     monitor_job.start()
 
-    """ Launch reconciliate job """
-    reconcile_job = ReconcileJob(10)
-    reconcile_job.start()
+    """ Launch reconciliate workers """
+    reconcile_jobs = [ReconcileJob(10, index) for index in range(settings.RECONCILE_WORKERS)]
+    for reconcile_job in reconcile_jobs:
+        reconcile_job.start()
+
+    """ Pool of workers executing inter-cluster messages """
+    dispatcher = MessageDispatcher()
 
     signal(SIGTERM, service_shutdown)
     signal(SIGINT, service_shutdown)
 
     error = False
     this_node = None
+    listener = None
 
     """ Continue as a daemon """
     while True:
@@ -81,7 +135,9 @@ if __name__ == '__main__':
 
                 # Process messages FIRST
                 """ Process inter-cluster messages """
-                this_node.process_messages()
+                pending = this_node.process_messages(dispatcher)
+                dispatcher.metrics.record_queue_depth(this_node.name, pending)
+                dispatcher.check_timeouts()
 
                 """ Synchronize Packet Filter configuration """
                 pf = PFService()
@@ -94,8 +150,21 @@ if __name__ == '__main__':
                     error = False
             else:
                 this_node = Cluster.get_current_node()
+                if this_node:
+                    # Process messages queued before the subscription right away
+                    continue
 
-            time.sleep(5)
+            if this_node and not listener:
+                listener = subscribe_messages()
+
+            try:
+                wait_messages(listener, this_node.name if this_node else None)
+            except ServiceExit:
+                raise
+            except Exception as e:
+                logger.error("Cluster::daemon: Lost notifications channel, "
+                             "falling back to polling: {}".format(str(e)))
+                listener = None
 
         except ServiceExit as e:
             """ Exiting asked """
@@ -115,14 +184,20 @@ if __name__ == '__main__':
             logger.info("Cluster::daemon: Trying to resume...")
             error = True
             this_node = None
+            listener = None
             continue
 
+    # Wait for running messages, pending ones will be processed at next start
+    dispatcher.shutdown()
+
     # Ask the jobs to terminate.
     monitor_job.ask_shutdown()
-    reconcile_job.ask_shutdown()
+    for reconcile_job in reconcile_jobs:
+        reconcile_job.ask_shutdown()
 
     # Wait for the threads to close...
     monitor_job.join()
-    reconcile_job.join()
+    for reconcile_job in reconcile_jobs:
+        reconcile_job.join()
 
     logger.info("Vultured stopped.")
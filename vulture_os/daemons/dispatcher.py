@@ -0,0 +1,158 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Worker pool executing cluster messages'
+
+
+# Django system imports
+from django.conf import settings
+from django.db import connection
+
+# Django project imports
+from system.cluster.metrics import MessageQueueMetrics
+from system.cluster.models import MessageQueue, PRIORITY_INTERACTIVE
+
+# Extern modules imports
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import RLock
+from time import time
+
+# Logger configuration imports
+import logging
+logging.config.dictConfig(settings.LOG_SETTINGS)
+logger = logging.getLogger('daemon')
+
+
+class MessageDispatcher:
+    """
+    Execute MessageQueue actions in a bounded pool of threads.
+    Each message is queued in the lane of its resource (see MessageQueue.resource):
+      lanes are executed in parallel, messages of the same lane are executed in order.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or settings.CLUSTER_WORKERS
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        # { resource: deque([(node, message, coalesced), ...]) }, the head of each lane is running
+        self.lanes = {}
+        # { message.pk: start time } of the running messages
+        self.running = {}
+        # Primary keys of the scheduled messages, including coalesced ones
+        self.scheduled = set()
+        # Primary keys of the messages reported as timed out
+        self.timed_out = set()
+        # Reentrant: a done callback is called by _submit if the future is already finished
+        self.lock = RLock()
+        self.metrics = MessageQueueMetrics()
+
+    def is_scheduled(self, message):
+        with self.lock:
+            return message.pk in self.scheduled
+
+    def schedule(self, node, message, coalesced):
+        """ Queue a message in the lane of its resource
+        :param node:      The Node executing the message
+        :param message:   The MessageQueue to execute
+        :param coalesced: Messages coalesced into this one
+        """
+        with self.lock:
+            self.scheduled.update(m.pk for m in [message] + coalesced)
+            lane = self.lanes.setdefault(message.resource, deque())
+            index = len(lane)
+            if message.priority >= PRIORITY_INTERACTIVE:
+                # Overtake the waiting background messages - the head of the lane is running
+                while index > 1 and lane[index - 1][1].overtakable_by(message):
+                    index -= 1
+            lane.insert(index, (node, message, coalesced))
+            # If the lane was idle, start it
+            if len(lane) == 1:
+                self._submit(message.resource)
+
+    def _submit(self, resource):
+        """ Submit the head of a lane to the pool - self.lock must be held """
+        node, message, coalesced = self.lanes[resource][0]
+        future = self.executor.submit(self._execute, node, message, coalesced)
+        future.add_done_callback(lambda f: self._done(resource))
+
+    def _execute(self, node, message, coalesced):
+        start = time()
+        with self.lock:
+            self.running[message.pk] = start
+        try:
+            node.execute_message(message, coalesced)
+            self.metrics.record_message(node.name, message.action,
+                                        wait=start - message.date_add.timestamp(),
+                                        duration=time() - start,
+                                        status=message.status)
+            if message.pk in self.timed_out:
+                logger.info("Dispatcher: Action {} finally ended with status '{}'".format(message.action,
+                                                                                        message.status))
+        except Exception as e:
+            logger.error("Dispatcher: Failed to execute action {}: {}".format(message.action, str(e)))
+            logger.exception(e)
+        finally:
+            # Connections are per thread, do not keep a broken one for the next message
+            connection.close_if_unusable_or_obsolete()
+
+    def _done(self, resource):
+        """ Remove the head of the lane, and start the next message of the lane if any """
+        with self.lock:
+            lane = self.lanes[resource]
+            node, message, coalesced = lane.popleft()
+            self.running.pop(message.pk, None)
+            self.timed_out.discard(message.pk)
+            self.scheduled.difference_update(m.pk for m in [message] + coalesced)
+            if lane:
+                self._submit(resource)
+            else:
+                del self.lanes[resource]
+
+    def check_timeouts(self):
+        """ Report as failed the messages running for longer than their timeout.
+        Threads cannot be killed, so the lane stays blocked until the action returns,
+          and the real result is saved at that time : the next messages of the lane may depend on it
+          (ex: write_conf then reload of the service), and the pool stays bounded
+        """
+        now = time()
+        expired = []
+        with self.lock:
+            for lane in self.lanes.values():
+                node, message, coalesced = lane[0]
+                start = self.running.get(message.pk)
+                if start and message.pk not in self.timed_out and now - start > message.timeout:
+                    self.timed_out.add(message.pk)
+                    expired.append(message)
+
+        for message in expired:
+            result = "Timeout: action still running after {} seconds".format(message.timeout)
+            logger.error("Dispatcher: {} - {}".format(message.action, result))
+            MessageQueue.objects.filter(pk=message.pk, status='running').update(status='failure', result=result)
+
+    def shutdown(self):
+        """ Drop messages waiting in lanes - they are still 'new' in database,
+         and wait for the running ones """
+        with self.lock:
+            for resource, lane in self.lanes.items():
+                while len(lane) > 1:
+                    lane.pop()
+        self.executor.shutdown(wait=True)
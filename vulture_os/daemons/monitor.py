@@ -25,18 +25,17 @@ __doc__ = 'Job for OS Monitoring'
 
 # Django system imports
 from django.conf import settings
-from django.utils import timezone
 from django.utils.timezone import make_aware
 
 # Django project imports
 from applications.backend.models import Backend
 from darwin.policy.models import FilterPolicy
-from gui.models.monitor import Monitor, ServiceStatus
+from gui.models.monitor import Monitor, MonitorHistory, MonitorSnapshot, ServiceStatus
 from services.service import Service
 from services.strongswan.strongswan import get_ipsec_tunnels_stats, StrongswanService
-from services.openvpn.openvpn import get_ssl_tunnels_stats, OpenvpnService
-from services.darwin.darwin import monitor_filters as monitor_darwin_filters
-from services.haproxy.haproxy import get_stats, HaproxyService
+from services.openvpn.openvpn import collect_stats as collect_ssl_tunnels_stats, OpenvpnService
+from services.darwin.darwin import collect_stats as collect_darwin_stats
+from services.haproxy.haproxy import collect_stats as collect_haproxy_stats, HaproxyService
 from services.strongswan.models import Strongswan
 from services.openvpn.models import Openvpn
 from services.pf.pf import PFService
@@ -46,15 +45,17 @@ from services.frontend.models import Frontend
 from system.cluster.models import Cluster
 
 from system.vm.vm import vm_update_status
+from toolkit.mongodb.status import StatusUpdater
 
 # Required exceptions imports
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from services.exceptions import ServiceError
-from django.core.exceptions import ObjectDoesNotExist
 
 # Extern modules imports
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from threading import Thread, Event
-from time import sleep
+from time import time
 
 # Logger configuration imports
 import logging
@@ -62,20 +63,42 @@ logging.config.dictConfig(settings.LOG_SETTINGS)
 logger = logging.getLogger('daemon')
 
 
-def monitor():
+def timed_collector(name, func, *args):
+    """ Execute a status collector and log its duration """
+    start = time()
+    try:
+        return func(*args)
+    finally:
+        logger.debug("Monitor: collector '{}' executed in {:.3f}s".format(name, time() - start))
+
+
+def run_collectors(executor, collectors, timeout=None):
+    """ Execute the status collectors concurrently
+    :param executor:   ThreadPoolExecutor used to execute the collectors
+    :param collectors: Dict {name: (function, args)}
+    :param timeout:    Seconds after which the result of a collector is not waited anymore
+    :return: Dict {name: result}, result is the exception if the collector failed or timed out
+    """
+    timeout = timeout or settings.MONITOR_COLLECTOR_TIMEOUT
+    deadline = time() + timeout
+    futures = {name: executor.submit(timed_collector, name, func, *args)
+               for name, (func, args) in collectors.items()}
+
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0, deadline - time()))
+        except FutureTimeoutError as e:
+            logger.error("Monitor: collector '{}' did not answer within {} seconds".format(name, timeout))
+            results[name] = e
+        except Exception as e:
+            results[name] = e
+    return results
 
-    node = Cluster.get_current_node()
 
-    def get_service_status(service_class):
-        """ Get a service_class (eg HaproxyService) 
-        :return  a dict {'name':service_name, 'status': status} """
-        service_inst = service_class()
-        service_status = ServiceStatus.objects.filter(name=service_inst.service_name).first() \
-                         or ServiceStatus(name=service_inst.service_name)
-        service_status.status = service_inst.status()[0]
-        service_status.friendly_name = service_inst.friendly_name
-        service_status.save()
-        return service_status
+def monitor(executor):
+
+    node = Cluster.get_current_node()
 
     """ Initialize date and Monitor object """
     date = datetime.now().strftime('%Y-%m-%d %H:%M:00')
@@ -86,44 +109,89 @@ def monitor():
     )
     mon.services_id = set()
 
-    for service in [HaproxyService, DarwinService, PFService, 
-                    StrongswanService, OpenvpnService, RsyslogService]:
-
-        # Get some statuses outside for reusing variable later
-        if service == StrongswanService:
-            strongswan_status = get_service_status(StrongswanService)
-        elif service == OpenvpnService:
-            openvpn_status = get_service_status(OpenvpnService)
-        elif service == RsyslogService:
-            rsyslogd_status = get_service_status(RsyslogService)
-
-        mon.services.add(get_service_status(service))
+    frontends = Frontend.objects.all().only('name', 'status', 'enabled', 'mode', 'listening_mode')
+    backends = Backend.objects.all().only('name', 'status', 'enabled')
+    strongswan = Strongswan.objects.filter(node=node).first()
+    openvpn = Openvpn.objects.filter(node=node).first()
+    filters = FilterPolicy.objects.all()
 
-    """ Get status of Redis, Mongod and Sshd """
-    # Instantiate mother class to get status easily
+    """ Status of services, and stats of HAProxy, Darwin, tunnels and VMs are retrieved concurrently """
+    services = [service_class() for service_class in (HaproxyService, DarwinService, PFService,
+                                                      StrongswanService, OpenvpnService, RsyslogService)]
+    # Instantiate mother class to get status of Redis, Mongod and Sshd easily
     service = Service()
+    collectors = {service_inst.service_name: (service_inst.status, ()) for service_inst in services}
     for service_name in ("redis", "mongod", "sshd"):
+        collectors[service_name] = (service.status, (service_name,))
+    if frontends.count() > 0 or backends.count() > 0:
+        collectors['haproxy_stats'] = (collect_haproxy_stats, (node.name,))
+    if strongswan:
+        collectors['ipsec_tunnels'] = (get_ipsec_tunnels_stats, ())
+    if openvpn:
+        collectors['ssl_tunnels'] = (collect_ssl_tunnels_stats, (node.name,))
+    if filters.count() > 0:
+        collectors['darwin_filters'] = (collect_darwin_stats, (node.name,))
+    collectors['vm'] = (vm_update_status, ())
+
+    results = run_collectors(executor, collectors)
+    # { service_name: status } saved in the history and in the snapshot
+    statuses = {}
+    friendly_names = {}
+
+    def get_service_status(service_name, friendly_name=None):
+        """ Build the ServiceStatus of a service from the result of its collector """
         service_status = ServiceStatus.objects.filter(name=service_name).first() \
                          or ServiceStatus(name=service_name)
-        service_status.status = service.status(service_name)[0]
+        result = results[service_name]
+        if isinstance(result, Exception):
+            logger.error("Failed to retrieve status of {}: {}".format(service_name, str(result)))
+            service_status.status = "ERROR"
+        else:
+            service_status.status = result[0]
+        if friendly_name:
+            service_status.friendly_name = friendly_name
+            service_status.save()
+        statuses[service_name] = service_status.status
+        friendly_names[service_name] = service_status.friendly_name
+        return service_status
+
+    for service_inst in services:
+        service_status = get_service_status(service_inst.service_name, service_inst.friendly_name)
+        # Keep some statuses for reusing variable later
+        if isinstance(service_inst, StrongswanService):
+            strongswan_status = service_status
+        elif isinstance(service_inst, OpenvpnService):
+            openvpn_status = service_status
+        elif isinstance(service_inst, RsyslogService):
+            rsyslogd_status = service_status
         mon.services.add(service_status)
 
+    """ Get status of Redis, Mongod and Sshd """
+    for service_name in ("redis", "mongod", "sshd"):
+        mon.services.add(get_service_status(service_name))
+
     mon.save()
 
-    """ HAPROXY """
-    frontends = Frontend.objects.all().only('name', 'status', 'enabled', 'mode', 'listening_mode')
-    backends = Backend.objects.all().only('name', 'status', 'enabled')
-    if frontends.count() > 0 or backends.count() > 0:
-        statuses = {}
-        try:
-            # Return a dict { frontend_name: frontend_status, backend_name: backend_status, ... }
-            statuses = get_stats()
+    # Old points and Monitor objects are expired by TTL indexes
+    MonitorHistory().record(node.name, statuses)
+    MonitorSnapshot().update(node.name, mon.date, [{'name': service_name,
+                                                    'friendly_name': friendly_names.get(service_name),
+                                                    'status': status}
+                                                   for service_name, status in statuses.items()])
 
-        except ServiceError as e:
-            logger.error(str(e))
-        except Exception as e:
-            logger.error("Failed to retrieve status of HAProxy: {}".format(str(e)))
-            logger.exception(e)
+    # Status of frontends, backends and filters are written with one bulk $set per collection
+    status_updater = StatusUpdater()
+
+    """ HAPROXY """
+    if 'haproxy_stats' in results:
+        # A dict { frontend_name: frontend_status, backend_name: backend_status, ... }
+        statuses = results['haproxy_stats']
+        if isinstance(statuses, ServiceError):
+            logger.error(str(statuses))
+            statuses = {}
+        elif isinstance(statuses, Exception):
+            logger.error("Failed to retrieve status of HAProxy: {}".format(str(statuses)))
+            statuses = {}
 
         """ FRONTENDS """
         for frontend in frontends:
@@ -136,38 +204,28 @@ def monitor():
                     status = statuses.get("FRONTEND", {}).get(frontend.name, "ERROR")
                 logger.debug("Status of frontend '{}': {}".format(frontend.name, status))
 
-                if status != frontend.status.get(node.name):
-                    frontend.status[node.name] = status
-                    frontend.save()
+                status_updater.set(frontend, node.name, status)
 
-            elif frontend.status.get(node.name):
-                frontend.status.pop(node.name, None)
-                frontend.save()
+            else:
+                status_updater.unset(frontend, node.name)
 
         """ BACKENDS """
         for backend in backends:
             status = "DISABLED" if not backend.enabled else statuses.get("BACKEND", {}).get(backend.name, "ERROR")
             logger.debug("Status of backend '{}': {}".format(backend.name, status))
-            if backend.status[node.name] != status:
-                backend.status[node.name] = status
-                backend.save()
+            status_updater.set(backend, node.name, status)
 
     """ STRONGSWAN """
-    try:
-        strongswan = Strongswan.objects.get(node=node)
-
-    except ObjectDoesNotExist:
-        # If there is no IPSEC conf on that node, pass
-        pass
-    else:
-        default = ("STOP", "")
+    # If there is no IPSEC conf on that node, pass
+    if strongswan:
+        default = {'state': "STOP", 'name': ""}
 
-        try:
-            statusall, tunnel_statuses, ups, connectings = get_ipsec_tunnels_stats()
-        except ServiceError as e:
-            logger.exception(e)
-            default = ("ERROR", str(e))
+        if isinstance(results['ipsec_tunnels'], Exception):
+            logger.error("Failed to retrieve IPSEC tunnels: {}".format(str(results['ipsec_tunnels'])))
+            default = {'state': "ERROR", 'name': str(results['ipsec_tunnels'])}
             statusall, tunnel_statuses, ups, connectings = "ERROR", {}, 0, 0
+        else:
+            statusall, tunnel_statuses, ups, connectings = results['ipsec_tunnels']
 
         for network in strongswan.ipsec_rightsubnet.split(','):
             strongswan.tunnels_status[network] = tunnel_statuses.get(network, default)
@@ -180,50 +238,44 @@ def monitor():
         strongswan.save()
 
     """ OPENVPN """
-    try:
-        openvpn = Openvpn.objects.get(node=node)
-    except ObjectDoesNotExist:
-        # If there is no VPNSSL conf on that node, pass
-        pass
-    else:
-
-        openvpn.tunnels_status = get_ssl_tunnels_stats()
+    # If there is no VPNSSL conf on that node, pass
+    if openvpn:
+        if isinstance(results['ssl_tunnels'], Exception):
+            logger.error("Failed to retrieve SSL tunnels: {}".format(str(results['ssl_tunnels'])))
+        else:
+            openvpn.tunnels_status = results['ssl_tunnels']
         openvpn.status = openvpn_status.status
         openvpn.save()
 
     """ DARWIN """
-    filters = FilterPolicy.objects.all()
-    if filters.count() > 0:
-        filter_statuses = {}
+    if 'darwin_filters' in results:
+        filter_statuses = results['darwin_filters']
         default = "DOWN"
-        try:
-            filter_statuses = monitor_darwin_filters()
-
-        except ServiceError as e:
-            logger.error(str(e))
+        if isinstance(filter_statuses, Exception):
+            logger.error(str(filter_statuses))
+            filter_statuses = {}
             default = "ERROR"
 
         for dfilter in filters:
-            dfilter.status[node.name] = default
+            status = default
 
             filter_status = filter_statuses.get(dfilter.name, False)
             if not dfilter.enabled:
-                dfilter.status[node.name] = "DISABLED"
+                status = "DISABLED"
             elif filter_status is None:
-                dfilter.status[node.name] = "ERROR"
+                status = "ERROR"
             elif filter_statuses.get(dfilter.name, {}).get('status') is not None:
-                dfilter.status[node.name] = filter_statuses.get(dfilter.name).get('status').upper()
-            dfilter.save()
-
+                status = filter_statuses.get(dfilter.name).get('status').upper()
+            logger.debug("Status of darwin filter '{}': {}".format(dfilter.name, status))
 
+            # Only write the status on change
+            status_updater.set(dfilter, node.name, status)
 
-    # Delete old monitoring
-    last_date = (timezone.now() - timedelta(days=30))
-    for m in Monitor.objects.filter(date__lte=last_date):
-        m.delete()
+    status_updater.flush()
 
-    #Update Bhyve status
-    vm_update_status()
+    # Bhyve status has been updated by the 'vm' collector
+    if isinstance(results['vm'], Exception):
+        logger.error("Failed to update status of VMs: {}".format(str(results['vm'])))
 
     return True
 
@@ -236,24 +288,27 @@ class MonitorJob(Thread):
         # indicates whether the thread should be terminated.
         self.shutdown_flag = Event()
         self.delay = delay
+        self.executor = ThreadPoolExecutor(max_workers=settings.MONITOR_WORKERS)
 
     def run(self):
         logger.info("Monitor job started.")
 
         # While we are not asked to terminate
         while not self.shutdown_flag.is_set():
+            start = time()
             try:
-                monitor()
+                monitor(self.executor)
             except Exception as e:
                 logger.error("Monitor job failure: {}".format(e))
                 logger.info("Resuming ...")
+            duration = time() - start
+            logger.debug("Monitor: pass executed in {:.3f}s".format(duration))
 
-            # Sleep DELAY time, 2 seconds at a time to prevent long sleep when shutdown_flag is set
-            cpt = 0
-            while not self.shutdown_flag.is_set() and cpt < self.delay:
-                sleep(2)
-                cpt += 2
+            # Keep the cadence : sleep the remaining DELAY time, or until shutdown_flag is set
+            self.shutdown_flag.wait(max(0, self.delay - duration))
 
+        # Do not wait for hung collectors
+        self.executor.shutdown(wait=False)
         logger.info("Monitor job stopped.")
 
     def ask_shutdown(self):
@@ -29,15 +29,17 @@ from django.conf import settings
 # Django project imports
 from darwin.log_viewer.const import LOGS_DATABASE as MONGO_DATABASE
 from system.cluster.models import Cluster
+from system.cluster.topology import topology
 from toolkit.mongodb.mongo_base import MongoBase
 from toolkit.redis.redis_base import RedisBase
 
 # Extern modules imports
 from copy import deepcopy
 from datetime import datetime
+from hashlib import sha1
 import json
-from threading import Thread, Event
-from time import sleep
+from threading import Thread, Event, Lock
+from time import sleep, time
 
 # Logger configuration imports
 import logging
@@ -48,121 +50,495 @@ logger = logging.getLogger('daemon')
 # Variables for logging
 MONGO_COLLECTION = "darwin_alerts"
 REDIS_LIST = "darwin_alerts"
-REDIS_CHANNEL = "darwin.alerts"
 REDIS_RECONCILIED_CHANNEL = "vlt.darwin.alerts"
 ALERTS_FILE = "/var/log/darwin/reconciled-alerts.log"
+# Alerts waiting for their context, scored by the timestamp of their next check
+REDIS_RETRY_SET = "darwin_alerts_retry"
+# Counters of the reconciliation (hash)
+REDIS_COUNTERS = "darwin_alerts_counters"
+# Alerts being handled by a worker, removed once written - see claim_alerts
+REDIS_PROCESSING = "darwin_alerts_processing:{}"
+REDIS_PROCESSING_RETRY = "darwin_alerts_processing:{}:retry"
+# Last report of each worker {worker_name: json} (hash), also used as heartbeat - see adopt_alerts
+REDIS_WORKERS = "darwin_alerts_workers"
+
+# Atomically move the due alerts of the retry sorted set to the processing list of a worker
+# KEYS[1]: retry sorted set, KEYS[2]: processing list, ARGV[1]: now, ARGV[2]: maximum number of alerts
+CLAIM_RETRIES_SCRIPT = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(members) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('LPUSH', KEYS[2], member)
+end
+return members
+"""
+
+# Atomically hand the alerts claimed by a stale worker over to another worker, and forget the stale worker
+# KEYS[1]: workers hash, KEYS[2]: processing list of the stale worker, KEYS[3]: its parked alerts list,
+# KEYS[4]: processing list of the adopting worker, KEYS[5]: retry sorted set
+# ARGV[1]: name of the stale worker, ARGV[2]: date of report under which a worker is stale, ARGV[3]: now
+# Return the number of alerts moved, -1 if the worker reported or was adopted in the meantime
+ADOPT_WORKER_SCRIPT = """
+local report = redis.call('HGET', KEYS[1], ARGV[1])
+if not report or cjson.decode(report)['date'] >= tonumber(ARGV[2]) then
+    return -1
+end
+local count = 0
+while redis.call('RPOPLPUSH', KEYS[2], KEYS[4]) do
+    count = count + 1
+end
+for _, member in ipairs(redis.call('LRANGE', KEYS[3], 0, -1)) do
+    redis.call('ZADD', KEYS[5], ARGV[3], member)
+end
+redis.call('DEL', KEYS[3])
+redis.call('HDEL', KEYS[1], ARGV[1])
+return count
+"""
 
 
-def alert_handler(alert, mongo, redis, filepath, max_tries=3, sec_between_retries=1):
+def claim_alerts(redis, processing, count, timeout):
+    """ Move up to count alerts from the tail of the alerts list to the processing list of a worker,
+     blocking until an alert is pushed or until timeout expires.
+    Alerts stay in the processing list until they are acknowledged by ack_alerts :
+     if the worker dies, they are handled again when it restarts (see recover_alerts),
+     or by another worker once it stops reporting (see adopt_alerts)
+    :param redis:      RedisBase of the Redis master
+    :param processing: Name of the processing list of the worker
+    :param count:      Maximum number of alerts to claim
+    :param timeout:    Seconds to wait for an alert
+    :return: List of raw alerts, oldest first (the order of RPOP)
+    """
+    first = redis.redis.brpoplpush(REDIS_LIST, processing, timeout=max(1, int(timeout)))
+    if first is None:
+        return []
+
+    others = min(count - 1, redis.redis.llen(REDIS_LIST))
+    if others <= 0:
+        return [first]
+    pipe = redis.redis.pipeline(transaction=False)
+    for _ in range(others):
+        pipe.rpoplpush(REDIS_LIST, processing)
+    return [first] + [alert for alert in pipe.execute() if alert is not None]
+
+
+def ack_alerts(redis, worker_name):
+    """ Forget the alerts claimed by a worker, once they are written or parked """
+    redis.redis.delete(REDIS_PROCESSING.format(worker_name), REDIS_PROCESSING_RETRY.format(worker_name))
+
+
+def recover_alerts(redis, worker_name):
+    """ Retrieve the alerts claimed by a previous run of a worker, and not acknowledged
+     The parked alerts are put back in the retry sorted set
+    :return: List of raw alerts, oldest first, to handle again
+    """
+    processing = REDIS_PROCESSING.format(worker_name)
+    processing_retry = REDIS_PROCESSING_RETRY.format(worker_name)
+
+    retries = redis.redis.lrange(processing_retry, 0, -1)
+    if retries:
+        logger.info("Reconcile: {} parked alert(s) of worker {} recovered".format(len(retries), worker_name))
+        pipe = redis.redis.pipeline(transaction=True)
+        pipe.zadd(REDIS_RETRY_SET, {member: time() for member in retries})
+        pipe.delete(processing_retry)
+        pipe.execute()
+
+    # Alerts are pushed on the left of the processing list
+    alerts = redis.redis.lrange(processing, 0, -1)[::-1]
+    if alerts:
+        logger.info("Reconcile: {} alert(s) of worker {} recovered".format(len(alerts), worker_name))
+    return alerts
+
+
+def adopt_alerts(redis, worker_name, timeout):
+    """ Move the alerts claimed by the workers which did not report for timeout seconds
+     to the processing list of worker_name, and their parked alerts back to the retry sorted set.
+    It covers the workers which will not restart : the node is not the MongoDB primary anymore,
+     or RECONCILE_WORKERS has been lowered
+    :return: Number of alerts moved to the processing list of worker_name, to handle with recover_alerts
+    """
+    now = time()
+    adopt = redis.redis.register_script(ADOPT_WORKER_SCRIPT)
+    moved = 0
+    for name, report in redis.redis.hgetall(REDIS_WORKERS).items():
+        name = name.decode()
+        if name == worker_name or json.loads(report)['date'] >= now - timeout:
+            continue
+        count = adopt(keys=[REDIS_WORKERS, REDIS_PROCESSING.format(name), REDIS_PROCESSING_RETRY.format(name),
+                            REDIS_PROCESSING.format(worker_name), REDIS_RETRY_SET],
+                      args=[name, now - timeout, now])
+        if count >= 0:
+            logger.info("Reconcile: worker {} stale, {} alert(s) adopted by worker {}".format(name, count,
+                                                                                          worker_name))
+            moved += count
+    return moved
+
+
+def alert_id(alert):
+    """ Identifier of a raw alert, used as _id of its MongoDB document :
+     an alert handled again after a crash is not inserted twice
+    """
+    return sha1(alert if isinstance(alert, bytes) else alert.encode()).hexdigest()
+
+
+def parse_alert(alert):
+    """ Decode a raw alert popped from Redis
+    :return: The alert as dict, None if it is invalid
+    """
     try:
-        alertData = json.loads(alert)
+        if isinstance(alert, bytes):
+            alert = alert.decode()
+        return json.loads(alert)
+    except UnicodeDecodeError:
+        logger.error("Reconcile: could not decode alert")
     except json.JSONDecodeError as e:
         logger.error("Reconcile: alert is not a valid JSON : {}".format(e))
-        return
+    return None
+
+
+def fetch_contexts(redis, evt_ids):
+    """ Retrieve the contexts of the given events with one MGET
+    :return: Dict {evt_id: raw context}, without the contexts which were not found
+    """
+    evt_ids = list(set(evt_ids))
+    if not evt_ids:
+        return {}
+    return {evt_id: context for evt_id, context in zip(evt_ids, redis.redis.mget(evt_ids)) if context is not None}
+
 
-    evt_id = alertData.get("evt_id")
+def reconcile_alert(alertData, context):
+    """ Merge the context of an alert
+    :param alertData: The alert, the context is added in its 'context' key
+    :param context:   The raw context of the event, or None
+    :return: The flattened alert, published and inserted in MongoDB
+    """
     flatAlertData = deepcopy(alertData)
-    context = None
-    if evt_id is not None:
-        retries = 0
-        while retries < max_tries and context is None:
-            context = redis.redis.get(evt_id)
-            retries += 1
-            if context is None:
-                logger.debug("Reconcile: context not found for id {}, "
-                "waiting {} second(s) for retry {}/{}".format(evt_id, sec_between_retries, retries, max_tries))
-                if retries < max_tries:
-                    sleep(sec_between_retries)
-            else:
-                try:
-                    context = json.loads(context.decode())
-                    context['evt_time'] = context.pop("time", "")
-                    flatAlertData.update(context)
-                    alertData['context'] = context
-                except json.JSONDecodeError as e:
-                    logger.error("Reconcile: context is not a valid JSON: {}".format(e))
-
-        if context is None:
-            logger.warning("Reconcile: could not find valid context for id {}".format(evt_id))
+    if context is not None:
+        try:
+            context = json.loads(context.decode())
+            context['evt_time'] = context.pop("time", "")
+            flatAlertData.update(context)
+            alertData['context'] = context
+        except json.JSONDecodeError as e:
+            logger.error("Reconcile: context is not a valid JSON: {}".format(e))
+    elif alertData.get("evt_id") is not None:
+        logger.warning("Reconcile: could not find valid context for id {}".format(alertData['evt_id']))
+    return flatAlertData
+
+
+class AlertsFile:
+    """
+    Reconciled alerts log file, shared by the workers of the process.
+    Lines are buffered in memory, and written with one write() per flush.
+    The file is re-opened at each flush, to follow its rotation.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        self.buffer = []
+        self.last_flush = time()
+
+    def write(self, data):
+        with self.lock:
+            self.buffer.append(data)
+
+    def flush(self, interval=0):
+        """ Write the buffered lines, if the last flush is older than interval seconds """
+        with self.lock:
+            if not self.buffer or time() - self.last_flush < interval:
+                return
+            data, self.buffer = "".join(self.buffer), []
+            self.last_flush = time()
+            try:
+                with open(self.path, "a") as log_file:
+                    log_file.write(data)
+            except Exception as e:
+                logger.error("Reconcile: could not write alerts to log file {} -> {}".format(self.path, e))
 
-    try:
-        with open(filepath, "a") as logFile:
-            logFile.write(json.dumps(alertData) + '\n')
-    except Exception as e:
-        logger.error("Reconcile: could not write alert {} to log file {} -> {}".format(evt_id, filepath, e))
 
-    redis.redis.publish(REDIS_RECONCILIED_CHANNEL, json.dumps(flatAlertData))
+alerts_file = AlertsFile(ALERTS_FILE)
 
-    time = flatAlertData.get('time', None)
-    if time:
-        time = datetime.strptime(time, "%Y-%m-%d%Z%H:%M:%S%z")
-        flatAlertData['time'] = time
-    else:
-        logger.warning("Reconcile: while treating alert, no 'time' field was found!")
 
-    # replace '.' by '_' in field names to avoid insertion errors
-    flatAlertData = dict((key.replace('.', '_'), value) for key, value in flatAlertData.items())
-    mongo.insert(MONGO_DATABASE, MONGO_COLLECTION, flatAlertData)
-    return True
+def write_alerts(alerts, mongo, redis, log_file, counters=None):
+    """ Write reconciled alerts in the log file, publish them in a pipeline and insert them with one insert_many
+    :param alerts:   List of (id, alert, raw context or None)
+    :param log_file: AlertsFile, or None
+    :param counters: Dict {counter: increment} added to REDIS_COUNTERS in the publish pipeline
+    :return: Number of written alerts, and duration of the MongoDB insertion in seconds
+    :raise: ConnectionError if the alerts could not be inserted : they must not be acknowledged
+    """
+    flatAlerts = [reconcile_alert(alertData, context) for _, alertData, context in alerts]
 
+    if log_file and alerts:
+        log_file.write("".join(json.dumps(alertData) + '\n' for _, alertData, _ in alerts))
 
-class ReconcileJob(Thread):
+    pipe = redis.redis.pipeline(transaction=False)
+    for flatAlertData in flatAlerts:
+        pipe.publish(REDIS_RECONCILIED_CHANNEL, json.dumps(flatAlertData))
+    for counter, value in (counters or {}).items():
+        if value:
+            pipe.hincrby(REDIS_COUNTERS, counter, value)
+    pipe.execute()
+
+    documents = []
+    for (doc_id, _, _), flatAlertData in zip(alerts, flatAlerts):
+        alert_time = flatAlertData.get('time', None)
+        if alert_time:
+            try:
+                flatAlertData['time'] = datetime.strptime(alert_time, "%Y-%m-%d%Z%H:%M:%S%z")
+            except ValueError as e:
+                logger.error("Reconcile: invalid 'time' field of alert: {}".format(e))
+        else:
+            logger.warning("Reconcile: while treating alert, no 'time' field was found!")
+
+        # replace '.' by '_' in field names to avoid insertion errors
+        document = dict((key.replace('.', '_'), value) for key, value in flatAlertData.items())
+        document['_id'] = doc_id
+        documents.append(document)
+
+    start = time()
+    if not mongo.insert_many(MONGO_DATABASE, MONGO_COLLECTION, documents):
+        raise ConnectionError("Failed to insert {} alert(s) in MongoDB".format(len(documents)))
+    return len(documents), time() - start
+
+
+def park_alerts(redis, alerts, retry_at, deadline):
+    """ Add alerts whose context is missing to the retry sorted set
+    :param alerts:   List of (id, alert)
+    :param retry_at: Timestamp of the next check of the contexts
+    :param deadline: Timestamp after which the alerts are written without context
+    """
+    if not alerts:
+        return
+    redis.redis.zadd(REDIS_RETRY_SET, {json.dumps({'id': doc_id, 'deadline': deadline, 'alert': alertData}):
+                                       min(retry_at, deadline) for doc_id, alertData in alerts})
+
+
+def alerts_handler(alerts, mongo, redis, log_file, context_timeout=0, retry_interval=1):
+    """ Reconcile a batch of alerts with their context and write them,
+     alerts whose context has not arrived yet are parked in the retry sorted set, without waiting
+    :param alerts:          Raw alerts, as popped from Redis
+    :param log_file:        AlertsFile, or None
+    :param context_timeout: Seconds during which a missing context is waited for, 0 to not wait
+    :param retry_interval:  Seconds between two checks of a missing context
+    :return: Number of written alerts, and duration of the MongoDB insertion in seconds
+    """
+    parsed = []
+    for alert in alerts:
+        alertData = parse_alert(alert)
+        if alertData is not None:
+            parsed.append((alert_id(alert), alertData))
+    counters = {'received': len(alerts), 'invalid': len(alerts) - len(parsed)}
+
+    contexts = fetch_contexts(redis, [alertData['evt_id'] for _, alertData in parsed
+                                      if alertData.get("evt_id") is not None])
+    ready, missing = [], []
+    for doc_id, alertData in parsed:
+        evt_id = alertData.get("evt_id")
+        if evt_id is None or evt_id in contexts or not context_timeout:
+            ready.append((doc_id, alertData, contexts.get(evt_id)))
+        else:
+            missing.append((doc_id, alertData))
+
+    if missing:
+        now = time()
+        logger.debug("Reconcile: {} context(s) not found, retry in {} second(s)".format(len(missing), retry_interval))
+        park_alerts(redis, missing, now + retry_interval, now + context_timeout)
+    counters['parked'] = len(missing)
+    counters['reconciled'] = sum(1 for _, _, context in ready if context is not None)
+    counters['without_context'] = len(ready) - counters['reconciled']
+    return write_alerts(ready, mongo, redis, log_file, counters)
+
+
+def retry_alerts(mongo, redis, log_file, count, retry_interval=1, worker_name=""):
+    """ Check again the contexts of the parked alerts which are due :
+     alerts whose context arrived, or whose deadline is over, are written, the others are parked again
+    :param count:       Maximum number of alerts to check
+    :param worker_name: The due alerts are moved to the processing list of this worker until they are written
+    :return: Number of written alerts, and duration of the MongoDB insertion in seconds
+    """
+    now = time()
+    claim = redis.redis.register_script(CLAIM_RETRIES_SCRIPT)
+    members = claim(keys=[REDIS_RETRY_SET, REDIS_PROCESSING_RETRY.format(worker_name)], args=[now, count])
+    if not members:
+        return 0, 0
+
+    entries = [json.loads(member) for member in members]
+    contexts = fetch_contexts(redis, [entry['alert']['evt_id'] for entry in entries])
+    ready, counters = [], {'retry_found': 0, 'retry_expired': 0, 'retry_again': 0}
+    for entry in entries:
+        context = contexts.get(entry['alert']['evt_id'])
+        if context is not None:
+            counters['retry_found'] += 1
+            ready.append((entry['id'], entry['alert'], context))
+        elif now >= entry['deadline']:
+            counters['retry_expired'] += 1
+            ready.append((entry['id'], entry['alert'], None))
+        else:
+            counters['retry_again'] += 1
+            redis.redis.zadd(REDIS_RETRY_SET, {json.dumps(entry): min(now + retry_interval, entry['deadline'])})
+
+    counters['reconciled'] = counters['retry_found']
+    counters['without_context'] = counters['retry_expired']
+    return write_alerts(ready, mongo, redis, log_file, counters)
+
+
+def get_alerts_stats(redis):
+    """ Sizes of the alerts queues, counters of the reconciliation and last report of each worker
+    :return: Dict {pending, waiting_context, counters: {received, invalid, parked, reconciled, without_context,
+                                                        retry_found, retry_expired, retry_again},
+                   workers: {worker_name: {alerts, rate, write_latency, throttled, date}}}
+    """
+    pipe = redis.redis.pipeline(transaction=False)
+    pipe.llen(REDIS_LIST)
+    pipe.zcard(REDIS_RETRY_SET)
+    pipe.hgetall(REDIS_COUNTERS)
+    pipe.hgetall(REDIS_WORKERS)
+    pending, waiting_context, counters, workers = pipe.execute()
+    return {
+        'pending': pending,
+        'waiting_context': waiting_context,
+        'counters': {key.decode(): int(value) for key, value in counters.items()},
+        'workers': {key.decode(): json.loads(value) for key, value in workers.items()}
+    }
 
-    def __init__(self, delay):
+
+class ReconcileJob(Thread):
+    """
+    Reconcile worker : several workers (RECONCILE_WORKERS per node) consume the alerts list concurrently.
+    Each worker moves the alerts it handles to its own processing list, and acknowledges them once written,
+     so that the alerts of a dead worker are handled again when it restarts, or by a live worker once the
+     dead one has not reported for RECONCILE_WORKER_TIMEOUT seconds.
+    When the insertion latency in MongoDB exceeds RECONCILE_MAX_WRITE_LATENCY,
+     the worker pauses between batches : alerts are kept in Redis instead of overloading MongoDB.
+    """
+
+    def __init__(self, delay, index=0):
         super().__init__()
         # The shutdown_flag is a threading.Event object that
         # indicates whether the thread should be terminated.
         self.shutdown_flag = Event()
         self.delay = delay
-
-    def pops(self, mongo, redis, filepath, max_tries=3, sec_between_retries=1):
-        redis_list_name = REDIS_LIST
-
-        logger.debug("Reconcile: starting to pop alerts")
-        alert = redis.redis.rpop(redis_list_name)
-        while (alert is not None) and (not self.shutdown_flag.is_set()):
-            try:
-                alert = alert.decode()
-            except (UnicodeDecodeError, AttributeError):
-                logger.error("Reconcile: could not decode alert")
-                pass
-            alert_handler(alert, mongo, redis, filepath, max_tries=max_tries, sec_between_retries=sec_between_retries)
-            alert = redis.redis.rpop(redis_list_name)
+        self.index = index
+        self.worker_name = None
+        self.batch_size = settings.RECONCILE_BATCH_SIZE
+        self.flush_interval = settings.RECONCILE_FLUSH_INTERVAL
+        self.context_timeout = settings.RECONCILE_CONTEXT_TIMEOUT
+        self.retry_interval = settings.RECONCILE_RETRY_INTERVAL
+        self.max_write_latency = settings.RECONCILE_MAX_WRITE_LATENCY
+        self.worker_timeout = settings.RECONCILE_WORKER_TIMEOUT
+        # Exponentially weighted average of the MongoDB insertion latency
+        self.write_latency = 0
+        self.throttled = False
+        self.written = 0
+        self.last_report = time()
+        self.last_adoption = 0
+
+    def handled(self, redis, count, latency):
+        """ Acknowledge the alerts of the last batch, and update the write latency """
+        ack_alerts(redis, self.worker_name)
+        if count:
+            self.written += count
+            self.write_latency = 0.8 * self.write_latency + 0.2 * latency
+        # Keep reporting while the alerts list is never empty
+        self.report(redis)
+
+    def backpressure(self):
+        """ Pause before the next batch while MongoDB is slow """
+        self.throttled = self.write_latency > self.max_write_latency
+        if self.throttled:
+            logger.warning("Reconcile: worker {} paused, MongoDB write latency is {:.3f}s".format(
+                self.worker_name, self.write_latency))
+            self.shutdown_flag.wait(min(self.write_latency, self.flush_interval))
+            # Let the average decrease, the next batch gives a new measure
+            self.write_latency *= 0.5
+
+    def report(self, redis, force=False):
+        """ Publish the throughput of the worker, every flush interval - it is the heartbeat of the worker """
+        now = time()
+        if not force and now - self.last_report < self.flush_interval:
+            return
+        redis.redis.hset(REDIS_WORKERS, self.worker_name, json.dumps({
+            'alerts': self.written,
+            'rate': self.written / max(now - self.last_report, 1e-3),
+            'write_latency': self.write_latency,
+            'throttled': self.throttled,
+            'date': now
+        }))
+        self.written = 0
+        self.last_report = now
+
+    def pops(self, mongo, redis, log_file, context_timeout=None, timeout=1):
+        """ Claim and reconcile alerts by batches, until the list is empty """
+        if context_timeout is None:
+            context_timeout = self.context_timeout
+        processing = REDIS_PROCESSING.format(self.worker_name)
+        while not self.shutdown_flag.is_set():
+            alerts = claim_alerts(redis, processing, self.batch_size, timeout)
+            if alerts:
+                self.handled(redis, *alerts_handler(alerts, mongo, redis, log_file, context_timeout=context_timeout,
+                                                    retry_interval=self.retry_interval))
+                self.backpressure()
+            if len(alerts) < self.batch_size:
+                break
+
+    def recover(self, mongo, redis, log_file):
+        """ Handle the alerts left in the processing lists of this worker """
+        # Do not retry, as there is likely no cache for remaining alerts in current Redis
+        recovered = recover_alerts(redis, self.worker_name)
+        if recovered:
+            self.handled(redis, *alerts_handler(recovered, mongo, redis, log_file, context_timeout=0))
+
+    def adopt(self, mongo, redis, log_file):
+        """ Handle the alerts claimed by stale workers, checked every flush interval """
+        now = time()
+        if now - self.last_adoption < self.flush_interval:
+            return
+        self.last_adoption = now
+        if adopt_alerts(redis, self.worker_name, self.worker_timeout):
+            self.recover(mongo, redis, log_file)
+
+    def retries(self, mongo, redis, log_file):
+        """ Handle the parked alerts which are due, by batches """
+        while not self.shutdown_flag.is_set():
+            count, latency = retry_alerts(mongo, redis, log_file, self.batch_size, retry_interval=self.retry_interval,
+                                          worker_name=self.worker_name)
+            self.handled(redis, count, latency)
+            if count < self.batch_size:
+                break
 
     def reconcile(self):
         node = Cluster.get_current_node()
-        if not node.is_master_mongo: 
+        if not settings.RECONCILE_ON_ALL_NODES and not node.is_master_mongo:
             return False
+        self.worker_name = "{}:{}".format(node.name, self.index)
 
         mongo = MongoBase()
         if not mongo.connect():
             return False
         mongo.connect_primary()
 
-        redis = RedisBase()
-        master_node = redis.get_master()
+        master_node = topology.redis_master(node.name)
         redis = RedisBase(node=master_node)
 
-        filepath = ALERTS_FILE
-
-        # Pops alerts produced when vulture was down
-        # Do not retry, as there is likely no cache for remaining alerts in current Redis
-        self.pops(mongo, redis, filepath, max_tries=1)
-        if self.shutdown_flag.is_set():
+        log_file = alerts_file
+        try:
+            # Report before recovering, so that no other worker adopts the alerts of this one meanwhile
+            self.report(redis, force=True)
+            # Alerts claimed by this worker before it stopped
+            self.recover(mongo, redis, log_file)
+
+            logger.info("Reconcile: worker {} started.".format(self.worker_name))
+            while not self.shutdown_flag.is_set():
+                # Block at most one retry interval, to check the parked alerts
+                self.pops(mongo, redis, log_file, timeout=min(self.flush_interval, self.retry_interval))
+                self.retries(mongo, redis, log_file)
+                self.adopt(mongo, redis, log_file)
+                log_file.flush(self.flush_interval)
+                self.report(redis)
             return True
-
-        redis_channel = REDIS_CHANNEL
-        listener = redis.redis.pubsub()
-        listener.subscribe([redis_channel])
-
-        logger.info("Reconcile: start listening {} channel.".format(redis_channel))
-        while not self.shutdown_flag.is_set():
-            alert = listener.get_message(ignore_subscribe_messages=True, timeout=2)
-            # If we have no messages, alert is None
-            if alert:
-                # Only use the channel to trigger popping alerts
-                self.pops(mongo, redis, filepath)
-        return True
+        finally:
+            log_file.flush()
 
     def run(self):
         logger.info("Reconcile job started.")
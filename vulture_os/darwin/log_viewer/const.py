@@ -435,7 +435,8 @@ MESSAGE_QUEUE_COLUMNS = {
     "action": "string",
     "config": "string",
     "modified": "datetime",
-    "internal": "boolean"
+    "internal": "boolean",
+    "priority": "integer"
 }
 
 DEFAULT_MESSAGE_QUEUE_COLUMNS = {
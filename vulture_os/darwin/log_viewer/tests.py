@@ -0,0 +1,129 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Tests of the pagination of the Log Viewer'
+
+
+# Django system imports
+from django.test import SimpleTestCase
+
+# Django project imports
+from darwin.log_viewer.toolkit import LogViewerMongo
+
+# Extern modules imports
+from datetime import datetime, timezone
+from unittest import mock
+
+
+class Cache:
+    """ In-memory replacement of the Django cache """
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.values[key] = value
+
+
+class MongoBase:
+    """ Serves the logs of a list, with the keyset condition and the skip of find_page """
+
+    def __init__(self, logs):
+        self.logs = logs
+        self.aggregations = 0
+
+    def execute_aggregation(self, database, collection, agg, allow_disk_use=False, max_time_ms=None):
+        # The aggregation of the timeline fails, as when it exceeds max_time_ms
+        self.aggregations += 1
+        return []
+
+    def find_page(self, database, collection, query, sort, limit=0, skip=0, max_time_ms=None):
+        logs = self.logs
+        # The search query is ignored, only the keyset condition of the page is applied
+        for condition in query.get('$and', [])[1:]:
+            bound = condition['time']
+            logs = [log for log in logs if log['time'] <= bound.get('$lte', log['time'])
+                    and log['time'] >= bound.get('$gte', log['time'])]
+        (field, direction), = sort
+        logs = sorted(logs, key=lambda log: log[field], reverse=direction == -1)
+        return [dict(log) for log in logs[skip:skip + limit if limit else None]]
+
+    def count(self, database, collection, query, limit=None, max_time_ms=None):
+        return len(self.logs)
+
+
+class PaginationTestCase(SimpleTestCase):
+
+    def setUp(self):
+        # HAProxy logs have a precision of one second
+        same_time = datetime(2026, 10, 18, 12, 0, 0, tzinfo=timezone.utc)
+        self.client = MongoBase([{'_id': index, 'time': same_time} for index in range(30)])
+        patcher = mock.patch('darwin.log_viewer.toolkit.cache', Cache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def log_viewer(self, start, length=10):
+        with mock.patch('darwin.log_viewer.toolkit.MongoBase', return_value=self.client):
+            return LogViewerMongo({
+                'type_logs': "access",
+                'rules': {},
+                'columns': ["time"],
+                'sorting': 0,
+                'type_sorting': "desc",
+                'startDate': "2026-10-18T00:00:00+0000",
+                'endDate': "2026-10-18T23:59:59+0000",
+                'start': start,
+                'length': length
+            })
+
+    def page(self, start, length=10):
+        """ Indexes of the logs of a page """
+        nb_res, data = self.log_viewer(start, length).search()
+        self.assertEqual(nb_res, 30)
+        return [int(log['_id']) for log in data]
+
+    def test_following_pages(self):
+        self.assertEqual(self.page(0), list(range(0, 10)))
+        self.assertEqual(self.page(10), list(range(10, 20)))
+        self.assertEqual(self.page(20), list(range(20, 30)))
+
+    def test_page_reached_by_skip(self):
+        self.assertEqual(self.page(10), list(range(10, 20)))
+        self.assertEqual(self.page(20), list(range(20, 30)))
+
+    def test_page_length_change(self):
+        self.assertEqual(self.page(0, 5), list(range(0, 5)))
+        self.assertEqual(self.page(5, 10), list(range(5, 15)))
+        self.assertEqual(self.page(15, 10), list(range(15, 25)))
+
+    def test_timeline_failure(self):
+        nb_res, data, graph_data, agg_by = self.log_viewer(0).search_with_timeline()
+
+        self.assertEqual(nb_res, 30)
+        self.assertEqual([int(log['_id']) for log in data], list(range(0, 10)))
+        self.assertEqual(graph_data, {})
+        # The timeline is not cached, the next page tries again
+        self.log_viewer(10).search_with_timeline()
+        self.assertEqual(self.client.aggregations, 2)
@@ -26,6 +26,7 @@ __doc__ = 'Log Viewer view'
 
 import datetime
 import errno
+import hashlib
 import ipaddress
 import json
 import logging
@@ -35,8 +36,10 @@ import requests
 import shodan
 import tldextract
 
+from bson import json_util
 from darwin.log_viewer import const
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import ugettext as _
 from requests.exceptions import ConnectionError
 from system.config.models import Config
@@ -140,19 +143,63 @@ class LogViewerMongo:
         logger.debug(query)
         return query
 
-    def search(self):
-        self.query = self._prepare_search()
-
-        nb_res, results = self.client.execute_request(
-            database=self.DATABASE,
-            collection=self.COLLECTION,
-            query=self.query,
-            start=self.start,
-            length=self.length,
-            sorting=self.sorting,
-            type_sorting=self.type_sorting
-        )
-
+    def _cache_key(self):
+        """ Key of the cached state (count and page cursors) of the current search """
+        signature = json_util.dumps([self.DATABASE, self.COLLECTION, self.query, self.sorting, self.type_sorting],
+                                    sort_keys=True)
+        return "logviewer_search_{}".format(hashlib.sha1(signature.encode('utf8')).hexdigest())
+
+    def _page_query(self, cursors):
+        """ Keyset condition and skip of the asked page
+        When the position of the last log of the previous page is known and the sort is on the time field,
+         the page starts from its time (keyset pagination) instead of skipping the previous logs.
+        The sort is on the time field only, so that it is done by the index of this field :
+         the logs of the previous pages having the same time are skipped
+        :param cursors: Dict {start: (time, ties)} of the last log before start, for the pages already served,
+                         ties being the number of logs served with this time
+        :return: Additional condition (or None), skip
+        """
+        self.cursor = cursors.get(self.start) if self.sorting == self.time_field else None
+        if not self.cursor:
+            return None, self.start or 0
+
+        operator = "$lte" if self.type_sorting == -1 else "$gte"
+        return {self.time_field: {operator: self.cursor[0]}}, self.cursor[1]
+
+    def _load_state(self):
+        """ Cached count, timeline and cursors of the pages of the current search """
+        self.cache_key = self._cache_key()
+        return cache.get(self.cache_key) or {'count': None, 'timeline': None, 'cursors': {}}
+
+    def _save_state(self, state, results):
+        """ Keep the count and the timeline, and the cursor of the page following results """
+        if self.length and len(results) == self.length and self.sorting == self.time_field \
+                and len(state['cursors']) < settings.LOGVIEWER_MAX_CURSORS:
+            last_time = results[-1].get(self.time_field)
+            if last_time is not None:
+                ties = 0
+                for res in reversed(results):
+                    if res.get(self.time_field) != last_time:
+                        break
+                    ties += 1
+                if ties == len(results) and self.start:
+                    # The whole page has the same time : the logs of the previous pages with this time
+                    #  are only known from the cursor of the page
+                    if self.cursor and self.cursor[0] == last_time:
+                        ties += self.cursor[1]
+                    else:
+                        ties = None
+                if ties is not None:
+                    state['cursors'][(self.start or 0) + len(results)] = (last_time, ties)
+
+        nb_res = state['count']
+        if nb_res is None:
+            # Count failed, let the next page be asked if this one is full
+            return (self.start or 0) + len(results) + int(bool(self.length) and len(results) == self.length)
+        cache.set(self.cache_key, state, settings.LOGVIEWER_CACHE_TTL)
+        return nb_res
+
+    def _format_results(self, results):
         data = []
         for i, res in enumerate(results):
             res['_id'] = str(res['_id'])
@@ -182,7 +229,78 @@ class LogViewerMongo:
 
             data.append(res)
 
-        return nb_res, data
+        return data
+
+    def _find_page(self, state):
+        """ Logs of the asked page, from the page cursors of the cached state when possible """
+        condition, skip = self._page_query(state['cursors'])
+        return self.client.find_page(
+            database=self.DATABASE,
+            collection=self.COLLECTION,
+            query={'$and': [self.query, condition]} if condition else self.query,
+            sort=[(self.sorting, self.type_sorting)],
+            limit=self.length or 0,
+            skip=skip,
+            max_time_ms=settings.LOGVIEWER_MAX_TIME_MS
+        )
+
+    def search(self):
+        self.query = self._prepare_search()
+
+        # The count and the cursors of the pages are computed once per search, and kept by the following pages
+        return self._search_without_timeline(self._load_state())
+
+    def _search_without_timeline(self, state):
+        """ Page of logs, and number of logs counted up to LOGVIEWER_COUNT_LIMIT
+        :return: nb_res, data
+        """
+        results = self._find_page(state)
+
+        if state['count'] is None:
+            state['count'] = self.client.count(self.DATABASE, self.COLLECTION, self.query,
+                                               limit=settings.LOGVIEWER_COUNT_LIMIT,
+                                               max_time_ms=settings.LOGVIEWER_MAX_TIME_MS)
+        nb_res = self._save_state(state, results)
+
+        return nb_res, self._format_results(results)
+
+    def search_with_timeline(self):
+        """ Page of logs, number of logs and timeline of the search
+        The timeline is computed by one aggregation on the first page of a search, and the number of logs is
+         its sum : both are kept in the cached state, the following pages only read their logs.
+        If the aggregation fails or times out, the page is served with the capped count of search()
+         and an empty timeline, and the aggregation is tried again by the next page
+        :return: nb_res, data, graph_data, agg_by
+        """
+        self.query = self._prepare_search()
+        state = self._load_state()
+        timeline_group, agg_by = self._timeline_group()
+
+        if state.get('timeline') is None:
+            result = list(self.client.execute_aggregation(
+                database=self.DATABASE,
+                collection=self.COLLECTION,
+                agg=[
+                    {'$match': self.query},
+                    # Only the time field is grouped, the logs are not fetched when the query is covered by its index
+                    {'$project': {'_id': 0, self.time_field: 1}},
+                    # $facet always returns one document : an empty search is told apart from a failure
+                    {'$facet': {'timeline': [timeline_group]}}
+                ],
+                allow_disk_use=True,
+                max_time_ms=settings.LOGVIEWER_MAX_TIME_MS
+            ))
+            if not result:
+                return self._search_without_timeline(state) + ({}, agg_by)
+
+            timeline = result[0]['timeline']
+            state['count'] = sum(tmp['count'] for tmp in timeline)
+            state['timeline'] = self._timeline_data(timeline, agg_by)
+
+        results = self._find_page(state)
+        nb_res = self._save_state(state, results)
+
+        return nb_res, self._format_results(results), state['timeline'], agg_by
 
     def graph(self):
         self.query = self._prepare_search()
@@ -223,7 +341,10 @@ class LogViewerMongo:
 
         return data
 
-    def timeline(self):
+    def _timeline_group(self):
+        """ $group stage of the timeline, by day, hour or minute depending on the time range
+        :return: The stage, and the unit of the timeline
+        """
         delta = self.endDate - self.startDate
         nb_min = delta.seconds / 60
         nb_hour = nb_min / 60
@@ -233,10 +354,6 @@ class LogViewerMongo:
         logger.debug("min: {}".format(nb_min))
         logger.debug("seconds: {}".format(delta.seconds))
 
-        match = {
-            "$match": self.query
-        }
-
         agg = {
             '$group': {
                 "_id": {
@@ -259,12 +376,10 @@ class LogViewerMongo:
                 agg['$group']['_id']['hour'] = {'$hour': '${}'.format(self.time_field)}
                 agg['$group']['_id']['minute'] = {'$minute': '${}'.format(self.time_field)}
 
-        tmp_data = self.client.execute_aggregation(
-            database=self.DATABASE,
-            collection=self.COLLECTION,
-            agg=[match, agg]
-        )
+        return agg, agg_by
 
+    def _timeline_data(self, tmp_data, agg_by):
+        """ Timeline of the search, with the empty periods """
         data = {}
         for tmp in tmp_data:
             tmp = dict(tmp)
@@ -297,7 +412,24 @@ class LogViewerMongo:
 
             data[date] = tmp['count']
 
-        return fill_data(self.startDate, self.endDate, data, agg_by), agg_by
+        return fill_data(self.startDate, self.endDate, data, agg_by)
+
+    def timeline(self):
+        agg, agg_by = self._timeline_group()
+
+        match = {
+            "$match": self.query
+        }
+
+        tmp_data = self.client.execute_aggregation(
+            database=self.DATABASE,
+            collection=self.COLLECTION,
+            agg=[match, agg],
+            allow_disk_use=True,
+            max_time_ms=settings.LOGVIEWER_MAX_TIME_MS
+        )
+
+        return self._timeline_data(tmp_data, agg_by), agg_by
 
 
 def fill_data(start_date, end_date, tmp_data, agg_by):
@@ -227,8 +227,7 @@ def get_logs(request):
         params['frontend'] = Frontend.objects.get(name=request.POST.get('frontend_name'))
 
     log_viewer_mongo = LogViewerMongo(params)
-    nb_res, results = log_viewer_mongo.search()
-    graph_data, agg_by = log_viewer_mongo.timeline()
+    nb_res, results, graph_data, agg_by = log_viewer_mongo.search_with_timeline()
 
     return JsonResponse({
         'status': True,
@@ -31,9 +31,9 @@ from django.forms import (CharField, CheckboxInput, ModelChoiceField, ModelForm,
 
 # Django project imports
 from applications.reputation_ctx.models import DATABASES_PATH, ReputationContext
-from darwin.policy.models import FilterPolicy, DarwinFilter, DarwinPolicy, DARWIN_LOGLEVEL_CHOICES, CONF_PATH
+from darwin.policy.models import (FilterPolicy, DarwinFilter, DarwinPolicy, DARWIN_LOGLEVEL_CHOICES, CONF_PATH,
+                                  DARWIN_REDIS_ALERT_CHANNEL)
 from daemons.reconcile import REDIS_LIST as DARWIN_REDIS_ALERT_LIST
-from daemons.reconcile import REDIS_CHANNEL as DARWIN_REDIS_ALERT_CHANNEL
 
 # Extern modules imports
 import os.path
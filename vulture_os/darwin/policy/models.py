@@ -30,7 +30,6 @@ from djongo import models
 
 # Django project imports
 from daemons.reconcile import REDIS_LIST as DARWIN_REDIS_ALERT_LIST
-from daemons.reconcile import REDIS_CHANNEL as DARWIN_REDIS_ALERT_CHANNEL
 
 
 JINJA_PATH = "/home/vlt-os/vulture_os/darwin/log_viewer/config/"
@@ -41,6 +40,8 @@ FILTERS_PATH = "/home/darwin/filters"
 CONF_PATH = "/home/darwin/conf/"
 TEMPLATE_OWNER = "darwin:vlt-web"
 TEMPLATE_PERMS = "644"
+# Channel on which the Darwin filters publish their alerts, besides the alerts list
+DARWIN_REDIS_ALERT_CHANNEL = "darwin.alerts"
 
 
 DARWIN_LOGLEVEL_CHOICES = (
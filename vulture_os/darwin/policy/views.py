@@ -192,9 +192,9 @@ def policy_edit(request, object_id=None):
             # If the object is new or has been modified
             if not object_id or need_reload:
                 Cluster.api_request("services.darwin.darwin.build_conf")
-                for frontend in policy.frontend_set.all():
-                    # regenerate rsyslog conf for each frontend associated with darwin policy
-                    Cluster.api_request('services.rsyslogd.rsyslog.build_conf', frontend.pk)
+                # regenerate rsyslog conf for each frontend associated with darwin policy
+                Cluster.api_requests([(None, 'services.rsyslogd.rsyslog.build_conf', frontend.pk)
+                                      for frontend in policy.frontend_set.all()])
 
             # If everything succeed, redirect to list view
             return HttpResponseRedirect('/darwin/policy/')
@@ -34,7 +34,7 @@ from django.conf import settings
 django.setup()
 from django.utils.crypto import get_random_string
 
-from system.cluster.models import Cluster
+from system.cluster.models import Cluster, PRIORITY_BACKGROUND
 from django.conf import settings
 from django.utils.timezone import make_aware, now as timezone_now
 from gui.models.rss import RSS
@@ -227,7 +227,7 @@ def security_update(node_logger=None, tenant_id=None):
             if "404" in str(e) or "403" in str(e) and reputation_ctx.internal:
                 logger.info("Security_update::info: Reputation context '{}' is now unavailable ({}). "
                             "Deleting it.".format(str(e), reputation_ctx))
-                reputation_ctx.delete()
+                reputation_ctx.delete(priority=PRIORITY_BACKGROUND)
             else:
                 logger.error("Security_update::error: Failed to download reputation database '{}' : {}"
                              .format(reputation_ctx.name, e))
@@ -24,9 +24,33 @@ __doc__ = 'Monitoring models'
 
 
 from django.contrib.humanize.templatetags.humanize import naturaltime
+from django.utils import timezone
 from system.cluster.models import Node
+from toolkit.mongodb.mongo_base import MongoBase
 from djongo import models
 
+from datetime import timedelta
+from pymongo import UpdateOne
+
+
+HISTORY_DATABASE = "vulture"
+# Raw points, one document per (node, monitor pass)
+HISTORY_RAW = ("gui_monitor_raw", 24 * 3600)
+# Rollups: (collection, size of a bucket in seconds, retention in seconds), one document per (node, service, bucket)
+HISTORY_ROLLUPS = (
+    ("gui_monitor_1m", 60, 30 * 24 * 3600),
+    ("gui_monitor_1h", 3600, 365 * 24 * 3600),
+)
+# Maximum range (in minutes) read from each tier, the 1 hour rollup is used beyond
+HISTORY_RAW_MAX_RANGE = 3 * 60
+HISTORY_1M_MAX_RANGE = 2 * 24 * 60
+# Maximum range (in minutes) of a history, the retention of the 1 hour rollup
+HISTORY_MAX_RANGE = 365 * 24 * 60
+# Monitor objects are kept 30 days, as before their expiration by TTL
+MONITOR_TTL = 30 * 24 * 3600
+# One document per node, with the statuses of its last monitor pass
+SNAPSHOT_COLLECTION = "gui_monitor_current"
+
 
 class ServiceStatus(models.Model):
     name = models.TextField()
@@ -60,3 +84,147 @@ class Monitor(models.Model):
             })
 
         return tmp
+
+
+class MonitorHistory:
+    """
+    Time-series of services statuses:
+      - raw points of each monitor pass, kept 24 hours
+      - 1 minute and 1 hour rollups, with the number of samples per status
+    Rollups are updated when a point is recorded, expiration is done by TTL indexes
+    """
+
+    def __init__(self, mongo=None):
+        self.mongo = mongo or MongoBase()
+
+    def ensure_indexes(self):
+        """ Create TTL indexes of history collections, and of Monitor objects
+         MUST be executed on a PRIMARY node """
+        self.mongo.set_index_ttl(HISTORY_DATABASE, HISTORY_RAW[0], "date", HISTORY_RAW[1])
+        for collection, bucket_size, retention in HISTORY_ROLLUPS:
+            self.mongo.set_index_ttl(HISTORY_DATABASE, collection, "bucket", retention)
+        self.mongo.set_index_ttl(HISTORY_DATABASE, Monitor._meta.db_table, "date", MONITOR_TTL)
+
+    def record(self, node_name, statuses, date=None):
+        """ Save the statuses of a monitor pass
+        :param node_name: Name of the monitored node
+        :param statuses:  Dict {service_name: status}
+        :param date:      Date of the pass, default now
+        """
+        date = date or timezone.now()
+        result = self.mongo.insert(HISTORY_DATABASE, HISTORY_RAW[0],
+                                   {'node': node_name, 'date': date, 'services': statuses})
+
+        for collection, bucket_size, retention in HISTORY_ROLLUPS:
+            bucket = date - timedelta(seconds=date.timestamp() % bucket_size)
+            result &= self.mongo.bulk_write(HISTORY_DATABASE, collection, [
+                UpdateOne({'node': node_name, 'service': service_name, 'bucket': bucket},
+                          {'$inc': {'samples': 1, 'counts.{}'.format(status): 1},
+                           '$set': {'last': status}},
+                          upsert=True)
+                for service_name, status in statuses.items()
+            ])
+        return result
+
+    @staticmethod
+    def get_tier(minutes):
+        """ Return the collection to read for the given range : the most precise one covering it """
+        if minutes <= HISTORY_RAW_MAX_RANGE:
+            return HISTORY_RAW[0]
+        elif minutes <= HISTORY_1M_MAX_RANGE:
+            return HISTORY_ROLLUPS[0][0]
+        return HISTORY_ROLLUPS[1][0]
+
+    def get_history(self, minutes=60, node_name=None, service_name=None):
+        """ Retrieve the statuses of the last minutes, from the tier matching the range
+        :return: {
+            'tier': collection read,
+            'data': {node_name: {service_name: [{date, status, counts}, ...]}}
+          } status is the last status of the bucket, counts the number of samples per status
+        """
+        tier = self.get_tier(minutes)
+        since = timezone.now() - timedelta(minutes=minutes)
+        data = {}
+
+        if tier == HISTORY_RAW[0]:
+            query = {'date': {'$gte': since}}
+            if node_name:
+                query['node'] = node_name
+            nb_res, res = self.mongo.execute_request(HISTORY_DATABASE, tier, query,
+                                                     start=0, length=0, sorting="date", type_sorting=1)
+            for point in res:
+                for service, status in point['services'].items():
+                    if service_name and service != service_name:
+                        continue
+                    data.setdefault(point['node'], {}).setdefault(service, []).append({
+                        'date': point['date'],
+                        'status': status,
+                        'counts': {status: 1}
+                    })
+        else:
+            query = {'bucket': {'$gte': since}}
+            if node_name:
+                query['node'] = node_name
+            if service_name:
+                query['service'] = service_name
+            nb_res, res = self.mongo.execute_request(HISTORY_DATABASE, tier, query,
+                                                     start=0, length=0, sorting="bucket", type_sorting=1)
+            for bucket in res:
+                data.setdefault(bucket['node'], {}).setdefault(bucket['service'], []).append({
+                    'date': bucket['bucket'],
+                    'status': bucket['last'],
+                    'counts': bucket['counts']
+                })
+
+        return {
+            'tier': tier,
+            'data': data
+        }
+
+
+class MonitorSnapshot:
+    """
+    Latest statuses of each node, upserted by the monitor after each pass,
+      and read in one query by the dashboard, the menu and the services_monitor API
+    """
+
+    def __init__(self, mongo=None):
+        self.mongo = mongo or MongoBase()
+
+    def update(self, node_name, date, services):
+        """ Replace the statuses of a node
+        :param node_name: Name of the monitored node
+        :param date:      Date of the monitor pass
+        :param services:  List of dicts {name, friendly_name, status}
+        """
+        return self.mongo.upsert_one(HISTORY_DATABASE, SNAPSHOT_COLLECTION, {'node': node_name},
+                                     {'$set': {'date': date, 'services': services}})
+
+    def get(self, node_name=None):
+        """ Retrieve the latest statuses of all nodes, or of the given one
+        :return: Dict {node_name: {date, date_human, services: [{name, friendly_name, status}, ...]}}
+        """
+        result = {}
+        for snapshot in self.mongo.find(HISTORY_DATABASE, SNAPSHOT_COLLECTION,
+                                        {'node': node_name} if node_name else {}):
+            date = snapshot['date']
+            if timezone.is_naive(date):
+                date = timezone.make_aware(date, timezone.utc)
+            result[snapshot['node']] = {
+                'date': date,
+                'date_human': naturaltime(date),
+                'services': snapshot['services']
+            }
+        return result
+
+    def get_statuses(self, node_name=None, max_age=60):
+        """ Statuses of the most recent snapshot, of all nodes or of the given one
+        :param max_age: Snapshots older than this number of seconds are ignored
+        :return: Dict {service_name: status}, empty if there is no recent snapshot
+        """
+        threshold = timezone.now() - timedelta(seconds=max_age)
+        recent = [snapshot for snapshot in self.get(node_name).values() if snapshot['date'] > threshold]
+        if not recent:
+            return {}
+        latest = max(recent, key=lambda snapshot: snapshot['date'])
+        return {service['name']: service['status'] for service in latest['services']}
@@ -52,4 +52,6 @@ urlpatterns = [
 
     re_path('^api/v1/services/monitor$', api_view.services_monitor, name="api.services_monitor"),
 
+    re_path('^api/v1/services/monitor/history$', api_view.services_history, name="api.services_history"),
+
 ]
@@ -26,7 +26,7 @@ __doc__ = 'Dashboard API'
 
 from django.views.decorators.csrf import csrf_exempt
 from gui.decorators.apicall import api_need_key
-from gui.models.monitor import Monitor
+from gui.models.monitor import HISTORY_MAX_RANGE, MonitorHistory, MonitorSnapshot
 from system.cluster.models import Node
 from django.http import JsonResponse
 from django.conf import settings
@@ -41,16 +41,15 @@ logger = logging.getLogger('api')
 @api_need_key('cluster_api_key')
 def services_monitor(request):
     try:
+        # Latest statuses of all nodes, in one query
+        snapshots = MonitorSnapshot().get()
         services = {}
 
-        for node in Node.objects.all():
-            tmp_mon = Monitor.objects.filter(
-                node=node).order_by("-date").first()
-
+        for node_name in Node.objects.values_list('name', flat=True):
             try:
-                services[node.name] = tmp_mon.to_template()['services']
-            except AttributeError:
-                services = [node.name] = False
+                services[node_name] = snapshots[node_name]['services']
+            except KeyError:
+                services[node_name] = False
 
         return JsonResponse({
             'data': services,
@@ -66,3 +65,36 @@ def services_monitor(request):
             'status': False
         })
 
+
+
+@csrf_exempt
+@api_need_key('cluster_api_key')
+def services_history(request):
+    """ History of services statuses, read from the tier matching the range
+    GET parameters: minutes (default 60), node (default all nodes), service (default all services)
+    """
+    try:
+        try:
+            minutes = min(max(int(request.GET.get('minutes', 60)), 1), HISTORY_MAX_RANGE)
+        except ValueError:
+            return JsonResponse({
+                'status': False,
+                'error': "Parameter 'minutes' must be an integer"
+            }, status=400)
+
+        history = MonitorHistory().get_history(minutes=minutes, node_name=request.GET.get('node'),
+                                               service_name=request.GET.get('service'))
+
+        return JsonResponse({
+            'data': history,
+            'status': True
+        })
+
+    except Exception as e:
+        if settings.DEV_MODE:
+            raise
+
+        logger.error(e, exc_info=1)
+        return JsonResponse({
+            'status': False
+        })
@@ -24,7 +24,8 @@ __email__ = ""
 __doc__ = 'Settings View of Vulture OS'
 
 from system.cluster.models import Node
-from gui.models.monitor import Monitor
+from system.cluster.metrics import MessageQueueMetrics
+from gui.models.monitor import HISTORY_MAX_RANGE, MonitorHistory, MonitorSnapshot
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.conf import settings
@@ -36,24 +37,36 @@ logger = logging.getLogger('debug')
 
 def dashboard_services(request):
     if request.is_ajax():
+        history = request.GET.get('history')
+        if history:
+            try:
+                history = min(max(int(history), 1), HISTORY_MAX_RANGE)
+            except ValueError:
+                return JsonResponse({
+                    'status': False,
+                    'error': "Parameter 'history' must be an integer"
+                }, status=400)
+
         try:
+            # Latest statuses of all nodes, in one query
+            snapshots = MonitorSnapshot().get()
             monitor = {}
-            for tmp_node in Node.objects.all():
-                tmp_mon = Monitor.objects.filter(
-                    node=tmp_node).order_by("-date").first()
-
-                try:
-                    monitor[tmp_node.name] = tmp_mon.to_template()
-                except AttributeError:
-                    monitor[tmp_node.name] = {
-                        'date': '',
-                        'services': []
-                    }
+            for node_name in Node.objects.values_list('name', flat=True):
+                monitor[node_name] = snapshots.get(node_name, {
+                    'date': '',
+                    'services': []
+                })
 
-            return JsonResponse({
+            response = {
                 'monitor': monitor,
+                'queue_metrics': MessageQueueMetrics().get_metrics(minutes=60),
                 'status': True
-            })
+            }
+            # History of statuses over the asked number of minutes, read from the matching tier
+            if history:
+                response['history'] = MonitorHistory().get_history(minutes=history)
+
+            return JsonResponse(response)
 
         except Exception as e:
             if settings.DEV_MODE:
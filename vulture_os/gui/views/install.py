@@ -28,7 +28,8 @@ from darwin.policy.models import DarwinPolicy, FilterPolicy
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.utils.crypto import get_random_string
-from system.cluster.models import Cluster, Node
+from system.cluster.metrics import ensure_indexes as ensure_metrics_indexes
+from system.cluster.models import Cluster, Node, PRIORITY_BACKGROUND
 from system.pki.models import X509Certificate, TLSProfile
 from system.users.models import User
 from toolkit.network.network import get_hostname, get_management_ip
@@ -137,6 +138,8 @@ def cluster_create(admin_user=None, admin_password=None):
     system_config.public_token = get_random_string(16, 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
     system_config.set_logs_ttl()
     system_config.save()
+    """ TTL indexes of the metrics and history collections """
+    ensure_metrics_indexes()
 
     for name in ('Administrator', 'Log Viewer'):
         Group.objects.get_or_create(
@@ -193,7 +196,7 @@ def cluster_create(admin_user=None, admin_password=None):
     node.api_request("services.apache.apache.reload_conf")
 
     logger.debug("API call to configure Logrotate")
-    node.api_request("services.logrotate.logrotate.reload_conf")
+    node.api_request("services.logrotate.logrotate.reload_conf", priority=PRIORITY_BACKGROUND)
 
 
 def cluster_join(master_hostname, master_ip, secret_key, ca_cert=None, cert=None, key=None):
@@ -371,6 +374,6 @@ def cluster_join(master_hostname, master_ip, secret_key, ca_cert=None, cert=None
     Cluster.api_request("services.rsyslogd.rsyslog.configure_node")
 
     logger.debug("API call to configure logrotate")
-    node.api_request("services.logrotate.logrotate.reload_conf")
+    node.api_request("services.logrotate.logrotate.reload_conf", priority=PRIORITY_BACKGROUND)
 
     return True
@@ -35,6 +35,8 @@ from authentication.learning_profiles.models import LearningProfile
 # Required exceptions imports
 from .exceptions                     import TokenNotFoundError, REDISWriteError
 from redis                          import Redis, ConnectionError as RedisConnectionError, ResponseError as RedisResponseError
+from redis.exceptions               import ReadOnlyError
+from toolkit.redis.redis_base       import get_pool
 
 # Extern modules imports
 from hashlib                        import sha1
@@ -60,10 +62,10 @@ class REDISSession(object):
 
 
     def write_in_redis(self, timeout):
-        if self.handler.hmset(self.key, self.keys):
-            return self.handler.expire(self.key, timeout)
-        else:
-            return False
+        """ Write the session and its timeout in one round-trip """
+        result = self.handler.pipeline(('hmset', self.key, self.keys),
+                                       ('expire', self.key, timeout))
+        return bool(result) and all(result)
 
 
 
@@ -129,9 +131,9 @@ class REDISAppSession(REDISSession):
 
     def deauthenticate(self):
         self.keys['authenticated'] = 0
-        self.handler.hset(self.key, 'authenticated', 0)
         self.keys.pop('otp_retries')
-        self.handler.hdel(self.key, 'otp_retries')
+        self.handler.pipeline(('hset', self.key, 'authenticated', 0),
+                              ('hdel', self.key, 'otp_retries'))
 
 
     def setHeader(self, headers):
@@ -359,9 +361,9 @@ class REDISPortalSession(REDISSession):
     def register_doubleauthentication(self, app_id, otp_backend_id):
         backend_id = self.keys['backend_'+app_id]
         self.keys[backend_id] = 1
-        self.handler.hset(self.key, backend_id, "1")
         self.keys['doubleauthenticated_{}'.format(str(otp_backend_id))] = "1"
-        self.handler.hset(self.key, 'doubleauthenticated_{}'.format(str(otp_backend_id)), "1")
+        self.handler.hmset(self.key, {backend_id: "1",
+                                      'doubleauthenticated_{}'.format(str(otp_backend_id)): "1"})
 
     def register_sso(self, timeout, backend_id, app_id, url, username, oauth2_token):
         self.keys[backend_id]         = 1
@@ -424,95 +426,82 @@ class REDISBase(object):
     port = settings.REDISPORT
     r = None
     logger = logging.getLogger('redis_events')
+    # (host, port) of the Redis master, (None, None) if it is the local server, None if not resolved yet.
+    # Shared by the instances of the process, resolved on the first write and after a master change
+    master_address = None
 
     def __init__(self):
         super(REDISBase, self).__init__()
 
-        try:
-            #self.r = Redis(host=self.ip, port=self.port, db=0)
-            self.r = Redis(unix_socket_path='/var/sockets/redis/redis.sock', db=0)
-            self.r.info()
-        except Exception as e:
-            self.logger.info("REDISBase: REDIS connexion issue")
-            self.logger.exception(e)
-            raise RedisConnectionError(e)
+        # Shared pool of the local unix socket : the connection is checked when used
+        self.r = Redis(connection_pool=get_pool())
 
-    # Write function : need master Redis
-    def delete(self, key):
-        result = None
-        # Get role of current cluster
-        cluster_info = self.r.info()
-        # If current cluster isn't master: get the master
-        if "master" not in cluster_info['role']:
-            # backup current cluster
-            r_backup = self.r
-            # And connect to master
+    def _master(self):
+        """ Return a client of the Redis master, from the shared connection pools.
+        The master is asked to the local Redis server once, not before each write
+        """
+        if REDISBase.master_address is None:
+            replication = self.r.info('replication')
+            if replication['role'] == "master":
+                REDISBase.master_address = (None, None)
+            else:
+                REDISBase.master_address = (replication['master_host'], replication['master_port'])
+        return Redis(connection_pool=get_pool(*REDISBase.master_address))
+
+    def _write(self, func):
+        """ Execute a write function on the Redis master.
+        If the known master is not the master anymore (READONLY error) or is unreachable,
+         the master is resolved again and the function is retried once on the new master
+        :param func: Function called with the Redis client of the master
+        :return: Result of the function, None in case of failure
+        """
+        for retry in (False, True):
             try:
-                self.r = Redis(host=cluster_info['master_host'], port=cluster_info['master_port'], db=0)
-                result = self.r.delete(key)
+                return func(self._master())
+            except (ReadOnlyError, RedisConnectionError) as e:
+                if retry:
+                    self.logger.info("REDISSession: Redis connexion issue")
+                    self.logger.exception(e)
+                    return None
+                self.logger.info("REDISSession: Redis master changed, retrying: {}".format(str(e)))
+                REDISBase.master_address = None
             except Exception as e:
                 self.logger.info("REDISSession: Redis connexion issue")
                 self.logger.exception(e)
-                result = None
-            # Finally restore the backuped cluster
-            self.r = r_backup
-        else:  # If current cluster is Master
-            result = self.r.delete(key)
-        return result
+                return None
 
+    # Write function : need master Redis
+    def pipeline(self, *commands):
+        """ Execute several write commands on the master in one transaction
+        :param commands: Tuples (command name, arg1, arg2, ...), ex: ('hset', hash, key, value)
+        :return: List of results, None in case of failure
+        """
+        def execute(r):
+            pipe = r.pipeline()
+            for command in commands:
+                getattr(pipe, command[0])(*command[1:])
+            return pipe.execute()
+        return self._write(execute)
 
     # Write function : need master Redis
-    def hdel(self, hash, key):
-        result = None
-        # Get role of current cluster
-        cluster_info = self.r.info()
-        # If current cluster isn't master: get the master
-        if "master" not in cluster_info['role']:
-            # backup current cluster
-            r_backup = self.r
-            # And connect to master
-            try:
-                self.r = Redis(host=cluster_info['master_host'], port=cluster_info['master_port'], db=0)
-                result = self.r.hdel(hash, key)
-            except Exception as e:
-                self.logger.info("REDISSession: Redis connexion issue")
-                self.logger.exception(e)
-                result = None
-            # Finally restore the backuped cluster
-            self.r = r_backup
-        else:  # If current cluster is Master
-            result = self.r.hdel(hash, key)
-        return result
+    def delete(self, key):
+        return self._write(lambda r: r.delete(key))
 
+    # Write function : need master Redis
+    def hdel(self, hash, key):
+        return self._write(lambda r: r.hdel(hash, key))
 
     # Write function : need master Redis
     def set(self, key, value):
-        result = None
-        # Get role of current cluster
-        cluster_info = self.r.info()
-        # If current cluster isn't master: get the master
-        if "master" not in cluster_info['role']:
-            # backup current cluster
-            r_backup = self.r
-            # And connect to master
-            try:
-                self.r = Redis(host=cluster_info['master_host'], port=cluster_info['master_port'], db=0)
-                result = self.r.set(key, value)
-            except Exception as e:
-                self.logger.info("REDISSession: Redis connexion issue")
-                self.logger.exception(e)
-                result = None
-            # Finally restore the backuped cluster
-            self.r = r_backup
-        else:  # If current cluster is Master
-            result = self.r.set(key, value)
-        return result
+        return self._write(lambda r: r.set(key, value))
 
 
     # Retrieve function : no need master
     def get(self, key):
         try:
             v = self.r.get(key)
+        except RedisConnectionError:
+            raise
         except RedisResponseError as e:
             return None
         except Exception as e:
@@ -524,6 +513,8 @@ class REDISBase(object):
     def hget(self, hash, key):
         try:
             v = self.r.hget(hash, key)
+        except RedisConnectionError:
+            raise
         except Exception as e:
             self.logger.exception(e)
             return None
@@ -532,80 +523,23 @@ class REDISBase(object):
 
     # Write function : need master Redis
     def expire(self, key, ttl):
-        result = None
-        # Get role of current cluster
-        cluster_info = self.r.info()
-        # If current cluster isn't master: get the master
-        if "master" not in cluster_info['role']:
-            # backup current cluster
-            r_backup = self.r
-            # And connect to master
-            try:
-                self.r = Redis(host=cluster_info['master_host'], port=cluster_info['master_port'], db=0)
-                result = self.r.expire(key, ttl)
-            except Exception as e:
-                self.logger.info("REDISSession: Redis connexion issue")
-                self.logger.exception(e)
-                result = None
-            # Finally restore the backuped cluster
-            self.r = r_backup
-        else:  # If current cluster is Master
-            result = self.r.expire(key, ttl)
-        return result
-
+        return self._write(lambda r: r.expire(key, ttl))
 
     # Write function : need master Redis
     def hset(self, hash, key, value):
-        result = None
-        # Get role of current cluster
-        cluster_info = self.r.info()
-        # If current cluster isn't master: get the master
-        if "master" not in cluster_info['role']:
-            # backup current cluster
-            r_backup = self.r
-            # And connect to master
-            try:
-                self.r = Redis(host=cluster_info['master_host'], port=cluster_info['master_port'], db=0)
-                result = self.r.hset(hash, key, value)
-            except Exception as e:
-                self.logger.info("REDISSession: Redis connexion issue")
-                self.logger.exception(e)
-                result = None
-            # Finally restore the backuped cluster
-            self.r = r_backup
-        else:  # If current cluster is Master
-            result = self.r.hset(hash, key, value)
-        return result
-
+        return self._write(lambda r: r.hset(hash, key, value))
 
     # Write function : need master Redis
     def hmset(self, hash, mapping):
-        result = None
-        # Get role of current cluster
-        cluster_info = self.r.info()
-        # If current cluster isn't master: get the master
-        if "master" not in cluster_info['role']:
-            # backup current cluster
-            r_backup = self.r
-            # And connect to master
-            try:
-                self.r = Redis(host=cluster_info['master_host'], port=cluster_info['master_port'], db=0)
-                result = self.r.hmset(hash, mapping)
-            except Exception as e:
-                self.logger.info("REDISSession: Redis connexion issue")
-                self.logger.exception(e)
-                result = None
-            # Finally restore the backuped cluster
-            self.r = r_backup
-        else:  # If current cluster is Master
-            result = self.r.hmset(hash, mapping)
-        return result
+        return self._write(lambda r: r.hmset(hash, mapping))
 
 
     # Retrieve function : no need master
     def hgetall(self, hash):
         try:
             v = self.r.hgetall(hash)
+        except RedisConnectionError:
+            raise
         except Exception as e:
             self.logger.exception(e)
             return None
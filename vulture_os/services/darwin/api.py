@@ -21,3 +21,51 @@ __version__ = "4.0.0"
 __maintainer__ = "Vulture OS"
 __email__ = "contact@vultureproject.org"
 __doc__ = 'Darwin daemon API'
+
+
+# Django system imports
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.translation import ugettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+# Django project imports
+from daemons.reconcile import get_alerts_stats
+from gui.decorators.apicall import api_need_key
+from system.cluster.topology import topology
+from toolkit.network.network import get_hostname
+from toolkit.redis.redis_base import RedisBase
+
+# Required exceptions imports
+
+# Extern modules imports
+
+# Logger configuration imports
+import logging
+logging.config.dictConfig(settings.LOG_SETTINGS)
+logger = logging.getLogger('api')
+
+
+@csrf_exempt
+@api_need_key('cluster_api_key')
+@require_http_methods(['GET'])
+def darwin_alerts_stats(request):
+    """ Sizes of the Darwin alerts queues, and counters of their reconciliation """
+    try:
+        redis = RedisBase(node=topology.redis_master(get_hostname()))
+
+        return JsonResponse({
+            'status': True,
+            'data': get_alerts_stats(redis)
+        })
+
+    except Exception as e:
+        logger.critical(e, exc_info=1)
+        if settings.DEV_MODE:
+            raise
+
+        return JsonResponse({
+            'status': False,
+            'data': _('An error has occurred')
+        }, status=500)
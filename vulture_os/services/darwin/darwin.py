@@ -29,6 +29,7 @@ from django.conf import settings
 from darwin.policy.models import FilterPolicy, DarwinPolicy, DarwinFilter
 from services.service import Service
 from services.darwin.models import DarwinSettings
+from services.darwin.stats import DarwinMetrics, DarwinSocket
 from system.config.models import write_conf, delete_conf as delete_conf_file
 
 # Required exceptions imports
@@ -36,13 +37,11 @@ from django.core.exceptions import ObjectDoesNotExist
 from json import JSONDecodeError, dumps as json_dumps
 from services.exceptions import ServiceStatusError, ServiceDarwinUpdateFilterError
 from system.exceptions import VultureSystemConfigError, VultureSystemError
-from subprocess import CalledProcessError
+from socket import timeout as SocketTimeout
 
 # Extern modules imports
-from json import loads as json_loads
 from os import walk as os_walk
 from re import compile as re_compile
-from subprocess import check_output, PIPE
 
 # Logger configuration imports
 import logging
@@ -55,6 +54,9 @@ DARWIN_PERMS = "640"
 DARWIN_OWNERS = "darwin:vlt-conf"
 MANAGEMENT_SOCKET = "/var/sockets/darwin/darwin.sock"
 
+# Connection to the manager socket kept open by the process
+manager_socket = DarwinSocket(MANAGEMENT_SOCKET)
+
 
 class DarwinService(Service):
     """ Darwin service class wrapper """
@@ -181,35 +183,27 @@ def update_filter(node_logger, filter_id):
         raise ServiceDarwinUpdateFilterError("FilterPolicy with id {} not found, ".format(filter_id), traceback=" ")
     try:
         """ Connect to Darwin manager and try to update filter """
-        cmd_res = check_output(["/usr/bin/nc", "-U", MANAGEMENT_SOCKET],
-                               stderr=PIPE,
-                               input="{{\"type\": \"update_filters\", " \
-                                     "\"filters\": [\"{}\"]}}\n".format(darwin_filter.name).encode('utf8')
-                               ).decode('utf8')
+        json_res = manager_socket.command({'type': "update_filters", 'filters': [darwin_filter.name]},
+                                          timeout=settings.DARWIN_UPDATE_FILTER_TIMEOUT)
         node_logger.info("Connection to darwin management socket succeed.")
-        """ Darwin manager always answer in JSON """
-        try:
-            json_res = json_loads(cmd_res)
-        except JSONDecodeError:
-            # Do NOT set traceback, it will be retrieved from JSON exception
-            raise ServiceDarwinUpdateFilterError("Darwin manager response is not a valid JSON : '{}'".format(cmd_res))
-
-        node_logger.info("Darwin manager response decoded : {}".format(json_res))
-        """ Retrieve status (and error) """
-        if json_res.get('status') == "KO":
-            raise ServiceDarwinUpdateFilterError("Darwin manager returned error: {}.".format(json_res.get('errors')))
-        elif json_res.get('status') != "OK":
-            raise ServiceDarwinUpdateFilterError("Darwin manager returned unknown response: {}.".format(json_res),
-                                                 traceback=json_res.get('errors'))
-        node_logger.info("Darwin filter '{}' hotly updated.".format(darwin_filter.name))
-        return "Darwin filter '{}' hotly updated.".format(darwin_filter.name)
-
-    except CalledProcessError as e:
-        """ Return code != 0 """
-        stdout = e.stdout.decode('utf8')
-        stderr = e.stderr.decode('utf8')
-        raise ServiceDarwinUpdateFilterError("Failed to connect to darwin management socket.",
-                                             traceback=(stderr or stdout))
+    except JSONDecodeError as e:
+        # Do NOT set traceback, it will be retrieved from JSON exception
+        raise ServiceDarwinUpdateFilterError("Darwin manager response is not a valid JSON : '{}'".format(e.doc))
+    except SocketTimeout:
+        raise ServiceDarwinUpdateFilterError("Darwin management socket did not answer within {} seconds.".format(
+            settings.DARWIN_UPDATE_FILTER_TIMEOUT), traceback=" ")
+    except OSError as e:
+        raise ServiceDarwinUpdateFilterError("Failed to connect to darwin management socket.", traceback=str(e))
+
+    node_logger.info("Darwin manager response decoded : {}".format(json_res))
+    """ Retrieve status (and error) """
+    if json_res.get('status') == "KO":
+        raise ServiceDarwinUpdateFilterError("Darwin manager returned error: {}.".format(json_res.get('errors')))
+    elif json_res.get('status') != "OK":
+        raise ServiceDarwinUpdateFilterError("Darwin manager returned unknown response: {}.".format(json_res),
+                                             traceback=json_res.get('errors'))
+    node_logger.info("Darwin filter '{}' hotly updated.".format(darwin_filter.name))
+    return "Darwin filter '{}' hotly updated.".format(darwin_filter.name)
 
 
 def monitor_filters():
@@ -218,25 +212,28 @@ def monitor_filters():
     """
     try:
         """ Connect to Darwin manager and try to monitor filters """
-        cmd_res = check_output(["/usr/bin/nc", "-U", MANAGEMENT_SOCKET],
-                               stderr=PIPE, input="{\"type\": \"monitor\"}\n".encode('utf8')).decode('utf8')
-        logger.debug("Connection to darwin management socket succeed.")
-        """ Darwin manager always answer in JSON """
-        try:
-            json_res = json_loads(cmd_res)
-        except JSONDecodeError:
-            # Do NOT set traceback, it will be retrieved from JSON exception
-            raise ServiceStatusError("Darwin manager response is not a valid JSON : '{}'".format(cmd_res), "darwin")
-
+        json_res = manager_socket.command({'type': "monitor"}, timeout=settings.SERVICE_STATUS_TIMEOUT)
         logger.debug("Darwin manager response decoded.")
         return json_res
 
-    except CalledProcessError as e:
-        """ Return code != 0 """
-        stdout = e.stdout.decode('utf8')
-        stderr = e.stderr.decode('utf8')
-        raise ServiceStatusError("Failed to connect to darwin management socket.",
-                                 "darwin", traceback=(stderr or stdout))
+    except JSONDecodeError as e:
+        # Do NOT set traceback, it will be retrieved from JSON exception
+        raise ServiceStatusError("Darwin manager response is not a valid JSON : '{}'".format(e.doc), "darwin")
+    except SocketTimeout:
+        raise ServiceStatusError("Darwin management socket did not answer within {} seconds.".format(
+            settings.SERVICE_STATUS_TIMEOUT), "darwin", traceback=" ")
+    except OSError as e:
+        raise ServiceStatusError("Failed to connect to darwin management socket.", "darwin", traceback=str(e))
+
+
+def collect_stats(node_name):
+    """ Ask monitor of the filters, and save their stats in the time-series
+    :param node_name: Name of the current node
+    :return     The json response of darwin, see monitor_filters
+    """
+    filters = monitor_filters()
+    DarwinMetrics().record(node_name, filters)
+    return filters
 
 
 def restart_service(node_logger):
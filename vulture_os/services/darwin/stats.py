@@ -0,0 +1,165 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Darwin manager socket client and filters stats time-series'
+
+
+# Django system imports
+from django.conf import settings
+
+# Django project imports
+from system.cluster.metrics import get_bucket, CounterMetrics
+
+# Required exceptions imports
+from json import JSONDecodeError
+
+# Extern modules imports
+from json import JSONDecoder, dumps as json_dumps
+from pymongo import UpdateOne
+from socket import socket, AF_UNIX, SOCK_STREAM
+from threading import Lock
+
+# Logger configuration imports
+import logging
+logging.config.dictConfig(settings.LOG_SETTINGS)
+logger = logging.getLogger('services')
+
+
+# Cumulative counters returned by Darwin for each filter, their rate per second is computed
+FILTER_COUNTERS = ("received", "entryErrors", "matches", "failures")
+
+STATS_DATABASE = "vulture"
+# One document per (node, filter, bucket)
+STATS_COLLECTION = "darwin_stats"
+
+
+def flatten_stats(stats, prefix=""):
+    """ Keep the numeric values of the monitor answer of a filter
+    :param stats: Dict, ex: {'status': "running", 'received': 10, 'proc_stats': {'cpu_percent': 0.5}}
+    :return: Dict, ex: {'received': 10, 'proc_stats_cpu_percent': 0.5}
+    """
+    result = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            result.update(flatten_stats(value, "{}{}_".format(prefix, key)))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            result["{}{}".format(prefix, key)] = value
+    return result
+
+
+class DarwinSocket:
+    """
+    Client of the Darwin manager socket.
+    The connection is kept open between commands, and re-opened if the manager closed it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+        self.lock = Lock()
+        self.decoder = JSONDecoder()
+
+    def _connect(self):
+        self.sock = socket(AF_UNIX, SOCK_STREAM)
+        self.sock.connect(self.path)
+
+    def _read(self):
+        """ Read data until a complete JSON document is received """
+        buffer = ""
+        while True:
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Connection closed by Darwin manager")
+            buffer += data.decode('utf8')
+            try:
+                return self.decoder.raw_decode(buffer.strip())[0]
+            except JSONDecodeError:
+                # Incomplete answer
+                if len(buffer) > 10 * 1024 * 1024:
+                    raise
+                continue
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+
+    def command(self, command, timeout=None):
+        """ Send a command to the Darwin manager
+        :param command: Dict of the command, ex: {'type': "monitor"}
+        :param timeout: Seconds to wait for the answer, None to wait indefinitely
+        :return: The decoded answer of the manager
+        Raise OSError (socket.timeout, ConnectionError...) if the manager cannot be reached,
+          JSONDecodeError if the answer is not a valid JSON
+        """
+        with self.lock:
+            for retry in (False, True):
+                try:
+                    if not self.sock:
+                        self._connect()
+                    self.sock.settimeout(timeout)
+                    self.sock.sendall("{}\n".format(json_dumps(command)).encode('utf8'))
+                    return self._read()
+                except ConnectionError:
+                    # The kept connection may have been closed by the manager : retry once with a new one
+                    self.close()
+                    if retry:
+                        raise
+                except Exception:
+                    # Do not read a late answer as the answer of the next command
+                    self.close()
+                    raise
+
+
+class DarwinMetrics(CounterMetrics):
+    """
+    Time-bucketed stats of Darwin filters, as returned by the "monitor" command of the manager.
+    Each bucket keeps the last value of each numeric field,
+      the throughput is computed from the difference of FILTER_COUNTERS between buckets.
+    """
+
+    DATABASE = STATS_DATABASE
+    COLLECTIONS = (STATS_COLLECTION,)
+    COUNTERS = FILTER_COUNTERS
+    FILTERS = ("filter",)
+
+    def record(self, node_name, filters):
+        """ Save the monitor answer of the manager in the current bucket
+        :param node_name: Name of the node of the Darwin manager
+        :param filters:   Answer of the manager {'filter_name': {'status': .., <stats>}, ...}
+        """
+        bucket = get_bucket()
+        requests = []
+        for filter_name, stats in filters.items():
+            if not isinstance(stats, dict):
+                continue
+            values = flatten_stats(stats)
+            values['status'] = stats.get('status')
+            requests.append(UpdateOne({'node': node_name, 'filter': filter_name, 'bucket': bucket},
+                                      {'$set': values}, upsert=True))
+        return self.mongo.bulk_write(STATS_DATABASE, STATS_COLLECTION, requests)
+
+    def series(self, doc):
+        return doc['filter']
@@ -23,8 +23,12 @@ __email__ = "contact@vultureproject.org"
 __doc__ = 'Darwin daemon dedicated urls entries'
 
 # Django system imports
+from django.urls import path
 
 # Django project imports
+from services.darwin import api
+from services.darwin.stats import DarwinMetrics
+from system.cluster.api import metrics_api
 
 # Required exceptions imports
 
@@ -34,5 +38,7 @@ __doc__ = 'Darwin daemon dedicated urls entries'
 
 
 urlpatterns = [
-
+    path('api/v1/services/darwin/metrics/', metrics_api, {'metrics_class': DarwinMetrics},
+         name="services.darwin.metrics"),
+    path('api/v1/services/darwin/alerts/', api.darwin_alerts_stats, name="services.darwin.alerts"),
 ]
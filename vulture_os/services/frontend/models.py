@@ -37,6 +37,7 @@ from applications.logfwd.models import LogOM, LogOMMongoDB
 from applications.reputation_ctx.models import ReputationContext, DATABASES_PATH
 from darwin.policy.models import DarwinPolicy, FilterPolicy
 from services.haproxy.haproxy import test_haproxy_conf, HAPROXY_OWNER, HAPROXY_PATH, HAPROXY_PERMS
+from system.config.models import RenderedConf
 from system.error_templates.models import ErrorTemplate
 from system.cluster.models import Cluster, NetworkAddress, NetworkInterfaceCard, Node
 from applications.backend.models import Backend
@@ -277,10 +278,6 @@ class Frontend(models.Model):
         help_text=_("Conditional configuration of log forwarders")
     )
 
-    """ Generated configuration depending on Node listening on """
-    configuration = models.DictField(
-        default={}
-    )
     """ Type of template used by rsyslog to parse/forward logs """
     ruleset = models.TextField(
         default="haproxy",
@@ -1038,10 +1035,32 @@ class Frontend(models.Model):
         """
         return "ruleset_{}".format(self.name)
 
+    @property
+    def configuration(self):
+        """ Generated configuration depending on Node listening on, as dict {node_name: conf}
+         Stored as RenderedConf objects, loaded only when used """
+        if getattr(self, '_configuration', None) is None:
+            self._configuration = RenderedConf.get_confs(self) if self.pk else {}
+        return self._configuration
+
+    @configuration.setter
+    def configuration(self, value):
+        self._configuration = value
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Save the configuration only if it has been loaded or modified
+        if getattr(self, '_configuration', None) is not None:
+            RenderedConf.set_confs(self, self._configuration)
+
+    def delete(self, *args, **kwargs):
+        RenderedConf.delete_confs(self)
+        return super().delete(*args, **kwargs)
+
     def save_conf(self, node):
         """ Write configuration on disk
         """
-        if not self.configuration[node.name]:
+        if not self.configuration.get(node.name):
             return
         params = [self.get_filename(), self.configuration[node.name], FRONTEND_OWNER, FRONTEND_PERMS]
 
@@ -35,7 +35,7 @@ from applications.logfwd.models import LogOM
 from gui.forms.form_utils import DivErrorList
 from services.frontend.form import FrontendForm, ListenerForm, LogOMTableForm, FrontendReputationContextForm
 from services.frontend.models import Frontend, FrontendReputationContext, Listener
-from system.cluster.models import Cluster, Node
+from system.cluster.models import Cluster, Node, PRIORITY_BACKGROUND
 from toolkit.api.responses import build_response, build_form_errors
 from toolkit.http.headers import HeaderForm, DEFAULT_FRONTEND_HEADERS
 from toolkit.api_parser.utils import get_api_parser
@@ -511,7 +511,7 @@ def frontend_edit(request, object_id=None, api=False):
             if frontend.enable_logging and (frontend.log_forwarders.filter(logomfile__enabled=True).count() > 0 or
                                             frontend.log_forwarders_parse_failure.filter(logomfile__enabled=True).count()):
                 # Reload LogRotate config
-                Cluster.api_request("services.logrotate.logrotate.reload_conf")
+                Cluster.api_request("services.logrotate.logrotate.reload_conf", priority=PRIORITY_BACKGROUND)
 
         except (VultureSystemError, ServiceError) as e:
             """ Error saving configuration file """
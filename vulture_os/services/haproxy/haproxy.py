@@ -29,6 +29,7 @@ from django.core.exceptions import ObjectDoesNotExist
 
 # Django project imports
 from services.haproxy.models import HAProxySettings
+from services.haproxy.stats import HAProxyMetrics, HAProxySocket
 from services.service import Service
 
 # Local imports
@@ -36,7 +37,7 @@ from system.cluster.models import Cluster
 from system.config.models import write_conf
 from system.exceptions import VultureSystemError
 # Required exceptions imports
-from services.exceptions import ServiceError, ServiceStatusError, ServiceTestConfigError
+from services.exceptions import ServiceError, ServiceTestConfigError
 from subprocess import CalledProcessError
 
 # Extern modules imports
@@ -58,6 +59,9 @@ MANAGEMENT_SOCKET = "/var/sockets/haproxy/haproxy.sock"
 JINJA_PATH = "/home/vlt-os/vulture_os/services/haproxy/config/"
 JINJA_TEMPLATE = "spoe_session.txt"
 
+# Connection to the admin socket kept open by the process
+stats_socket = HAProxySocket(MANAGEMENT_SOCKET)
+
 
 class HaproxyService(Service):
     """ HAProxy service class wrapper """
@@ -139,40 +143,28 @@ def test_haproxy_conf(filename, conf, disabled=False):
         raise ServiceTestConfigError("Invalid configuration.", "haproxy", traceback=(stderr + "\n" + stdout))
 
 
-def get_stats():
-    """ Connect to HAProxy admin socket, and retrieve stats of frontends
+def get_statuses(stats):
+    """ Extract the status of frontends and backends from the result of "show stat"
 
-    :return Status of frontends as dict {frontend_name: frontend_status, ...}
+    :return Status of frontends and backends as dict {"FRONTEND": {name: status}, "BACKEND": {name: status}}
     """
-    try:
-        cmd_res = check_output(["/usr/bin/nc", "-U", MANAGEMENT_SOCKET],
-                               stderr=PIPE, input="show stat\n".encode('utf-8')).decode('utf8')
-
-        statuses = {"FRONTEND": {}, "BACKEND": {}}
-        """ cmd_res will be the form : <frontend_name> <status> """
-        """ One frontend per line """
-        for line in cmd_res.split("\n"):
-            if not line:
-                continue
-            try:
-                states = line.split(",")
-                kind = states[1]
-                if kind in ["FRONTEND", "BACKEND"]:
-                    name = states[0]
-                    status = states[17]
-                    statuses[kind][name] = status
-                    logger.debug("Status of HAProxy {} '{}' : {}".format(kind, name, status))
-            except Exception as e:
-                logger.error("Cannot retrieve status from '{}' line: {}".format(line, str(e)))
-                continue
-
-        return statuses
+    statuses = {"FRONTEND": {}, "BACKEND": {}}
+    for stat in stats:
+        if stat['type'] in statuses:
+            statuses[stat['type']][stat['pxname']] = stat['status']
+            logger.debug("Status of HAProxy {} '{}' : {}".format(stat['type'], stat['pxname'], stat['status']))
+    return statuses
 
-    except CalledProcessError as e:
-        """ Return code != 0 """
-        stdout = e.stdout.decode('utf8')
-        stderr = e.stderr.decode('utf8')
-        raise ServiceStatusError("Failed to connect to haproxy admin socket.", "haproxy", traceback=(stderr or stdout))
+
+def collect_stats(node_name):
+    """ Retrieve stats of frontends, backends and servers, and save their counters in the time-series
+
+    :param node_name: Name of the current node
+    :return Status of frontends and backends, see get_statuses
+    """
+    stats = stats_socket.show_stat()
+    HAProxyMetrics().record(node_name, stats, stats_socket.show_info())
+    return get_statuses(stats)
 
 
 # TODO : Merge this function with hot_action_frontend !
@@ -309,7 +301,7 @@ def build_conf(node_logger, frontend_id):
         frontend = models.Frontend.objects.get(pk=frontend_id)
         """ Generate ruleset conf of asked frontend """
         tmp = frontend.generate_conf()
-        if frontend.configuration[node.name] != tmp:
+        if frontend.configuration.get(node.name) != tmp:
             frontend.configuration[node.name] = tmp
             reload = True
         """ And write-it """
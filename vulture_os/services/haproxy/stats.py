@@ -0,0 +1,234 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'HAProxy admin socket client and stats time-series'
+
+
+# Django system imports
+from django.conf import settings
+
+# Django project imports
+from system.cluster.metrics import get_bucket, CounterMetrics
+
+# Required exceptions imports
+from services.exceptions import ServiceStatusError
+
+# Extern modules imports
+from csv import reader as csv_reader
+from pymongo import UpdateOne
+from socket import socket, timeout as SocketTimeout, AF_UNIX, SOCK_STREAM
+from threading import Lock
+
+# Logger configuration imports
+import logging
+logging.config.dictConfig(settings.LOG_SETTINGS)
+logger = logging.getLogger('services')
+
+
+# Answers of the admin socket end with this prompt in interactive mode
+PROMPT = b"\n> "
+
+# Values of the "type" column of "show stat"
+STAT_TYPES = {0: "FRONTEND", 1: "BACKEND", 2: "SERVER", 3: "LISTENER"}
+
+# Columns of "show stat" kept in the time-series, all integers
+STAT_GAUGES = ("scur", "qcur", "rate", "req_rate", "qtime", "ctime", "rtime", "ttime")
+STAT_COUNTERS = ("stot", "bin", "bout", "dreq", "dresp", "ereq", "econ", "eresp", "wretr", "wredis",
+                 "hrsp_1xx", "hrsp_2xx", "hrsp_3xx", "hrsp_4xx", "hrsp_5xx", "hrsp_other", "req_tot")
+
+# Fields of "show info" kept in the time-series, all integers
+INFO_FIELDS = ("Uptime_sec", "CurrConns", "CumConns", "ConnRate", "SessRate", "SslRate",
+               "Tasks", "Run_queue", "Idle_pct")
+
+STATS_DATABASE = "vulture"
+# One document per (node, proxy, service, bucket)
+STATS_COLLECTION = "haproxy_stats"
+# One document per (node, bucket)
+INFO_COLLECTION = "haproxy_info"
+
+
+def to_int(value):
+    """ Typed conversion of a CSV value : empty values are None """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_stat(output):
+    """ Parse the CSV output of "show stat"
+    :param output: Output of the command, the first line is the header "# pxname,svname,..."
+    :return: List of dicts {pxname, svname, type, status, <gauges>, <counters>}
+    """
+    lines = [line for line in output.split("\n") if line]
+    if not lines or not lines[0].startswith("#"):
+        raise ServiceStatusError("Invalid answer of HAProxy admin socket to 'show stat'", "haproxy",
+                                 traceback=output)
+
+    header = lines[0].lstrip("# ").split(",")
+    result = []
+    for row in csv_reader(lines[1:]):
+        values = dict(zip(header, row))
+        stat = {
+            'pxname': values.get('pxname'),
+            'svname': values.get('svname'),
+            'type': STAT_TYPES.get(to_int(values.get('type')), "UNKNOWN"),
+            'status': values.get('status')
+        }
+        for field in STAT_GAUGES + STAT_COUNTERS:
+            stat[field] = to_int(values.get(field))
+        result.append(stat)
+    return result
+
+
+def parse_info(output):
+    """ Parse the "Name: value" lines of "show info"
+    :return: Dict {name: value} of INFO_FIELDS
+    """
+    info = {}
+    for line in output.split("\n"):
+        name, _, value = line.partition(":")
+        if name in INFO_FIELDS:
+            info[name] = to_int(value.strip())
+    return info
+
+
+class HAProxySocket:
+    """
+    Client of the HAProxy admin socket.
+    The connection is kept open in interactive ("prompt") mode, and re-opened if HAProxy closed it
+      (reload, idle timeout of the stats socket).
+    """
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout or settings.SERVICE_STATUS_TIMEOUT
+        self.sock = None
+        self.lock = Lock()
+
+    def _connect(self):
+        self.sock = socket(AF_UNIX, SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+        self.sock.sendall(b"prompt\n")
+        self._read()
+
+    def _read(self):
+        """ Read the answer of a command, up to the prompt """
+        buffer = b""
+        while not buffer.endswith(PROMPT) and buffer != PROMPT[1:]:
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Connection closed by HAProxy")
+            buffer += data
+        return buffer[:-len(PROMPT[1:])].decode('utf8')
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+
+    def command(self, command):
+        """ Send a command to the admin socket
+        :param command: The command, ex: "show stat"
+        :return: The answer of HAProxy, as string
+        """
+        with self.lock:
+            for retry in (False, True):
+                try:
+                    if not self.sock:
+                        self._connect()
+                    self.sock.sendall("{}\n".format(command).encode('utf8'))
+                    return self._read()
+                except SocketTimeout:
+                    self.close()
+                    raise ServiceStatusError("HAProxy admin socket did not answer within {} seconds.".format(
+                        self.timeout), "haproxy", traceback=" ")
+                except OSError as e:
+                    # The kept connection may have been closed by HAProxy : retry once with a new one
+                    self.close()
+                    if retry:
+                        raise ServiceStatusError("Failed to connect to haproxy admin socket.", "haproxy",
+                                                 traceback=str(e))
+
+    def show_stat(self):
+        return parse_stat(self.command("show stat"))
+
+    def show_info(self):
+        return parse_info(self.command("show info"))
+
+
+class HAProxyMetrics(CounterMetrics):
+    """
+    Time-bucketed counters of HAProxy frontends, backends and servers.
+    Each bucket keeps the last value of cumulative counters, and the last and max values of gauges,
+      throughput is computed from the difference between buckets.
+    """
+
+    DATABASE = STATS_DATABASE
+    COLLECTIONS = (STATS_COLLECTION, INFO_COLLECTION)
+    COUNTERS = STAT_COUNTERS
+    FILTERS = ("proxy",)
+
+    def record(self, node_name, stats, info=None):
+        """ Save the result of "show stat" and "show info" in the current bucket
+        :param node_name: Name of the node of the HAProxy
+        :param stats:     Result of parse_stat
+        :param info:      Result of parse_info
+        """
+        bucket = get_bucket()
+        requests = []
+        for stat in stats:
+            values = {field: stat[field] for field in STAT_GAUGES + STAT_COUNTERS if stat[field] is not None}
+            values['type'] = stat['type']
+            values['status'] = stat['status']
+            update = {'$set': values}
+            maximums = {"{}_max".format(field): stat[field] for field in STAT_GAUGES if stat[field] is not None}
+            # MongoDB refuses empty operators
+            if maximums:
+                update['$max'] = maximums
+            requests.append(UpdateOne({'node': node_name, 'proxy': stat['pxname'], 'service': stat['svname'],
+                                       'bucket': bucket}, update, upsert=True))
+        result = self.mongo.bulk_write(STATS_DATABASE, STATS_COLLECTION, requests)
+
+        if info:
+            result &= self.mongo.upsert_one(STATS_DATABASE, INFO_COLLECTION,
+                                            {'node': node_name, 'bucket': bucket},
+                                            {'$set': info})
+        return result
+
+    def series(self, doc):
+        return "{}/{}".format(doc['proxy'], doc['service'])
+
+    def point(self, doc):
+        point = {
+            'bucket': doc['bucket'],
+            'type': doc.get('type'),
+            'status': doc.get('status')
+        }
+        for field in STAT_GAUGES:
+            point[field] = doc.get(field)
+            point["{}_max".format(field)] = doc.get("{}_max".format(field))
+        return point
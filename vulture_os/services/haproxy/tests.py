@@ -0,0 +1,115 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Tests of the parsing of the HAProxy admin socket answers'
+
+
+# Django system imports
+from django.test import SimpleTestCase
+
+# Django project imports
+from services.haproxy.stats import parse_info, parse_stat
+
+# Required exceptions imports
+from services.exceptions import ServiceStatusError
+
+
+# Output of "show stat" : one frontend, and one backend with one server
+SHOW_STAT = """# pxname,svname,qcur,qmax,scur,smax,slim,stot,bin,bout,dreq,dresp,ereq,econ,eresp,wretr,wredis,status,weight,act,bck,chkfail,chkdown,lastchg,downtime,qlimit,pid,iid,sid,throttle,lbtot,tracked,type,rate,rate_lim,rate_max,check_status,check_code,check_duration,hrsp_1xx,hrsp_2xx,hrsp_3xx,hrsp_4xx,hrsp_5xx,hrsp_other,hanafail,req_rate,req_rate_max,req_tot,cli_abrt,srv_abrt,comp_in,comp_out,comp_byp,comp_rsp,lastsess,last_chk,last_agt,qtime,ctime,rtime,ttime,
+frontend_web,FRONTEND,,,3,12,2000,1520,482113,9821733,0,0,4,,,,,OPEN,,,,,,,,,1,2,0,,,,0,2,0,25,,,,0,1402,87,29,2,0,,2,25,1520,,,0,0,0,0,,,,,,,,
+backend_app,srv1,0,0,1,8,,760,241000,4910000,,0,,0,1,0,0,UP,1,1,0,0,0,86012,0,,1,3,1,,760,,2,1,,12,L4OK,,0,0,700,44,15,1,0,,,,,0,0,,,,,1,,,0,1,35,40,
+backend_app,BACKEND,0,0,1,8,200,760,241000,4910000,0,0,,0,1,0,0,UP,1,1,0,,0,86012,0,,1,3,0,,760,,1,1,,12,,,,0,700,44,15,1,0,,,,,0,0,0,0,0,0,1,,,0,1,35,40,
+
+"""
+
+# Output of "show info"
+SHOW_INFO = """Name: HAProxy
+Version: 1.8.19
+Release_date: 2019/02/11
+Nbproc: 1
+Process_num: 1
+Pid: 1234
+Uptime: 1d 0h53m12s
+Uptime_sec: 89592
+Memmax_MB: 0
+Ulimit-n: 4029
+Maxsock: 4029
+Maxconn: 2000
+CurrConns: 4
+CumConns: 1732
+CumReq: 1741
+ConnRate: 2
+SessRate: 2
+SslRate: 0
+Tasks: 31
+Run_queue: 1
+Idle_pct: 98
+node: vulture-1
+
+"""
+
+
+class ParseStatTestCase(SimpleTestCase):
+
+    def test_rows(self):
+        frontend, server, backend = parse_stat(SHOW_STAT)
+
+        self.assertEqual((frontend['pxname'], frontend['svname'], frontend['type'], frontend['status']),
+                         ("frontend_web", "FRONTEND", "FRONTEND", "OPEN"))
+        self.assertEqual((server['pxname'], server['svname'], server['type'], server['status']),
+                         ("backend_app", "srv1", "SERVER", "UP"))
+        self.assertEqual(backend['type'], "BACKEND")
+
+    def test_values(self):
+        frontend, server, backend = parse_stat(SHOW_STAT)
+
+        self.assertEqual(frontend['scur'], 3)
+        self.assertEqual(frontend['stot'], 1520)
+        self.assertEqual(frontend['bout'], 9821733)
+        self.assertEqual(frontend['hrsp_2xx'], 1402)
+        self.assertEqual(frontend['req_tot'], 1520)
+        self.assertEqual(server['rtime'], 35)
+        # Empty values are None
+        self.assertIsNone(frontend['qcur'])
+        self.assertIsNone(server['req_tot'])
+
+    def test_invalid_output(self):
+        with self.assertRaises(ServiceStatusError):
+            parse_stat("Unknown command.\n")
+        with self.assertRaises(ServiceStatusError):
+            parse_stat("")
+
+
+class ParseInfoTestCase(SimpleTestCase):
+
+    def test_fields(self):
+        self.assertEqual(parse_info(SHOW_INFO), {
+            'Uptime_sec': 89592,
+            'CurrConns': 4,
+            'CumConns': 1732,
+            'ConnRate': 2,
+            'SessRate': 2,
+            'SslRate': 0,
+            'Tasks': 31,
+            'Run_queue': 1,
+            'Idle_pct': 98
+        })
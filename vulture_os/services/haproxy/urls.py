@@ -27,6 +27,8 @@ from django.urls import path, re_path
 
 # Django project imports
 from services.haproxy import views
+from services.haproxy.stats import HAProxyMetrics
+from system.cluster.api import metrics_api
 
 # Required exceptions imports
 
@@ -41,4 +43,7 @@ urlpatterns = [
             name="services.haproxy.edit"),
 
     path('services/haproxy/reload/', views.reload, name="services.haproxy.reload"),
+
+    path('api/v1/services/haproxy/metrics/', metrics_api, {'metrics_class': HAProxyMetrics},
+         name="services.haproxy.metrics"),
 ]
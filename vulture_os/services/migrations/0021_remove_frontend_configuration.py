@@ -0,0 +1,18 @@
+# Generated by Django 2.1.3 on 2026-10-18 14:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0020_auto_20200915_2056'),
+        ('system', '0014_renderedconf'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='frontend',
+            name='configuration',
+        ),
+    ]
@@ -26,9 +26,9 @@ __doc__ = 'Openvpn service wrapper utils'
 from django.conf import settings
 
 # Django project imports
+from services.openvpn.stats import OpenvpnMetrics
 from services.service import Service
-
-from subprocess import Popen, PIPE
+from toolkit.network.interfaces import get_interfaces
 
 # Required exceptions import
 from services.exceptions import ServiceError, ServiceStatusError
@@ -127,25 +127,17 @@ def reload_conf(node_logger):
         return "Openvpn conf has not changed."
 
 def get_ssl_tunnels_stats():
+    """ Addresses and traffic counters of the tun interfaces, enumerated in-process
+    :return: Dict {tun_name: {up, addresses: [{family, address, netmask, destination}], ibytes, obytes, ...}}
+    """
+    return get_interfaces(prefix="tun")
 
-    result = {}
-
-    command = ['/sbin/ifconfig', '-l']
-    proc = Popen(command, stdout=PIPE, stderr=PIPE)
-    success, error = proc.communicate()
-    if not error:
-        for tun in success.decode('utf8').split(" "):
-            tun = tun.rstrip()
-            if "tun" not in tun:
-                continue
-
-            proc = Popen(['/sbin/ifconfig', tun], stdout=PIPE)
-            proc2 = Popen(['/usr/bin/grep', 'inet'], stdin=proc.stdout, stdout=PIPE, stderr=PIPE)
-            proc.stdout.close()
-            success, error = proc2.communicate()
-            if not error:
-                result[tun] = success.decode('utf8')
-            else:
-                result[tun] = error.decode('utf8')
-
-    return result
\ No newline at end of file
+
+def collect_stats(node_name):
+    """ Retrieve the tunnels, and save their counters in the time-series
+    :param node_name: Name of the current node
+    :return     See get_ssl_tunnels_stats
+    """
+    tunnels = get_ssl_tunnels_stats()
+    OpenvpnMetrics().record(node_name, tunnels)
+    return tunnels
@@ -0,0 +1,77 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'OpenVPN tunnels traffic time-series'
+
+
+# Django system imports
+from django.conf import settings
+
+# Django project imports
+from system.cluster.metrics import get_bucket, CounterMetrics
+
+# Required exceptions imports
+
+# Extern modules imports
+from pymongo import UpdateOne
+
+# Logger configuration imports
+import logging
+logging.config.dictConfig(settings.LOG_SETTINGS)
+logger = logging.getLogger('services')
+
+
+# Cumulative counters of the tun interfaces, their rate per second is computed
+TUNNEL_COUNTERS = ("ibytes", "obytes", "ipackets", "opackets", "ierrors", "oerrors")
+
+STATS_DATABASE = "vulture"
+# One document per (node, tunnel, bucket)
+STATS_COLLECTION = "openvpn_stats"
+
+
+class OpenvpnMetrics(CounterMetrics):
+    """
+    Time-bucketed traffic counters of the OpenVPN tunnels.
+    Each bucket keeps the last value of the counters, the throughput is computed from the difference between buckets.
+    """
+
+    DATABASE = STATS_DATABASE
+    COLLECTIONS = (STATS_COLLECTION,)
+    COUNTERS = TUNNEL_COUNTERS
+    FILTERS = ("tunnel",)
+
+    def record(self, node_name, tunnels):
+        """ Save the counters of the tunnels in the current bucket
+        :param node_name: Name of the node of the tunnels
+        :param tunnels:   Result of get_ssl_tunnels_stats {tun_name: {up, addresses, <counters>}}
+        """
+        bucket = get_bucket()
+        requests = []
+        for tunnel, stats in tunnels.items():
+            values = {field: stats[field] for field in TUNNEL_COUNTERS if field in stats}
+            values['up'] = stats.get('up')
+            requests.append(UpdateOne({'node': node_name, 'tunnel': tunnel, 'bucket': bucket},
+                                      {'$set': values}, upsert=True))
+        return self.mongo.bulk_write(STATS_DATABASE, STATS_COLLECTION, requests)
+
+    def series(self, doc):
+        return doc['tunnel']
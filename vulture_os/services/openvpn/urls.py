@@ -28,10 +28,15 @@ from django.urls import path, re_path
 # Django project imports
 from services.openvpn import api
 from services.openvpn import views
+from services.openvpn.stats import OpenvpnMetrics
+from system.cluster.api import metrics_api
 from services.generic_list import ListOpenvpn
 
 
 urlpatterns = [
+    path('api/v1/services/openvpn/metrics/', metrics_api, {'metrics_class': OpenvpnMetrics},
+         name="services.openvpn.metrics"),
+
     path('api/v1/services/openvpn/',
         api.OpenvpnAPIv1.as_view(),
         name="services.openvpn.api"
@@ -24,7 +24,6 @@ __doc__ = 'Services main models'
 
 # Django system imports
 from django.conf import settings
-from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 # Django project imports
@@ -32,7 +31,7 @@ from system.cluster.models import Cluster
 from system.config.models import write_conf
 
 # Required exceptions import
-from gui.models.monitor import Monitor
+from gui.models.monitor import MonitorSnapshot
 from services.exceptions import (ServiceConfigError, ServiceNoConfigError, ServiceExit, ServiceReloadError,
                                  ServiceRestartError, ServiceStartError)
 
@@ -40,9 +39,8 @@ from services.exceptions import (ServiceConfigError, ServiceNoConfigError, Servi
 from jinja2 import Environment, FileSystemLoader
 from os import path as os_path
 from re import search as re_search
-from subprocess import Popen, PIPE, check_output
+from subprocess import Popen, PIPE, check_output, TimeoutExpired
 
-import datetime
 
 # Logger configuration imports
 import logging
@@ -82,6 +80,8 @@ class Service:
 
     @property
     def menu(self):
+        # Read the latest statuses once for the whole menu
+        statuses = self.last_statuses()
         MENU = {
             'link': 'services',
             'icon': 'fas fa-server',
@@ -91,24 +91,28 @@ class Service:
                 'link': 'frontend',
                 'text': 'Listeners',
                 'url': '/services/frontend/',
-                'state': self.last_status(service_name='haproxy')[0]
+                'state': statuses.get('haproxy', "UNKNOWN")
             }, {
                 'link': 'strongswan',
                 'text': 'IPSEC Client',
                 'url': '/services/strongswan/',
-                'state': self.last_status(service_name='strongswan')[0]
+                'state': statuses.get('strongswan', "UNKNOWN")
             }, {
                 'link': 'openvpn',
                 'text': 'VPNSSL Client',
                 'url': '/services/openvpn/',
-                'state': self.last_status(service_name='openvpn')[0]
+                'state': statuses.get('openvpn', "UNKNOWN")
             }
             ]
         }
 
         return MENU
 
-    def _exec_cmd(self, cmd, service_name=""):
+    def _exec_cmd(self, cmd, service_name="", timeout=None):
+        """ Execute "service <service_name> <cmd>", in the jail of the service if any
+        :param timeout: Seconds after which the command is killed and TimeoutExpired is raised
+        :return: stdout, stderr, return code
+        """
         if not service_name:
             service_name = self.service_name
 
@@ -120,7 +124,12 @@ class Service:
             command = ['/usr/local/bin/sudo', '/usr/sbin/service', service_name, cmd]
 
         proc = Popen(command, stdout=PIPE, stderr=PIPE)
-        success, error = proc.communicate()
+        try:
+            success, error = proc.communicate(timeout=timeout)
+        except TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise
         return success.decode('utf8'), error.decode('utf8'), proc.returncode
 
     def start(self):
@@ -176,24 +185,24 @@ class Service:
         return stdout or stderr
 
     def last_status(self, service_name="", node_name=""):
-        """ Give last status of service by using Monitor object """
+        """ Give last status of service by using the MonitorSnapshot """
         service_name2 = service_name or self.service_name
 
         # Status is not realtime: We read service's status from mongodb
         # Status has been set by the vultured daemon from the HOST
         # If there is no status for the last minute: Then status is UNKNOWN
-        time_threshold = timezone.now() - datetime.timedelta(minutes=1)
+        return self.last_statuses(node_name).get(service_name2, "UNKNOWN"), ""
+
+    def last_statuses(self, node_name=""):
+        """ Give last statuses of all services, read from the snapshot updated by the monitor
+        :param node_name: Name of the node, the most recent snapshot of all nodes if empty
+        :return: Dict {service_name: status}, empty if there is no status for the last minute
+        """
         try:
-            # 'services__name': service_name2,
-            query = {'date__gt': time_threshold}
-            if node_name:
-                query['node__name'] = node_name
-            status = Monitor.objects.filter(**query).order_by('-date').first() \
-                            .services.filter(name=service_name2).first().status
+            return MonitorSnapshot().get_statuses(node_name or None, max_age=60)
         except Exception as e:
-            status = "UNKNOWN"
-
-        return status, ""
+            logger.error("Failed to retrieve last statuses of services: {}".format(str(e)))
+            return {}
 
     def status(self, service_name=""):
         """
@@ -204,7 +213,12 @@ class Service:
         service_name2 = service_name or self.service_name
 
         # Executing service service_name status as vlt-os sudo
-        infos, errors, code = self._exec_cmd('onestatus', service_name2)
+        try:
+            infos, errors, code = self._exec_cmd('onestatus', service_name2, timeout=settings.SERVICE_STATUS_TIMEOUT)
+        except TimeoutExpired:
+            infos = "Status command timed out after {} seconds".format(settings.SERVICE_STATUS_TIMEOUT)
+            logger.error("[{}] - Error getting status: '{}'".format(service_name2.upper(), infos))
+            return "ERROR", infos
 
         status = "UNKNOWN"
         if infos:  # STDOUT -> service (not) running
@@ -33,6 +33,7 @@ from services.exceptions import ServiceError, ServiceStatusError
 
 # Extern modules imports
 from re import search as re_search
+from subprocess import TimeoutExpired
 
 # Logger configuration imports
 import logging
@@ -42,6 +43,18 @@ logger = logging.getLogger('services')
 STRONGSWAN_PERMS = "644"
 STRONGSWAN_OWNERS = "root:wheel"
 
+# States of the tunnels, from the state of their CHILD_SA : other states (ROUTED, REKEYED, DELETING, ...) are "STOP"
+CHILD_SA_STATES = {
+    "INSTALLED": "UP",
+    "CREATED": "CONNECTING",
+    "INSTALLING": "CONNECTING",
+    "UPDATING": "CONNECTING",
+    "REKEYING": "CONNECTING",
+    "RETRYING": "CONNECTING"
+}
+# When several CHILD_SA have the same remote subnet, the tunnel has the best state
+TUNNEL_STATES_ORDER = ("STOP", "CONNECTING", "UP")
+
 
 class StrongswanService(Service):
 
@@ -52,7 +65,11 @@ class StrongswanService(Service):
         self.friendly_name = "IPSEC"
 
     def statusall(self):
-        stdout, stderr, code = self._exec_cmd("onestatusall")
+        try:
+            stdout, stderr, code = self._exec_cmd("onestatusall", timeout=settings.SERVICE_STATUS_TIMEOUT)
+        except TimeoutExpired:
+            raise ServiceStatusError("Status command timed out after {} seconds".format(
+                settings.SERVICE_STATUS_TIMEOUT), "strongswan", traceback=" ")
 
         """ Strongswan return status of configuration """
         if stderr and code != 0:
@@ -125,41 +142,66 @@ def set_rc_conf(node_logger, yes_no):
     return result
 
 
+def parse_statusall(output):
+    """ Parse the output of "statusall" in one pass
+    Lines of a CHILD_SA look like:
+        vlan_1{2}:  INSTALLED, TUNNEL, reqid 1, ESP SPIs: c1234567_i c7654321_o
+        vlan_1{2}:  AES_CBC_128/HMAC_SHA2_256_128, 1234 bytes_i (12 pkts, 3s ago), 5678 bytes_o (13 pkts, 3s ago)
+        vlan_1{2}:   192.168.1.0/24 === 192.168.2.0/24
+    :return: Dict {up, connecting, tunnels: {remote_subnet: {state, name, local_subnets, remote_subnets,
+                                                             bytes_in, packets_in, bytes_out, packets_out}}}
+    """
+    result = {'up': 0, 'connecting': 0, 'tunnels': {}}
+    # CHILD_SA records by name, ex: "vlan_1{2}"
+    children = {}
+    for line in output.split('\n'):
+        match = re_search(r"Security Associations \((\d+) up, (\d+) connecting\):", line)
+        if match:
+            result['up'], result['connecting'] = int(match.group(1)), int(match.group(2))
+            continue
+
+        match = re_search(r"^\s*(\S+\{\d+\}):\s+(.*)$", line)
+        if not match:
+            continue
+        child = children.setdefault(match.group(1), {'name': match.group(1), 'state': "STOP",
+                                                     'local_subnets': [], 'remote_subnets': []})
+        content = match.group(2)
+
+        state = re_search(r"^([A-Z_]+), ", content)
+        if state:
+            child['state'] = CHILD_SA_STATES.get(state.group(1), "STOP")
+            continue
+
+        if " === " in content:
+            local, remote = content.split(" === ", 1)
+            child['local_subnets'], child['remote_subnets'] = local.split(), remote.split()
+            continue
+
+        for direction, suffix in (("in", "i"), ("out", "o")):
+            counters = re_search(r"(\d+) bytes_{}(?: \((\d+) pkts?)?".format(suffix), content)
+            if counters:
+                child['bytes_{}'.format(direction)] = int(counters.group(1))
+                child['packets_{}'.format(direction)] = int(counters.group(2) or 0)
+
+    for child in children.values():
+        for remote_subnet in child['remote_subnets']:
+            # An installed CHILD_SA wins over a rekeyed one of the same subnet
+            current = result['tunnels'].get(remote_subnet)
+            if not current or TUNNEL_STATES_ORDER.index(child['state']) > TUNNEL_STATES_ORDER.index(current['state']):
+                result['tunnels'][remote_subnet] = child
+    return result
+
+
 def get_ipsec_tunnels_stats():
     service = StrongswanService()
 
     # Warning, can raise ServiceError
     result = service.statusall()
 
-    tunnel_stats = {}
-    sa_showed = False
-    cpt = 0
-    nb_up = 0
-    nb_connecting = 0
-    for line in result.split('\n'):
-        if cpt > 0:
-            match = re_search("(vlan_\d+\{\d+\}):\s+(\S+)\s+===\s+(\S+)", line)
-            if not match and cpt == 2:
-                logger.error("STRONGSWAN :: get_tunnel_stats: The following line not recognized: {}".format(line))
-            elif not match and cpt == 1:
-                cpt += 1
-            elif match:
-                tunnel_stats[match.group(3)] = ["UP", match.group(1)]
-                cpt = 0
-        elif not sa_showed:
-            match = re_search("Security Associations \((\d+) up, (\d+) connecting\):", line)
-            if match:
-                nb_up = match.group(1)
-                nb_connecting = match.group(2)
-                logger.info("STRONGSWAN :: get_tunnel_stats: Tunnels {} up, {} connecting.".format(nb_up, nb_connecting))
-                sa_showed = True
-        else:
-            match = re_search(" +vlan_(\d+\{\d+\}): +INSTALLED, ", line)
-            if match:
-                logger.debug("STRONGSWAN :: get_tunnel_stats: Tunnel up: {}".format(match.group(1)))
-                cpt = 1
-
-    return result, tunnel_stats, nb_up, nb_connecting
+    stats = parse_statusall(result)
+    logger.info("STRONGSWAN :: get_tunnel_stats: Tunnels {} up, {} connecting.".format(stats['up'],
+                                                                                     stats['connecting']))
+    return result, stats['tunnels'], stats['up'], stats['connecting']
 
 
 def reload_conf(node_logger):
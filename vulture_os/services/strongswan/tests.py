@@ -0,0 +1,107 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Tests of the parsing of the Strongswan status'
+
+
+# Django system imports
+from django.test import SimpleTestCase
+
+# Django project imports
+from services.strongswan.strongswan import parse_statusall
+
+
+# Output of "statusall" : one installed tunnel, with a rekeyed CHILD_SA, and one connecting with a routed CHILD_SA
+STATUSALL = """Status of IKE charon daemon (strongSwan 5.7.2, FreeBSD 12.1-RELEASE-p1, amd64):
+  uptime: 2 days, since Oct 16 10:12:03 2026
+  worker threads: 11 of 16 idle, 5/0/0/0 working, job queue: 0/0/0/0, scheduled: 4
+  loaded plugins: charon aes des sha1 sha2 md5 random nonce x509 pubkey pkcs1 pem openssl kernel-pfkey socket-default
+Listening IP addresses:
+  192.168.1.254
+Connections:
+      vlan_1:  192.168.1.254...203.0.113.10  IKEv2, dpddelay=30s
+      vlan_1:   local:  [192.168.1.254] uses pre-shared key authentication
+      vlan_1:   remote: [203.0.113.10] uses pre-shared key authentication
+      vlan_1:   child:  192.168.1.0/24 === 192.168.2.0/24 TUNNEL, dpdaction=restart
+      vlan_2:  192.168.1.254...198.51.100.20  IKEv2, dpddelay=30s
+      vlan_2:   child:  192.168.1.0/24 === 10.0.0.0/24 10.0.1.0/24 TUNNEL, dpdaction=restart
+Security Associations (1 up, 1 connecting):
+      vlan_1[3]: ESTABLISHED 12 minutes ago, 192.168.1.254[192.168.1.254]...203.0.113.10[203.0.113.10]
+      vlan_1[3]: IKEv2 SPIs: 1a2b3c4d5e6f7a8b_i* 8b7a6f5e4d3c2b1a_r, pre-shared key reauthentication in 2 hours
+      vlan_1[3]: IKE proposal: AES_CBC_128/HMAC_SHA2_256_128/PRF_HMAC_SHA2_256/MODP_2048
+      vlan_1{2}:  INSTALLED, TUNNEL, reqid 1, ESP SPIs: c1234567_i c7654321_o
+      vlan_1{2}:  AES_CBC_128/HMAC_SHA2_256_128, 1234 bytes_i (12 pkts, 3s ago), 5678 bytes_o (13 pkts, 3s ago), rekeying in 43 minutes
+      vlan_1{2}:   192.168.1.0/24 === 192.168.2.0/24
+      vlan_1{1}:  REKEYED, TUNNEL, reqid 1, expires in 8 minutes
+      vlan_1{1}:  AES_CBC_128/HMAC_SHA2_256_128, 0 bytes_i, 0 bytes_o
+      vlan_1{1}:   192.168.1.0/24 === 192.168.2.0/24
+      vlan_2[4]: CONNECTING, 192.168.1.254[%any]...198.51.100.20[%any]
+      vlan_2{5}:  ROUTED, TUNNEL, reqid 2
+      vlan_2{5}:   192.168.1.0/24 === 10.0.0.0/24 10.0.1.0/24
+"""
+
+
+class ParseStatusallTestCase(SimpleTestCase):
+
+    def test_counts(self):
+        result = parse_statusall(STATUSALL)
+
+        self.assertEqual((result['up'], result['connecting']), (1, 1))
+        self.assertEqual(set(result['tunnels']), {"192.168.2.0/24", "10.0.0.0/24", "10.0.1.0/24"})
+
+    def test_installed_tunnel(self):
+        self.assertEqual(parse_statusall(STATUSALL)['tunnels']["192.168.2.0/24"], {
+            'name': "vlan_1{2}",
+            'state': "UP",
+            'local_subnets': ["192.168.1.0/24"],
+            'remote_subnets': ["192.168.2.0/24"],
+            'bytes_in': 1234,
+            'packets_in': 12,
+            'bytes_out': 5678,
+            'packets_out': 13
+        })
+
+    def test_routed_tunnel(self):
+        tunnels = parse_statusall(STATUSALL)['tunnels']
+
+        self.assertIs(tunnels["10.0.0.0/24"], tunnels["10.0.1.0/24"])
+        self.assertEqual(tunnels["10.0.0.0/24"], {
+            'name': "vlan_2{5}",
+            'state': "STOP",
+            'local_subnets': ["192.168.1.0/24"],
+            'remote_subnets': ["10.0.0.0/24", "10.0.1.0/24"]
+        })
+
+    def test_no_tunnel(self):
+        self.assertEqual(parse_statusall("Security Associations (0 up, 0 connecting):\n  none\n"),
+                         {'up': 0, 'connecting': 0, 'tunnels': {}})
+
+    def test_connecting_tunnel(self):
+        output = """Security Associations (0 up, 1 connecting):
+      vlan_3{7}:  INSTALLING, TUNNEL, reqid 3
+      vlan_3{7}:   192.168.1.0/24 === 172.16.0.0/24
+      vlan_3{6}:  REKEYED, TUNNEL, reqid 3
+      vlan_3{6}:   192.168.1.0/24 === 172.16.0.0/24
+"""
+        tunnel = parse_statusall(output)['tunnels']["172.16.0.0/24"]
+
+        self.assertEqual((tunnel['name'], tunnel['state']), ("vlan_3{7}", "CONNECTING"))
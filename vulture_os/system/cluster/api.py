@@ -34,6 +34,7 @@ from django.views import View
 
 # Django project imports
 from gui.decorators.apicall import api_need_key
+from gui.models.monitor import HISTORY_MAX_RANGE
 from system.cluster.models import Node
 from system.cluster.views import COMMAND_LIST, cluster_edit
 from system.cluster.models import Cluster
@@ -140,6 +141,41 @@ def cluster_info(request):
         }, 500)
 
 
+@csrf_exempt
+@api_need_key('cluster_api_key')
+@require_http_methods(['GET'])
+def metrics_api(request, metrics_class):
+    """ History of the metrics of metrics_class (MessageQueueMetrics, HAProxyMetrics, ...)
+    GET parameters: minutes (default 60), node (default all nodes), and the FILTERS of metrics_class
+    """
+    try:
+        try:
+            minutes = min(max(int(request.GET.get('minutes', 60)), 1), HISTORY_MAX_RANGE)
+        except ValueError:
+            return JsonResponse({
+                'status': False,
+                'error': _("Parameter 'minutes' must be an integer")
+            }, status=400)
+
+        metrics = metrics_class().get_metrics(minutes=minutes, node_name=request.GET.get('node'),
+                                              **{field: request.GET.get(field) for field in metrics_class.FILTERS})
+
+        return JsonResponse({
+            'status': True,
+            'data': metrics
+        })
+
+    except Exception as e:
+        logger.critical(e, exc_info=1)
+        if settings.DEV_MODE:
+            raise
+
+        return JsonResponse({
+            'status': False,
+            'data': _('An error has occurred')
+        }, status=500)
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class NodeAPIv1(View):
     @api_need_key('cluster_api_key')
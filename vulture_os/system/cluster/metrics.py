@@ -0,0 +1,242 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Cluster message queue metrics'
+
+
+# Django system imports
+from django.utils import timezone
+
+# Django project imports
+from toolkit.mongodb.mongo_base import MongoBase
+
+# Extern modules imports
+from datetime import timedelta
+
+# Logger configuration imports
+import logging
+logger = logging.getLogger('system')
+
+
+METRICS_DATABASE = "vulture"
+# One document per (node, action, bucket)
+ACTIONS_COLLECTION = "system_messagequeue_metrics"
+# One document per (node, bucket)
+DEPTH_COLLECTION = "system_messagequeue_depth"
+# Size of a bucket, in seconds
+BUCKET_SIZE = 60
+# Buckets are removed by a TTL index after this time, in seconds
+METRICS_TTL = 7 * 24 * 3600
+
+
+def ensure_indexes():
+    """ Create the TTL indexes of the metrics and history collections of the cluster
+    MUST be executed once on a PRIMARY node : at the creation of the cluster, or by an update script
+    """
+    # Imported here, these modules depend on the cluster models
+    from gui.models.monitor import MonitorHistory
+    from services.darwin.stats import DarwinMetrics
+    from services.haproxy.stats import HAProxyMetrics
+    from services.openvpn.stats import OpenvpnMetrics
+
+    result = True
+    for metrics in (MessageQueueMetrics(), MonitorHistory(), HAProxyMetrics(), DarwinMetrics(), OpenvpnMetrics()):
+        try:
+            metrics.ensure_indexes()
+        except Exception as e:
+            logger.error("Failed to create indexes of {}: {}".format(type(metrics).__name__, e))
+            result = False
+    return result
+
+
+def get_bucket(date=None):
+    """ Return the start of the bucket of the given date (default: now) """
+    date = date or timezone.now()
+    return date - timedelta(seconds=date.timestamp() % BUCKET_SIZE)
+
+
+class MessageQueueMetrics:
+    """
+    Time-bucketed metrics of the cluster messages:
+      - wait: time between the creation of a message and the start of its execution
+      - duration: execution time of the action
+      - pending: number of messages waiting on a node
+    """
+
+    # Fields which can filter get_metrics, besides the node
+    FILTERS = ()
+
+    def __init__(self, mongo=None):
+        self.mongo = mongo or MongoBase()
+
+    def ensure_indexes(self):
+        """ Create TTL indexes of metrics collections - MUST be executed on a PRIMARY node """
+        for collection in (ACTIONS_COLLECTION, DEPTH_COLLECTION):
+            self.mongo.set_index_ttl(METRICS_DATABASE, collection, "bucket", METRICS_TTL)
+
+    def record_message(self, node_name, action, wait, duration, status):
+        """ Add a processed message to the bucket of its action
+        :param node_name: Name of the node which executed the message
+        :param action:    Action path of the message
+        :param wait:      Seconds between the creation and the start of the message
+        :param duration:  Seconds of execution
+        :param status:    Final status of the message
+        """
+        return self.mongo.upsert_one(METRICS_DATABASE, ACTIONS_COLLECTION,
+                                     {'node': node_name, 'action': action, 'bucket': get_bucket()},
+                                     {'$inc': {'count': 1,
+                                               'failures': int(status != "done"),
+                                               'wait_total': wait,
+                                               'duration_total': duration},
+                                      '$max': {'wait_max': wait,
+                                               'duration_max': duration}})
+
+    def record_queue_depth(self, node_name, pending):
+        """ Save the number of messages waiting on a node
+        :param node_name: Name of the node
+        :param pending:   Number of messages with status "new"
+        """
+        return self.mongo.upsert_one(METRICS_DATABASE, DEPTH_COLLECTION,
+                                     {'node': node_name, 'bucket': get_bucket()},
+                                     {'$set': {'pending': pending},
+                                      '$max': {'pending_max': pending}})
+
+    def get_metrics(self, minutes=60, node_name=None):
+        """ Aggregate the metrics of the last minutes
+        :param minutes:   Number of minutes to retrieve
+        :param node_name: Optional name of the node, all nodes if None
+        :return: {
+            'actions': [{node, action, count, failures, wait_avg, wait_max, duration_avg, duration_max}, ...],
+            'depth': {node_name: [{bucket, pending, pending_max}, ...]}
+        }
+        """
+        match = {'bucket': {'$gte': get_bucket(timezone.now() - timedelta(minutes=minutes))}}
+        if node_name:
+            match['node'] = node_name
+
+        actions = []
+        for res in self.mongo.execute_aggregation(METRICS_DATABASE, ACTIONS_COLLECTION, [
+            {'$match': match},
+            {'$group': {'_id': {'node': "$node", 'action': "$action"},
+                        'count': {'$sum': "$count"},
+                        'failures': {'$sum': "$failures"},
+                        'wait_total': {'$sum': "$wait_total"},
+                        'wait_max': {'$max': "$wait_max"},
+                        'duration_total': {'$sum': "$duration_total"},
+                        'duration_max': {'$max': "$duration_max"}}},
+            {'$sort': {'duration_total': -1}}
+        ]):
+            actions.append({
+                'node': res['_id']['node'],
+                'action': res['_id']['action'],
+                'count': res['count'],
+                'failures': res['failures'],
+                'wait_avg': res['wait_total'] / res['count'],
+                'wait_max': res['wait_max'],
+                'duration_avg': res['duration_total'] / res['count'],
+                'duration_max': res['duration_max']
+            })
+
+        depth = {}
+        nb_res, res = self.mongo.execute_request(METRICS_DATABASE, DEPTH_COLLECTION, match,
+                                                 start=0, length=0, sorting="bucket", type_sorting=1)
+        for bucket in res:
+            depth.setdefault(bucket['node'], []).append({
+                'bucket': bucket['bucket'],
+                'pending': bucket['pending'],
+                'pending_max': bucket['pending_max']
+            })
+
+        return {
+            'actions': actions,
+            'depth': depth
+        }
+
+
+class CounterMetrics:
+    """
+    Base of the time-bucketed counters saved by the monitor, one document per (node, series, bucket).
+    Each bucket keeps the last value of the cumulative COUNTERS,
+      their rate per second is computed from the difference between consecutive buckets of a series.
+    Subclasses define COLLECTIONS, COUNTERS, FILTERS and series()
+    """
+
+    DATABASE = METRICS_DATABASE
+    # Collections expired by TTL, the first one holds the series
+    COLLECTIONS = ()
+    # Cumulative counters, which are reset when the service restarts
+    COUNTERS = ()
+    # Fields of the documents which can filter get_metrics, and name the series
+    FILTERS = ()
+
+    def __init__(self, mongo=None):
+        self.mongo = mongo or MongoBase()
+
+    def ensure_indexes(self):
+        """ Create TTL indexes of metrics collections - MUST be executed on a PRIMARY node """
+        for collection in self.COLLECTIONS:
+            self.mongo.set_index_ttl(self.DATABASE, collection, "bucket", METRICS_TTL)
+
+    def series(self, doc):
+        """ Name of the series of a document """
+        raise NotImplementedError()
+
+    def point(self, doc):
+        """ Values of a document returned by get_metrics, rates excepted """
+        return {field: value for field, value in doc.items() if field not in ('_id', 'node') + self.FILTERS}
+
+    def get_metrics(self, minutes=60, node_name=None, **filters):
+        """ Retrieve the history of the last minutes, with the rate per second of counters
+        :param minutes:   Number of minutes to retrieve
+        :param node_name: Optional name of the node, all nodes if None
+        :param filters:   Optional values of FILTERS fields, ex: proxy="frontend1"
+        :return: {node_name: {series: [{bucket, <fields>, <counters>_rate}, ...]}}
+        """
+        match = {'bucket': {'$gte': get_bucket(timezone.now() - timedelta(minutes=minutes + 1))}}
+        if node_name:
+            match['node'] = node_name
+        for field in self.FILTERS:
+            if filters.get(field):
+                match[field] = filters[field]
+
+        nb_res, res = self.mongo.execute_request(self.DATABASE, self.COLLECTIONS[0], match,
+                                                 start=0, length=0, sorting="bucket", type_sorting=1)
+        result = {}
+        previous = {}
+        for doc in res:
+            key = (doc['node'], self.series(doc))
+            point = self.point(doc)
+
+            last = previous.get(key)
+            for field in self.COUNTERS:
+                value, point["{}_rate".format(field)] = doc.get(field), None
+                # A lower value means that the counter has been reset
+                if last and value is not None and last.get(field) is not None and value >= last[field]:
+                    elapsed = (doc['bucket'] - last['bucket']).total_seconds() or BUCKET_SIZE
+                    point["{}_rate".format(field)] = (value - last[field]) / elapsed
+            previous[key] = doc
+
+            # The first bucket is only used to compute rates
+            if last:
+                result.setdefault(key[0], {}).setdefault(key[1], []).append(point)
+
+        return result
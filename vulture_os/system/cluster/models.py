@@ -26,17 +26,19 @@ __doc__ = 'Cluster main models'
 from system.config.models import Config
 
 from toolkit.network.network import get_hostname, MANAGEMENT_IP_PATH
-from toolkit.mongodb.mongo_base import MongoBase
 from toolkit.redis.redis_base import RedisBase
 from toolkit.mongodb.mongo_base import parse_uristr
+from system.cluster.topology import topology
 
 from django.utils.translation import ugettext as _
 from django.utils.module_loading import import_string
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.conf import settings
 from djongo import models
 import subprocess
 import ipaddress
+from ast import literal_eval
 from iptools.ipv4 import netmask2prefix
 import time
 
@@ -54,6 +56,62 @@ logger = logging.getLogger('gui')
 
 JAILS = ("apache", "mongodb", "redis", "rsyslog", "haproxy")
 
+# Redis channel used to wake up cluster daemons when a message is queued
+MESSAGE_QUEUE_CHANNEL = "vlt.cluster.messages"
+
+# Actions that only depend on the state of the database when they are executed
+#  running them once after the last request has the same effect as running them N times
+COALESCABLE_ACTIONS = (
+    "services.rsyslogd.rsyslog.build_conf",
+    "services.rsyslogd.rsyslog.configure_node",
+    "services.rsyslogd.rsyslog.configure_pstats",
+    "services.rsyslogd.rsyslog.reload_service",
+    "services.rsyslogd.rsyslog.restart_service",
+    "services.haproxy.haproxy.build_conf",
+    "services.haproxy.haproxy.configure_node",
+    "services.haproxy.haproxy.reload_service",
+    "services.haproxy.haproxy.restart_service",
+    "services.darwin.darwin.build_conf",
+    "services.logrotate.logrotate.reload_conf",
+    "services.apache.apache.reload_conf",
+    "services.apache.apache.reload_service",
+    "services.strongswan.strongswan.reload_service",
+    "services.strongswan.strongswan.restart_service",
+    "services.openvpn.openvpn.reload_service",
+    "services.openvpn.openvpn.restart_service",
+    "toolkit.network.network.refresh_nic",
+    "system.zfs.zfs.refresh",
+)
+
+# Priorities of messages: interactive messages are executed before background ones
+PRIORITY_BACKGROUND = 0
+PRIORITY_INTERACTIVE = 1
+
+# Actions writing or deleting files: an interactive message never overtakes
+#  a background one working on the same file (see MessageQueue.target_files)
+ORDERED_ACTIONS = (
+    "system.config.models.write_conf",
+    "system.config.models.delete_conf",
+)
+# Path of the file in the config of write_conf : "['path', 'content', 'owner', 'perms']"
+WRITE_CONF_PATH = re_compile(r"\[\s*(['\"])(.*?)\1")
+
+# Actions independent from the configuration of services, which can run
+#  in parallel with it - Actions on the same resource are still executed in order
+# Every other action is executed in order, in the "config" resource
+CONCURRENT_ACTIONS = {
+    "gui.crontab.feed.security_update": "feed",
+    "system.zfs.zfs.refresh": "zfs",
+    "system.zfs.zfs.create_snapshot": "zfs",
+    "system.zfs.zfs.restore_snapshot": "zfs",
+    "system.zfs.zfs.delete_snapshot": "zfs",
+    "system.vm.vm.start_vm": "vm",
+    "system.vm.vm.stop_vm": "vm",
+    "system.vm.vm.delete_vm": "vm",
+    "toolkit.yara.yara.fetch_yara_rules": "yara",
+    "toolkit.yara.yara.try_compile_yara_rules": "yara",
+}
+
 
 class Node(models.Model):
     """
@@ -147,18 +205,19 @@ class Node(models.Model):
             'unix_timestamp': time.time()
         }
 
-    def api_request(self, action, config=None, internal=False):
+    def api_request(self, action, config=None, internal=False, priority=None):
         """
 
         :param action:    The requested action
         :param config:    The associated config
         :param internal:  Is this request internal ? Means that it will not be shown to the admin
+        :param priority:  PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND, see Cluster.api_request
         :return:
             { 'status': True, 'message': 'A meaningfull message' }
             { 'status': False, 'message': 'A meaningfull message' }
         """
 
-        return Cluster.api_request(action, config, self, internal=internal)
+        return Cluster.api_request(action, config, self, internal=internal, priority=priority)
 
     def synchronizeNICs(self):
         """
@@ -210,14 +269,12 @@ class Node(models.Model):
     def is_standalone(self):
         """
         Check if the current Node is a member of mongoDB
+        The cluster topology is cached, see system.cluster.topology
         :return: True / False, or None in case of a failure
         """
-        c = MongoBase()
-        ok = c.connect()
-        if ok:
-            c.connect_primary()
-            config = c.db.admin.command("replSetGetConfig")['config']
-            return len(config['members']) == 1
+        members = topology.mongo_members()
+        if members is not None:
+            return len(members) == 1
 
         return True
 
@@ -225,32 +282,26 @@ class Node(models.Model):
     def is_master_mongo(self):
         """
         Check if the current Node is master or not
+        The cluster topology is cached, see system.cluster.topology
         :return: True / False, or None in case of a failure
         """
-        c = MongoBase()
-        ok = c.connect()
-        if ok:
-            primary_node = c.get_primary()
-        else:
+        primary_node = topology.mongo_primary()
+        if primary_node is None:
             return None
 
-        if ok and primary_node == self.name + ':9091':
-            return True
-        elif ok:
-            return False
-
-        return None
+        # False if the replicaset has no primary
+        return primary_node == self.name + ':9091'
 
     @property
     def is_master_redis(self):
         """
         Check if the current Node is master or not
+        The cluster topology is cached, see system.cluster.topology
         :return: True / False, or None in case of a failure
         """
 
         if self.management_ip:
-            c = RedisBase()
-            master_node = c.get_master(self.name)
+            master_node = topology.redis_master(self.name)
             if master_node == self.name:
                 return True
             elif master_node:
@@ -392,50 +443,83 @@ class Node(models.Model):
 
         return result
 
-    def process_messages(self):
+    def process_messages(self, dispatcher=None):
         """
         Function called from Cluster daemon: read
         queue and process asked functions
-        :return:
+        :param dispatcher: Optional MessageDispatcher used to execute
+                            messages in parallel. If None, messages are executed serially
+        :return: The number of pending messages
+        """
+        messages = list(MessageQueue.objects.filter(
+            node=self, status='new').order_by('modified'))
+        pending = len(messages)
+        messages = MessageQueue.prioritize(messages)
+
+        if dispatcher:
+            # Do not schedule twice messages not finished yet
+            messages = [m for m in messages if not dispatcher.is_scheduled(m)]
+
+        for message, coalesced in MessageQueue.coalesce(messages):
+            if dispatcher:
+                dispatcher.schedule(self, message, coalesced)
+            else:
+                self.execute_message(message, coalesced)
+
+        return pending
+
+    def execute_message(self, message, coalesced=None):
+        """
+        Execute the action of a message, and save its result
+        :param message:   The MessageQueue to execute
+        :param coalesced: Messages coalesced into this one, they will get the same status
+        :return: The MessageQueue
         """
         logger_daemon = logging.getLogger('daemon')
-        messages = MessageQueue.objects.filter(
-            node=self, status='new').order_by('modified')
+        coalesced = coalesced or []
 
-        for message in messages:
-            logger.debug("Cluster::process_messages: {},{},{}".format(
-                message.action, message.config, message.node)
-            )
+        logger.debug("Cluster::process_messages: {},{},{}".format(
+            message.action, message.config, message.node)
+        )
 
-            message.status = 'running'
-            message.save()
+        for m in [message] + coalesced:
+            m.status = 'running'
+            m.save()
 
-            try:
-                """ Big try in case of import or execution error """
+        try:
+            """ Big try in case of import or execution error """
+
+            # Call the function
+            my_function = import_string(message.action)
 
-                # Call the function
-                my_function = import_string(message.action)
+            args = [logger_daemon]
 
-                args = [logger_daemon]
+            if message.config:
+                args.append(message.config)
 
-                if message.config:
-                    args.append(message.config)
+            message.result = my_function(*args)
+            message.status = 'done'
+        except ServiceExit:
+            """ Service stop asked """
+            raise
+        except KeyError as e:
+            logger.exception(e)
+            message.result = "KeyError {}".format(str(e))
+        except Exception as e:
+            logger.exception(e)
+            logger.error("Cluster::process_messages: {}".format(str(e)))
+            message.status = 'failure'
+            message.result = str(e)
 
-                message.result = my_function(*args)
-                message.status = 'done'
-            except ServiceExit:
-                """ Service stop asked """
-                raise
-            except KeyError as e:
-                logger.exception(e)
-                message.result = "KeyError {}".format(str(e))
-            except Exception as e:
-                logger.exception(e)
-                logger.error("Cluster::process_messages: {}".format(str(e)))
-                message.status = 'failure'
-                message.result = str(e)
+        message.save()
 
-            message.save()
+        """ Report the result on the messages that have been executed by this one """
+        for m in coalesced:
+            m.status = message.status
+            m.result = "Coalesced into message {}".format(message.pk)
+            m.save()
+
+        return message
 
 
 class Cluster (models.Model):
@@ -471,7 +555,7 @@ class Cluster (models.Model):
         return global_config
 
     @staticmethod
-    def api_request(action, config=None, node=None, internal=False):
+    def api_request(action, config=None, node=None, internal=False, priority=None):
         """
 
         :param node: The node we want to send a message to
@@ -479,47 +563,88 @@ class Cluster (models.Model):
         :param config:    The associated config
         :param node:      The node to set the action to
         :param internal:  Is this request internal ? Means that it will not be shown to the admin
+        :param priority:  PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND,
+                           by default internal requests are executed in background
         :return:
             { 'status': True, 'message': 'A meaningful message' }
             { 'status': False, 'message': 'A meaningful message' }
         """
 
-        if not node:
-            # Ignore pending nodes
-            for node in Node.objects.exclude(management_ip__exact=''):
-                m, created = MessageQueue.objects.get_or_create(
-                    node=node,
-                    status="new",
-                    action=action,
-                    config=config,
-                    internal=internal
-                )
+        return Cluster.api_requests([(node, action, config)], internal=internal, priority=priority)
 
-                try:
-                    logger.debug("Cluster::api_request: Calling \"{}\" on node \"{}\". Config is: \"{}\"".format(
-                        action, node.name, config))
-                    m.save()
-                except Exception as e:
-                    logger.error("Cluster::api_request: {}".format(str(e)))
-                    return {'status': False, 'message': str(e)}
+    @staticmethod
+    def api_requests(requests, internal=False, priority=None):
+        """
+        Send several messages at once, with one insertion in database
+        Messages identical to a message already pending are not inserted twice,
+          the pending one is moved at the end of the queue instead
+
+        :param requests:  List of tuples (node, action, config).
+                           If node is None, the message is sent to all the nodes
+        :param internal:  Are those requests internal ? Means that they will not be shown to the admin
+        :param priority:  PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND,
+                           by default internal requests are executed in background
+        :return:
+            { 'status': True, 'message': 'A meaningful message' }
+            { 'status': False, 'message': 'A meaningful message' }
+        """
+        if priority is None:
+            priority = PRIORITY_BACKGROUND if internal else PRIORITY_INTERACTIVE
 
-        else:
-            m, created = MessageQueue.objects.get_or_create(
-                node=node,
-                status="new",
-                action=action,
-                config=config,
-                internal=internal
-            )
+        try:
+            all_nodes = None
+            messages = {}
+            for node, action, config in requests:
+                if node:
+                    nodes = [node]
+                else:
+                    if all_nodes is None:
+                        # Ignore pending nodes
+                        all_nodes = list(Node.objects.exclude(management_ip__exact=''))
+                    nodes = all_nodes
 
-            try:
-                logger.debug("Cluster::api_request: Calling \"{}\" on node \"{}\". Config is: \"{}\"".format(
-                    action, node.name, config))
-                m.save()
-            except Exception as e:
-                logger.error("Cluster::api_request: {}".format(str(e)))
-                return {'status': False, 'message': str(e)}
+                # Config is saved as text
+                if config is not None and not isinstance(config, str):
+                    config = str(config)
 
+                for n in nodes:
+                    logger.debug("Cluster::api_request: Calling \"{}\" on node \"{}\". Config is: \"{}\"".format(
+                        action, n.name, config))
+                    # Keep the first occurrence of a message
+                    messages.setdefault((n.pk, action, config), MessageQueue(node=n, status="new", action=action,
+                                                                             config=config, internal=internal,
+                                                                             priority=priority))
+
+            if not messages:
+                return {'status': True, 'message': ''}
+
+            """ Retrieve pending messages identical to the requested ones, with one query """
+            pending = MessageQueue.objects.filter(status="new",
+                                                  internal=internal,
+                                                  priority=priority,
+                                                  node__in=set(m.node for m in messages.values()),
+                                                  action__in=set(m.action for m in messages.values()))
+            pending_ids = []
+            for message in pending.only('id', 'node', 'action', 'config'):
+                key = (message.node_id, message.action, message.config)
+                if key in messages:
+                    del messages[key]
+                    pending_ids.append(message.pk)
+
+            now = timezone.now()
+            if pending_ids:
+                MessageQueue.objects.filter(pk__in=pending_ids).update(modified=now)
+
+            new_messages = list(messages.values())
+            for message in new_messages:
+                message.modified = now
+            MessageQueue.objects.bulk_create(new_messages)
+
+        except Exception as e:
+            logger.error("Cluster::api_request: {}".format(str(e)))
+            return {'status': False, 'message': str(e)}
+
+        MessageQueue.notify_nodes(set(m.node.name for m in new_messages))
         return {'status': True, 'message': ''}
 
 
@@ -547,6 +672,9 @@ class MessageQueue (models.Model):
     # Report to the admin this object ?
     internal = models.BooleanField(default=False)
 
+    # Interactive messages are executed before background ones
+    priority = models.SmallIntegerField(default=PRIORITY_INTERACTIVE)
+
     def to_template(self):
         return {
             'date_add': self.date_add,
@@ -556,12 +684,139 @@ class MessageQueue (models.Model):
             'config': self.config,
             'result': self.result,
             'modified': self.modified,
-            'internal': self.internal
+            'internal': self.internal,
+            'priority': self.priority
         }
 
+    @property
+    def resource(self):
+        """ Resource the action works on. Actions on the same resource are executed in order """
+        return CONCURRENT_ACTIONS.get(self.action, "config")
+
+    @property
+    def timeout(self):
+        """ Time in seconds after which this action is reported as failed """
+        return settings.CLUSTER_ACTION_TIMEOUTS.get(self.action, settings.CLUSTER_ACTION_TIMEOUT)
+
+    @cached_property
+    def target_files(self):
+        """ Files written or deleted by an action of ORDERED_ACTIONS
+        :return: Set of paths, empty for other actions - None if the config cannot be parsed
+        """
+        if self.action not in ORDERED_ACTIONS:
+            return set()
+        try:
+            if self.action == "system.config.models.write_conf":
+                # Do not parse the content of the file, which may be large
+                return {WRITE_CONF_PATH.match(self.config).group(2)}
+            if self.config.startswith('['):
+                return set(literal_eval(self.config))
+            return {self.config}
+        except Exception:
+            return None
+
+    def overtakable_by(self, message):
+        """ Can an interactive message be executed before this one, queued earlier ?
+        Background messages working on a file used by the message are not,
+          nor background messages waiting for longer than CLUSTER_PRIORITY_AGING, to prevent starvation
+        :param message: The interactive MessageQueue
+        """
+        if self.priority >= PRIORITY_INTERACTIVE:
+            return False
+        if self.target_files is None or message.target_files is None:
+            # Unknown files, keep the order
+            if self.action in ORDERED_ACTIONS and message.action in ORDERED_ACTIONS:
+                return False
+        elif self.target_files & message.target_files:
+            return False
+        return (timezone.now() - self.modified).total_seconds() < settings.CLUSTER_PRIORITY_AGING
+
+    @staticmethod
+    def prioritize(messages):
+        """ Move interactive messages before the background messages queued before them,
+          that they can overtake
+        :param messages: Iterable of MessageQueue, ordered by queuing order
+        :return: List of MessageQueue, ordered by execution order
+        """
+        result = []
+        background = []
+        for message in messages:
+            if message.priority < PRIORITY_INTERACTIVE:
+                background.append(message)
+                continue
+            # Keep the message after the last background message it cannot overtake,
+            #  and the ones queued before it
+            for index in range(len(background) - 1, -1, -1):
+                if not background[index].overtakable_by(message):
+                    result.extend(background[:index + 1])
+                    background = background[index + 1:]
+                    break
+            result.append(message)
+
+        return result + background
+
+    @staticmethod
+    def coalesce(messages):
+        """ Group identical pending messages whose action is in COALESCABLE_ACTIONS.
+        Only the last occurrence is kept, so that it is executed after every message
+          that was queued before any of the occurrences
+        :param messages: Iterable of MessageQueue, ordered by execution order
+        :return: List of tuples (message to execute, [messages coalesced into it])
+        """
+        messages = list(messages)
+        last = {}
+        for message in messages:
+            if message.action in COALESCABLE_ACTIONS:
+                last[(message.action, message.config)] = message
+
+        result = []
+        coalesced = {}
+        for message in messages:
+            key = (message.action, message.config)
+            if key not in last:
+                result.append((message, []))
+            elif last[key] is not message:
+                coalesced.setdefault(key, []).append(message)
+            else:
+                result.append((message, coalesced.pop(key, [])))
+
+        return result
+
     def save(self, *args, **kwargs):
         self.modified = timezone.now()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        if self.status == "new":
+            self.notify()
+        return result
+
+    def notify(self):
+        """ Wake up the cluster daemon of the target node """
+        return MessageQueue.notify_nodes([self.node.name])
+
+    @staticmethod
+    def notify_nodes(node_names):
+        """ Wake up the cluster daemon of the given nodes
+        This is best effort : if the notification is lost,
+          the daemon will process the message at its next poll
+        :param node_names: Names of the nodes to notify
+        :return: True if the notifications have been published, False otherwise
+        """
+        if not node_names:
+            return True
+
+        try:
+            master_node = topology.redis_master(get_hostname())
+            # Publish on master, so that the message is propagated to all replicas
+            redis = RedisBase(node=master_node)
+            pipe = redis.redis.pipeline(transaction=False)
+            for node_name in node_names:
+                pipe.publish(MESSAGE_QUEUE_CHANNEL, node_name)
+            pipe.execute()
+        except Exception as e:
+            logger.error("MessageQueue::notify: Cannot notify nodes {}: {}".format(", ".join(node_names), str(e)))
+            return False
+
+        return True
 
 
 class NetworkInterfaceCard(models.Model):
@@ -0,0 +1,102 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Tests of the cluster messages scheduling'
+
+
+# Django system imports
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+# Django project imports
+from system.cluster.models import MessageQueue, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+# Extern modules imports
+from datetime import timedelta
+
+
+# Config of write_conf messages : [path, content, owner, permissions]
+HAPROXY_CONF = "['/usr/local/etc/haproxy.d/frontend_1.cfg', 'frontend ...', 'vlt-os:wheel', '644']"
+CERT_CONF = "['/var/db/pki/vulture-1.pem', '-----BEGIN CERTIFICATE-----', 'vlt-os:wheel', '640']"
+
+
+def message(action, config="", priority=PRIORITY_INTERACTIVE, age=0):
+    """ Unsaved MessageQueue, queued age seconds ago """
+    return MessageQueue(action=action, config=config, priority=priority,
+                        modified=timezone.now() - timedelta(seconds=age))
+
+
+class CoalesceTestCase(SimpleTestCase):
+
+    def test_last_occurrence_is_executed(self):
+        first = message("services.haproxy.haproxy.reload_service")
+        write = message("system.config.models.write_conf", HAPROXY_CONF)
+        last = message("services.haproxy.haproxy.reload_service")
+
+        self.assertEqual(MessageQueue.coalesce([first, write, last]), [(write, []), (last, [first])])
+
+    def test_configs_are_not_mixed(self):
+        first = message("services.rsyslogd.rsyslog.build_conf", "1")
+        second = message("services.rsyslogd.rsyslog.build_conf", "2")
+        third = message("services.rsyslogd.rsyslog.build_conf", "1")
+
+        self.assertEqual(MessageQueue.coalesce([first, second, third]), [(second, []), (third, [first])])
+
+    def test_other_actions_are_kept(self):
+        first = message("system.config.models.write_conf", HAPROXY_CONF)
+        second = message("system.config.models.write_conf", HAPROXY_CONF)
+
+        self.assertEqual(MessageQueue.coalesce([first, second]), [(first, []), (second, [])])
+
+
+class PrioritizeTestCase(SimpleTestCase):
+
+    def test_interactive_overtakes_background(self):
+        logrotate = message("services.logrotate.logrotate.reload_conf", priority=PRIORITY_BACKGROUND)
+        write = message("system.config.models.write_conf", CERT_CONF, priority=PRIORITY_BACKGROUND)
+        reload = message("services.haproxy.haproxy.reload_service")
+
+        self.assertEqual(MessageQueue.prioritize([logrotate, write, reload]), [reload, logrotate, write])
+
+    def test_aged_background_is_not_overtaken(self):
+        logrotate = message("services.logrotate.logrotate.reload_conf", priority=PRIORITY_BACKGROUND,
+                            age=settings.CLUSTER_PRIORITY_AGING + 1)
+        reload = message("services.haproxy.haproxy.reload_service")
+
+        self.assertEqual(MessageQueue.prioritize([logrotate, reload]), [logrotate, reload])
+
+    def test_same_file_is_not_overtaken(self):
+        cert = message("system.config.models.write_conf", CERT_CONF, priority=PRIORITY_BACKGROUND)
+        haproxy = message("system.config.models.write_conf", HAPROXY_CONF, priority=PRIORITY_BACKGROUND)
+        delete = message("system.config.models.delete_conf",
+                         "['/var/db/pki/vulture-1.pem', '/var/db/pki/vulture-1.key']")
+
+        self.assertEqual(MessageQueue.prioritize([cert, haproxy, delete]), [cert, delete, haproxy])
+
+    def test_target_files(self):
+        self.assertEqual(message("system.config.models.write_conf", CERT_CONF).target_files,
+                         {"/var/db/pki/vulture-1.pem"})
+        self.assertEqual(message("system.config.models.delete_conf", "/var/db/pki/vulture-1.pem").target_files,
+                         {"/var/db/pki/vulture-1.pem"})
+        self.assertEqual(message("services.haproxy.haproxy.reload_service").target_files, set())
+        self.assertIsNone(message("system.config.models.write_conf", "invalid").target_files)
@@ -0,0 +1,198 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Process-wide cache of the cluster topology'
+
+
+# Django system imports
+from django.conf import settings
+
+# Django project imports
+from toolkit.mongodb.mongo_base import MongoBase
+from toolkit.network.network import get_management_ip
+from toolkit.redis.redis_base import RedisBase
+
+# Extern modules imports
+from pymongo import monitoring
+from pymongo.server_type import SERVER_TYPE
+from threading import Event, Lock, Thread
+from time import time
+
+# Logger configuration imports
+import logging
+logger = logging.getLogger('system')
+
+
+# Sentinel event published when the Redis master changes
+SENTINEL_SWITCH_MASTER = "+switch-master"
+
+
+class ClusterTopology:
+    """
+    Cache of the primary MongoDB node, of the MongoDB replicaset members,
+      and of the Redis master seen by each node.
+    Entries expire after settings.CLUSTER_TOPOLOGY_TTL seconds, and are refreshed by a background thread.
+    They are invalidated on MongoDB primary change or on Sentinel switch-master event.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or settings.CLUSTER_TOPOLOGY_TTL
+        # { key: (value, expiration time) }
+        self.cache = {}
+        # { key: last access time }, entries not accessed anymore are not refreshed
+        self.accessed = {}
+        self.lock = Lock()
+        self.invalidated = Event()
+        self.thread = None
+
+    def invalidate(self):
+        with self.lock:
+            self.cache = {}
+        self.invalidated.set()
+
+    def _get(self, key, refresh_func):
+        """ Return the cached value of key, or refresh it if expired """
+        self._start()
+        with self.lock:
+            self.accessed[key] = time()
+            value, expire = self.cache.get(key, (None, 0))
+        if expire > time():
+            return value
+
+        value = refresh_func()
+        # Do not cache failures
+        if value is not None:
+            with self.lock:
+                self.cache[key] = (value, time() + self.ttl)
+        return value
+
+    def _refresh_mongo(self):
+        """ Retrieve primary and members of the replicaset with one connection
+        :return: Tuple (primary, [members]), or None in case of failure
+        """
+        c = MongoBase()
+        if not c.connect():
+            return None
+        try:
+            # isMaster has no primary while an election is in progress
+            primary = c.get_primary() or False
+            config = c.db.admin.command("replSetGetConfig")['config']
+            return primary, [member['host'] for member in config['members']]
+        except Exception as e:
+            logger.error("ClusterTopology::refresh_mongo: {}".format(str(e)))
+            return None
+
+    def _refresh_redis(self, node_name):
+        master = RedisBase().get_master(node_name)
+        # get_master returns None in case of failure, False if the role is unknown
+        return master
+
+    def mongo_primary(self):
+        """ :return: The primary MongoDB node "host:port", False if there is none, None in case of failure """
+        res = self._get("mongo", self._refresh_mongo)
+        return res[0] if res else None
+
+    def mongo_members(self):
+        """ :return: The list of "host:port" of the replicaset members, None in case of failure """
+        res = self._get("mongo", self._refresh_mongo)
+        return res[1] if res else None
+
+    def redis_master(self, node_name):
+        """ :return: The Redis master seen by the given node, None in case of failure """
+        return self._get("redis_{}".format(node_name), lambda: self._refresh_redis(node_name))
+
+    def _start(self):
+        """ Start the background thread, once per process """
+        if self.thread and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = Thread(target=self._run, name="ClusterTopology", daemon=True)
+            self.thread.start()
+
+    def _subscribe_sentinel(self):
+        try:
+            listener = RedisBase(get_management_ip(), 26379).redis.pubsub()
+            listener.subscribe([SENTINEL_SWITCH_MASTER])
+            return listener
+        except Exception as e:
+            logger.debug("ClusterTopology: cannot subscribe to sentinel events: {}".format(str(e)))
+            return None
+
+    def _run(self):
+        """ Invalidate the cache on sentinel events, and refresh expired entries """
+        listener = None
+        while True:
+            try:
+                if not listener:
+                    listener = self._subscribe_sentinel()
+
+                if listener:
+                    if listener.get_message(ignore_subscribe_messages=True, timeout=self.ttl / 2):
+                        logger.info("ClusterTopology: Redis master switched, invalidating cache")
+                        self.invalidate()
+                else:
+                    self.invalidated.wait(self.ttl / 2)
+                self.invalidated.clear()
+
+                """ Refresh entries before their expiration, if they have been used recently """
+                with self.lock:
+                    keys = [key for key, (value, expire) in self.cache.items()
+                            if expire - time() < self.ttl / 2 and time() - self.accessed.get(key, 0) < 10 * self.ttl]
+                for key in keys:
+                    value = self._refresh_mongo() if key == "mongo" else self._refresh_redis(key[len("redis_"):])
+                    if value is not None:
+                        with self.lock:
+                            self.cache[key] = (value, time() + self.ttl)
+            except Exception as e:
+                logger.error("ClusterTopology: {}".format(str(e)))
+                listener = None
+                self.invalidated.wait(self.ttl)
+
+
+class PrimaryChangeListener(monitoring.TopologyListener):
+    """ Invalidate the topology cache when the primary of a replicaset known by this process changes """
+
+    @staticmethod
+    def get_primary(description):
+        for server in description.server_descriptions().values():
+            if server.server_type == SERVER_TYPE.RSPrimary:
+                return server.address
+        return None
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        previous_primary = self.get_primary(event.previous_description)
+        # Ignore the discovery of the primary by a new client
+        if previous_primary and previous_primary != self.get_primary(event.new_description):
+            logger.info("ClusterTopology: MongoDB primary changed, invalidating cache")
+            topology.invalidate()
+
+    def closed(self, event):
+        pass
+
+
+topology = ClusterTopology()
+monitoring.register(PrimaryChangeListener())
@@ -25,6 +25,7 @@ __doc__ = 'Cluster URLS'
 
 from django.urls import path, re_path
 from system.cluster import views, api
+from system.cluster.metrics import MessageQueueMetrics
 from system.generic_delete import DeleteNode
 from system.generic_list import ListNode
 
@@ -57,6 +58,11 @@ urlpatterns = [
          api.cluster_info,
          name="system.cluster.info"),
 
+    path('api/v1/system/cluster/metrics/',
+         api.metrics_api,
+         {'metrics_class': MessageQueueMetrics},
+         name="system.cluster.metrics"),
+
     path('api/v1/system/node/', api.NodeAPIv1.as_view(), name="system.node.api"),
 
     path('api/v1/system/node/<int:object_id>/', api.NodeAPIv1.as_view(), name="system.node.api"),
@@ -37,6 +37,7 @@ from subprocess import CalledProcessError
 
 # Extern modules imports
 from ast import literal_eval
+from hashlib import sha1
 from tempfile import mktemp
 from re import match as re_match
 from subprocess import check_output, PIPE
@@ -116,6 +117,60 @@ class Config(models.Model):
         return True, ""
 
 
+class RenderedConf(models.Model):
+    """
+    Configuration rendered for an object (Frontend, Backend, ...) on a node.
+    Stored out of the object document so that listing objects does not load their configurations,
+      and identified by its hash so that an unchanged configuration is never rewritten
+    """
+    """ Model of the object, ex: "services.frontend" """
+    object_type = models.TextField()
+    object_id = models.IntegerField()
+    """ Name of the node, empty if the configuration is the same on all nodes """
+    node = models.TextField(default="")
+    """ SHA1 of the configuration """
+    hash = models.TextField()
+    conf = models.TextField(default="")
+
+    class Meta:
+        app_label = "system"
+        unique_together = ("object_type", "object_id", "node", "hash")
+
+    @staticmethod
+    def get_hash(conf):
+        return sha1(conf.encode('utf8')).hexdigest()
+
+    @classmethod
+    def get_confs(cls, obj):
+        """ Load the configurations of an object
+        :return: Dict {node_name: conf}
+        """
+        return {rendered.node: rendered.conf
+                for rendered in cls.objects.filter(object_type=obj._meta.label_lower, object_id=obj.pk)}
+
+    @classmethod
+    def set_confs(cls, obj, confs):
+        """ Save the configurations of an object, only the modified ones are written
+        :param confs: Dict {node_name: conf}, configurations of other nodes are deleted
+        """
+        current = {rendered.node: rendered for rendered in
+                   cls.objects.filter(object_type=obj._meta.label_lower, object_id=obj.pk).only('node', 'hash')}
+        for node_name, conf in confs.items():
+            conf_hash = cls.get_hash(conf or "")
+            rendered = current.pop(node_name, None)
+            if rendered is None:
+                cls.objects.create(object_type=obj._meta.label_lower, object_id=obj.pk, node=node_name,
+                                   hash=conf_hash, conf=conf or "")
+            elif rendered.hash != conf_hash:
+                cls.objects.filter(pk=rendered.pk).update(hash=conf_hash, conf=conf or "")
+        if current:
+            cls.objects.filter(pk__in=[rendered.pk for rendered in current.values()]).delete()
+
+    @classmethod
+    def delete_confs(cls, obj):
+        cls.objects.filter(object_type=obj._meta.label_lower, object_id=obj.pk).delete()
+
+
 def write_conf(logger, args):
     """ Dedicated method used to write a file on disk """
     # parse arguments because we can be called by asynchronous api
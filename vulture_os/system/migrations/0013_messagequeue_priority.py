@@ -0,0 +1,27 @@
+# Generated by Django 2.1.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+def forwards_func(apps, schema_editor):
+    messagequeue_model = apps.get_model("system", "MessageQueue")
+    db_alias = schema_editor.connection.alias
+
+    # Internal messages are executed in background
+    messagequeue_model.objects.using(db_alias).filter(internal=True).update(priority=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0012_auto_20200915_1556'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagequeue',
+            name='priority',
+            field=models.SmallIntegerField(default=1),
+        ),
+        migrations.RunPython(forwards_func, migrations.RunPython.noop)
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.1.3 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from hashlib import sha1
+
+
+def forwards_func(apps, schema_editor):
+    renderedconf_model = apps.get_model("system", "RenderedConf")
+    frontend_model = apps.get_model("services", "Frontend")
+    backend_model = apps.get_model("applications", "Backend")
+    db_alias = schema_editor.connection.alias
+
+    # Move the configurations out of the Frontend and Backend documents
+    for frontend in frontend_model.objects.using(db_alias).all().only('id', 'configuration'):
+        for node_name, conf in (frontend.configuration or {}).items():
+            if conf:
+                renderedconf_model.objects.using(db_alias).create(object_type="services.frontend",
+                                                                  object_id=frontend.pk, node=node_name,
+                                                                  hash=sha1(conf.encode('utf8')).hexdigest(),
+                                                                  conf=conf)
+
+    for backend in backend_model.objects.using(db_alias).all().only('id', 'configuration'):
+        if backend.configuration and backend.configuration != "{}":
+            renderedconf_model.objects.using(db_alias).create(object_type="applications.backend",
+                                                              object_id=backend.pk, node="",
+                                                              hash=sha1(backend.configuration.encode('utf8')).hexdigest(),
+                                                              conf=backend.configuration)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0013_messagequeue_priority'),
+        ('services', '0020_auto_20200915_2056'),
+        ('applications', '0010_auto_20200602_1549'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedConf',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.TextField()),
+                ('object_id', models.IntegerField()),
+                ('node', models.TextField(default='')),
+                ('hash', models.TextField()),
+                ('conf', models.TextField(default='')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='renderedconf',
+            unique_together={('object_type', 'object_id', 'node', 'hash')},
+        ),
+        migrations.RunPython(forwards_func, migrations.RunPython.noop)
+    ]
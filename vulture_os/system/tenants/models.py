@@ -80,6 +80,9 @@ class Tenants(models.Model):
         app_label = "system"
 
     def reload_frontends_conf(self):
+        from system.cluster.models import Cluster
+        requests = []
         for frontend in self.frontend_set.filter(enabled=True, enable_logging=True):
             for node in frontend.get_nodes():
-                node.api_request("services.rsyslogd.rsyslog.build_conf", frontend.id)
+                requests.append((node, "services.rsyslogd.rsyslog.build_conf", frontend.id))
+        return Cluster.api_requests(requests)
@@ -0,0 +1,66 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Tests of the parsing of the vm-bhyve commands'
+
+
+# Django system imports
+from django.test import SimpleTestCase
+
+# Django project imports
+from system.vm.vm import parse_vm_list
+
+
+# Output of "vm list"
+VM_LIST = """NAME      DATASTORE  LOADER  CPU  MEMORY  VNC           AUTOSTART  STATE
+alpine    default    grub    1    512M    -             No         Stopped
+kali      default    uefi    2    2G      0.0.0.0:5900  Yes [1]    Running (29774)
+"""
+
+
+class ParseVMListTestCase(SimpleTestCase):
+
+    def test_vms(self):
+        self.assertEqual(parse_vm_list(VM_LIST), {
+            'alpine': {
+                'datastore': "default",
+                'loader': "grub",
+                'cpu': "1",
+                'ram': "512M",
+                'vnc': "-",
+                'autostart': "No",
+                'status': "Stopped"
+            },
+            'kali': {
+                'datastore': "default",
+                'loader': "uefi",
+                'cpu': "2",
+                'ram': "2G",
+                'vnc': "0.0.0.0:5900",
+                'autostart': "Yes",
+                'status': "Running"
+            }
+        })
+
+    def test_no_vm(self):
+        self.assertEqual(parse_vm_list("NAME  DATASTORE  LOADER  CPU  MEMORY  VNC  AUTOSTART  STATE\n"), {})
+        self.assertEqual(parse_vm_list(""), {})
@@ -28,7 +28,9 @@ from django.conf import settings
 # Django project imports
 from system.vm.models import VM
 from system.cluster.models import Cluster
+from toolkit.mongodb.mongo_base import MongoBase
 
+from pymongo import DeleteOne, UpdateOne
 from subprocess import Popen, PIPE
 
 # Logger configuration imports
@@ -98,47 +100,66 @@ def stop_vm(logger, object_id):
         logger.error ("VM {} NOT stopped. Error is: {}".format(vm.name, error))
         return False
 
-def vm_update_status():
+def parse_vm_list(output):
+    """ Parse the output of "vm list"
+    :param output: Output of the command, ex:
+        NAME     DATASTORE  LOADER  CPU  MEMORY  VNC  AUTOSTART  STATE
+        Kali     default    grub    2    2G      -    Yes [1]    Running (29774)
+    :return: Dict {name: {datastore, loader, cpu, ram, vnc, autostart, status}}
+    """
+    result = {}
+    for line in output.split("\n"):
+        tmp = line.split()
+        if len(tmp) < 8 or tmp[0] == "NAME":
+            continue
+        result[tmp[0]] = {
+            'datastore': tmp[1],
+            'loader': tmp[2],
+            'cpu': tmp[3],
+            'ram': tmp[4],
+            'vnc': tmp[5],
+            'autostart': tmp[6],
+            # The autostart column is followed by the boot order, ex: "Yes [1]"
+            'status': tmp[7] if tmp[6] == "No" or len(tmp) < 9 else tmp[8]
+        }
+    return result
+
 
+def vm_update_status():
+    """ Reconcile the VMs of the current node with the output of "vm list" :
+     unchanged VMs are not written, changed ones are updated with one bulk write,
+     and VMs which no longer exist are deleted in the same bulk write
+    """
     proc = Popen(['/usr/local/bin/sudo', '/usr/local/sbin/vm', 'list'], stdout=PIPE, stderr=PIPE)
     success, error = proc.communicate()
-    if not error:
+    if error:
+        logger.error("VM::vm_update_status: 'vm list' failed: {}".format(error.decode('utf-8')))
+        return False
+
+    system_vms = parse_vm_list(success.decode('utf-8'))
+    node = Cluster.get_current_node()
+    fields = ('datastore', 'loader', 'cpu', 'ram', 'vnc', 'autostart', 'status')
+
+    requests = []
+    for stored in VM.objects.filter(node=node).values('id', 'name', *fields):
+        values = system_vms.pop(stored['name'], None)
+        if values is None:
+            logger.info("VM has disapear: {}".format(stored['name']))
+            requests.append(DeleteOne({VM._meta.pk.column: stored['id']}))
+            continue
+
+        changes = {field: value for field, value in values.items() if stored[field] != value}
+        if changes:
+            logger.debug("Updating VM {}: {}".format(stored['name'], changes))
+            requests.append(UpdateOne({VM._meta.pk.column: stored['id']}, {'$set': changes}))
+
+    if requests and not MongoBase().bulk_write(settings.DATABASES['default']['NAME'], VM._meta.db_table,
+                                               requests):
+        return False
+
+    # New VMs are created through the ORM, which allocates their id
+    for name, values in system_vms.items():
+        logger.info("New VM {}".format(name))
+        VM.objects.create(node=node, name=name, **values)
 
-        for s in success.decode('utf-8').split('\n'):
-            #['Kali', 'default', 'grub', '2', '2G', '-', 'Yes', '[1]', 'Running', '(29774)']
-            tmp = " ".join(s.split()).split(" ")
-            if tmp[0] == "NAME" or tmp[0] == "":
-                continue
-
-
-            logger.debug("Updating VM {}".format(tmp[0]))
-            vm, created = VM.objects.get_or_create(node=Cluster.get_current_node(), name=tmp[0])
-            vm.name = tmp[0]
-            vm.datastore = tmp[1]
-            vm.loader = tmp[2]
-            vm.cpu = tmp[3]
-            vm.ram = tmp[4]
-            vm.vnc = tmp[5]
-            vm.autostart = tmp[6]
-            if tmp[6] == "No":
-                vm.status = tmp[7]
-            else:
-                vm.status = tmp[8]
-
-            vm.save()
-
-        #Delete VM that no longer exists in system
-        for vm in VM.objects.all():
-            is_good=False
-            for s in success.decode('utf-8').split('\n'):
-                tmp = " ".join(s.split()).split(" ")
-                if tmp[0] == "NAME":
-                    continue
-
-                if vm.name == tmp[0]:
-                    is_good=True
-                    break
-
-            if not is_good:
-                logger.info("VM has disapear: {}".format (vm.name))
-                vm.delete()
+    return True
@@ -0,0 +1,270 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Benchmark of the Darwin alerts reconciliation, with synthetic traffic'
+
+"""
+Drives the ReconcileJob workers against a local Redis and MongoDB, or their in-memory stand-ins,
+ and reports the throughput, the end-to-end latency (push of the alert -> insertion in MongoDB) and the memory.
+
+Usage, from /home/vlt-os/vulture_os:
+    python -m toolkit.benchmark.reconcile --rate 5000 --duration 30 --miss-ratio 0.1 --late-ratio 0.2
+    python -m toolkit.benchmark.reconcile --redis redis://127.0.0.1:6380/0 --mongo mongodb://127.0.0.1:27018
+
+Never point it to the Redis and MongoDB of a running node :
+ it uses the same Redis keys as the reconcile daemon, whose workers would reconcile the synthetic alerts.
+It refuses to start on the default Redis instance of a node (unix socket or port 6379),
+ or if reconcile workers have reported in the Redis, or if the alerts list is not empty.
+Stand-ins: fakeredis (with lupa, for the Lua script of the retries) and mongomock, if installed.
+"""
+
+import sys
+import os
+
+# Django setup part
+sys.path.append('/home/vlt-os/vulture_os')
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", 'vulture_os.settings')
+
+import django
+from django.conf import settings
+django.setup()
+
+from daemons.reconcile import (AlertsFile, ReconcileJob, get_alerts_stats, REDIS_COUNTERS, REDIS_LIST,
+                               REDIS_PROCESSING, REDIS_PROCESSING_RETRY, REDIS_RETRY_SET, REDIS_WORKERS)
+from toolkit.mongodb.mongo_base import MongoBase
+from toolkit.redis.redis_base import REDIS_SOCKET
+
+from argparse import ArgumentParser
+from collections import deque
+from datetime import datetime, timezone
+from resource import getrusage, RUSAGE_SELF
+from tempfile import NamedTemporaryFile
+from threading import Event, Lock, Thread
+from time import sleep, time
+from types import SimpleNamespace
+from uuid import uuid4
+import json
+import tracemalloc
+
+
+BENCHMARK_DATABASE = "benchmark"
+# Port of the Redis instance of the nodes
+NODE_REDIS_PORT = 6379
+
+
+def parse_args():
+    parser = ArgumentParser(description="Benchmark of the Darwin alerts reconciliation")
+    parser.add_argument('--rate', type=int, default=1000, help="Alerts pushed per second (default: 1000)")
+    parser.add_argument('--duration', type=int, default=10, help="Seconds of traffic (default: 10)")
+    parser.add_argument('--payload', type=int, default=256, help="Size of the padding of each alert, in bytes")
+    parser.add_argument('--miss-ratio', type=float, default=0.0,
+                        help="Ratio of alerts whose context never arrives (default: 0)")
+    parser.add_argument('--late-ratio', type=float, default=0.0,
+                        help="Ratio of alerts whose context arrives after --late-delay (default: 0)")
+    parser.add_argument('--late-delay', type=float, default=1.0, help="Delay of the late contexts, in seconds")
+    parser.add_argument('--workers', type=int, default=settings.RECONCILE_WORKERS, help="Number of workers")
+    parser.add_argument('--batch-size', type=int, default=settings.RECONCILE_BATCH_SIZE)
+    parser.add_argument('--context-timeout', type=float, default=settings.RECONCILE_CONTEXT_TIMEOUT)
+    parser.add_argument('--redis', help="URL of a dedicated Redis server, fakeredis if not given")
+    parser.add_argument('--mongo', help="URI of a dedicated MongoDB server, mongomock if not given")
+    parser.add_argument('--drain-timeout', type=int, default=60,
+                        help="Maximum seconds to wait for the workers after the traffic (default: 60)")
+    return parser.parse_args()
+
+
+def get_redis(url):
+    """ Redis client wrapped like a RedisBase """
+    if url:
+        from redis import Redis
+        client = Redis.from_url(url)
+        connection = client.connection_pool.connection_kwargs
+        if connection.get('path') == REDIS_SOCKET or connection.get('port', NODE_REDIS_PORT) == NODE_REDIS_PORT:
+            sys.exit("{} is the Redis instance of a node: use a dedicated Redis server".format(url))
+    else:
+        import fakeredis
+        client = fakeredis.FakeStrictRedis()
+    try:
+        client.eval("return 1", 0)
+    except Exception as e:
+        sys.exit("Lua scripts are not supported by this Redis ({}): install lupa or use --redis".format(e))
+    return SimpleNamespace(redis=client)
+
+
+class BenchmarkMongo(MongoBase):
+    """ MongoBase inserting in the benchmark database, and measuring the end-to-end latency of each alert """
+
+    def __init__(self, client):
+        super().__init__()
+        self.db = client
+        self.lock = Lock()
+        self.latencies = []
+
+    def insert_many(self, database, collection, documents, ordered=False):
+        result = super().insert_many(BENCHMARK_DATABASE, collection, documents, ordered)
+        now = time()
+        with self.lock:
+            self.latencies.extend(now - document['bench_ts'] for document in documents if 'bench_ts' in document)
+        return result
+
+
+def get_mongo(uri):
+    if uri:
+        from pymongo import MongoClient
+        client = MongoClient(uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    client.drop_database(BENCHMARK_DATABASE)
+    return BenchmarkMongo(client)
+
+
+def producer(redis, args, stop, pushed):
+    """ Push alerts at the given rate, as Darwin does : the context with SET, then the alert with LPUSH """
+    padding = "x" * args.payload
+    interval = 0.01
+    per_tick = max(1, int(args.rate * interval))
+    late = deque()
+    start = time()
+    while not stop.is_set() and time() - start < args.duration:
+        tick = time()
+        pipe = redis.redis.pipeline(transaction=False)
+        for i in range(per_tick):
+            evt_id = uuid4().hex
+            now = time()
+            alert = {
+                'evt_id': evt_id,
+                'time': datetime.now(timezone.utc).strftime("%Y-%m-%d%Z%H:%M:%S%z"),
+                'filter': "benchmark",
+                'certitude': 100,
+                'bench_ts': now,
+                'padding': padding
+            }
+            context = json.dumps({'time': alert['time'], 'src_ip': "10.0.0.1", 'padding': padding})
+            draw = (pushed[0] + i) % 1000 / 1000
+            if draw < args.miss_ratio:
+                pass
+            elif draw < args.miss_ratio + args.late_ratio:
+                late.append((now + args.late_delay, evt_id, context))
+            else:
+                pipe.set(evt_id, context, ex=60)
+            pipe.lpush(REDIS_LIST, json.dumps(alert))
+        while late and late[0][0] <= tick:
+            _, evt_id, context = late.popleft()
+            pipe.set(evt_id, context, ex=60)
+        pipe.execute()
+        pushed[0] += per_tick
+        sleep(max(0, interval - (time() - tick)))
+
+    # Remaining late contexts
+    while late and not stop.is_set():
+        sleep(max(0, late[0][0] - time()))
+        _, evt_id, context = late.popleft()
+        redis.redis.set(evt_id, context, ex=60)
+
+
+def worker(job, mongo, redis, log_file):
+    """ Loop of ReconcileJob.reconcile, without the node and topology lookups """
+    while not job.shutdown_flag.is_set():
+        job.pops(mongo, redis, log_file, timeout=min(job.flush_interval, job.retry_interval))
+        job.retries(mongo, redis, log_file)
+        log_file.flush(job.flush_interval)
+        job.report(redis)
+
+
+def percentile(values, ratio):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def main():
+    args = parse_args()
+    redis = get_redis(args.redis)
+    if redis.redis.exists(REDIS_WORKERS):
+        sys.exit("Reconcile workers use this Redis: use a dedicated Redis server")
+    if redis.redis.llen(REDIS_LIST) or redis.redis.zcard(REDIS_RETRY_SET):
+        sys.exit("The alerts list of this Redis is not empty: use a dedicated Redis server")
+    redis.redis.delete(REDIS_COUNTERS, REDIS_WORKERS)
+    mongo = get_mongo(args.mongo)
+
+    tracemalloc.start()
+    log_path = NamedTemporaryFile(prefix="reconcile-benchmark-", suffix=".log", delete=False).name
+    log_file = AlertsFile(log_path)
+
+    jobs, threads = [], []
+    for index in range(args.workers):
+        job = ReconcileJob(0, index)
+        job.worker_name = "benchmark:{}".format(index)
+        job.batch_size = args.batch_size
+        job.context_timeout = args.context_timeout
+        jobs.append(job)
+        threads.append(Thread(target=worker, args=(job, mongo, redis, log_file), daemon=True))
+
+    stop, pushed = Event(), [0]
+    start = time()
+    for thread in threads:
+        thread.start()
+    producer_thread = Thread(target=producer, args=(redis, args, stop, pushed), daemon=True)
+    producer_thread.start()
+    producer_thread.join()
+    traffic_end = time()
+
+    # Wait for the workers to handle every alert, including the parked ones
+    deadline = time() + args.drain_timeout
+    while time() < deadline:
+        pending = redis.redis.llen(REDIS_LIST) + redis.redis.zcard(REDIS_RETRY_SET) + sum(
+            redis.redis.llen(key.format(job.worker_name))
+            for job in jobs for key in (REDIS_PROCESSING, REDIS_PROCESSING_RETRY))
+        if not pending:
+            break
+        sleep(0.1)
+    end = time()
+
+    for job in jobs:
+        job.ask_shutdown()
+    for thread in threads:
+        thread.join()
+    log_file.flush()
+
+    current, peak = tracemalloc.get_traced_memory()
+    latencies = sorted(mongo.latencies)
+    stats = get_alerts_stats(redis)
+    print("Alerts pushed:           {} in {:.1f}s ({:.0f}/s)".format(pushed[0], traffic_end - start,
+                                                                    pushed[0] / (traffic_end - start)))
+    print("Alerts inserted:         {} in {:.1f}s ({:.0f}/s)".format(len(latencies), end - start,
+                                                                    len(latencies) / (end - start)))
+    print("Not drained:             {}".format(pushed[0] - len(latencies)))
+    print("Latency p50 / p99 / max: {:.3f}s / {:.3f}s / {:.3f}s".format(
+        percentile(latencies, 0.5), percentile(latencies, 0.99), latencies[-1] if latencies else 0))
+    print("Counters:                {}".format(json.dumps(stats['counters'], sort_keys=True)))
+    print("Python memory peak:      {:.1f} MB".format(peak / 1024 / 1024))
+    # ru_maxrss is in kilobytes on Linux and FreeBSD
+    print("Max RSS:                 {:.1f} MB".format(getrusage(RUSAGE_SELF).ru_maxrss / 1024))
+
+    os.remove(log_path)
+    mongo.db.drop_database(BENCHMARK_DATABASE)
+    # The reports of the benchmark workers would prevent the next run
+    redis.redis.delete(REDIS_COUNTERS, REDIS_WORKERS)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,17 +24,72 @@ __doc__ = 'System Utils Database Toolkit'
 
 
 from pymongo import MongoClient, ReadPreference
-from pymongo.errors import OperationFailure
+from pymongo.errors import BulkWriteError, OperationFailure
 from toolkit.network.network import get_hostname
 from django.conf import settings
 from re import search as re_search
+from threading import Lock
 import subprocess
 import logging
+import os
 
 # No database logging to prevent infinite loop
 logger = logging.getLogger('system')
 
 
+# Code of the "E11000 duplicate key" write error
+DUPLICATE_KEY_ERROR = 11000
+
+# Process-wide registry of MongoClient, keyed by (host, replicaset, read preference)
+_clients = {}
+_clients_pid = os.getpid()
+_clients_lock = Lock()
+
+
+def reset_clients():
+    """ Forget the MongoClient created by the parent process.
+    MongoClient is not fork-safe : a child process must create its own clients.
+    Inherited clients are not closed, their sockets are still used by the parent
+    """
+    global _clients, _clients_pid, _clients_lock
+    _clients = {}
+    _clients_pid = os.getpid()
+    # The lock may have been held by another thread of the parent while forking
+    _clients_lock = Lock()
+
+
+os.register_at_fork(after_in_child=reset_clients)
+
+
+def get_client(host, replicaset=None, read_preference=ReadPreference.PRIMARY_PREFERRED):
+    """ Return a shared MongoClient (with its connection pool) for the given parameters
+    :param host:            MongoDB URI
+    :param replicaset:      Name of the replicaset, or None for a direct connection
+    :param read_preference: pymongo ReadPreference
+    :return: MongoClient
+    """
+    if _clients_pid != os.getpid():
+        reset_clients()
+
+    key = (host, replicaset, read_preference.name)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            args = {'host': host,
+                    'ssl': True,
+                    'ssl_certfile': "/var/db/pki/node.pem",
+                    'ssl_ca_certs': "/var/db/pki/ca.pem",
+                    'read_preference': read_preference,
+                    'maxPoolSize': settings.MONGO_POOL_SIZE,
+                    'maxIdleTimeMS': settings.MONGO_POOL_IDLE_MS}
+            if replicaset:
+                args['replicaset'] = replicaset
+            client = MongoClient(**args)
+            _clients[key] = client
+
+    return client
+
+
 def parse_uristr(uristr):
     """ Parse uristr and returns list of tuples (ip|host, port) """
     result = []
@@ -72,7 +127,11 @@ class MongoBase:
 
         return MongoBase.get_local_uri()
 
-    def execute_aggregation(self, database, collection, agg):
+    def execute_aggregation(self, database, collection, agg, allow_disk_use=False, max_time_ms=None):
+        """ Run an aggregation pipeline
+        :param allow_disk_use: Let the blocking stages ($sort, $group) use temporary files beyond 100MB
+        :param max_time_ms:    Maximum execution time of the pipeline on the server, in milliseconds
+        """
         try:
             if not self.db:
                 self.connect()
@@ -80,7 +139,12 @@ class MongoBase:
             db = self.db[database]
             coll = db[collection]
 
-            res = coll.aggregate(agg)
+            options = {}
+            if allow_disk_use:
+                options['allowDiskUse'] = True
+            if max_time_ms:
+                options['maxTimeMS'] = max_time_ms
+            res = coll.aggregate(agg, **options)
             return res
 
         except Exception as e:
@@ -113,6 +177,75 @@ class MongoBase:
             logger.critical(e, exc_info=1)
             return 0, []
 
+    def find(self, database, collection, query, projection=None):
+        """ Return the list of documents matching query, in one round-trip (no count) """
+        try:
+            if not self.db:
+                self.connect()
+
+            db = self.db[database]
+            coll = db[collection]
+
+            return list(coll.find(query, projection))
+
+        except Exception as e:
+            if settings.DEV_MODE:
+                raise
+
+            logger.critical(e, exc_info=1)
+            return []
+
+    def find_page(self, database, collection, query, sort, limit=0, skip=0, max_time_ms=None):
+        """ Return a page of the documents matching query, in one round-trip
+        :param sort:        List of (field, direction)
+        :param limit:       Maximum number of documents, 0 for all
+        :param max_time_ms: Maximum execution time of the query on the server, in milliseconds
+        """
+        try:
+            if not self.db:
+                self.connect()
+
+            db = self.db[database]
+            coll = db[collection]
+
+            cursor = coll.find(query).sort(sort).skip(skip).limit(limit)
+            if max_time_ms:
+                cursor = cursor.max_time_ms(max_time_ms)
+            return list(cursor)
+
+        except Exception as e:
+            if settings.DEV_MODE:
+                raise
+
+            logger.critical(e, exc_info=1)
+            return []
+
+    def count(self, database, collection, query, limit=None, max_time_ms=None):
+        """ Count the documents matching query
+        :param limit: Stop counting after this number of documents
+        :return: The number of documents, None in case of failure (ex: max_time_ms exceeded)
+        """
+        try:
+            if not self.db:
+                self.connect()
+
+            db = self.db[database]
+            coll = db[collection]
+
+            options = {}
+            if limit:
+                options['limit'] = limit
+            if max_time_ms:
+                options['maxTimeMS'] = max_time_ms
+            return coll.count_documents(query, **options)
+
+        except Exception as e:
+            if settings.DEV_MODE:
+                raise
+
+            logger.critical(e, exc_info=1)
+            return None
+
     def insert(self, database, collection, data):
         try:
             if not self.db:
@@ -130,6 +263,39 @@ class MongoBase:
             logger.critical(e, exc_info=1)
             return False
 
+    def insert_many(self, database, collection, documents, ordered=False):
+        """ Insert a list of documents in one round-trip
+        Documents whose _id already exists are ignored : documents with a deterministic _id can be inserted again
+        """
+        if not documents:
+            return True
+        try:
+            if not self.db:
+                self.connect()
+
+            db = self.db[database]
+            coll = db[collection]
+
+            coll.insert_many(documents, ordered=ordered)
+            return True
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if errors and all(error.get('code') == DUPLICATE_KEY_ERROR for error in errors) \
+                    and not e.details.get('writeConcernErrors'):
+                logger.info("MongoBase::insert_many: {} document(s) already inserted".format(len(errors)))
+                return True
+            if settings.DEV_MODE:
+                raise
+
+            logger.critical(e, exc_info=1)
+            return False
+        except Exception as e:
+            if settings.DEV_MODE:
+                raise
+
+            logger.critical(e, exc_info=1)
+            return False
+
     def update_one(self, database, collection, query, newvalue):
         try:
             if not self.db:
@@ -147,6 +313,43 @@ class MongoBase:
             logger.critical(e, exc_info=1)
             return False
 
+    def upsert_one(self, database, collection, query, newvalue):
+        try:
+            if not self.db:
+                self.connect()
+
+            db = self.db[database]
+            coll = db[collection]
+
+            coll.update_one(query, newvalue, upsert=True)
+            return True
+        except Exception as e:
+            if settings.DEV_MODE:
+                raise
+
+            logger.critical(e, exc_info=1)
+            return False
+
+    def bulk_write(self, database, collection, requests, ordered=False):
+        """ Send a list of write operations (pymongo UpdateOne, InsertOne, ...) in one round-trip """
+        if not requests:
+            return True
+        try:
+            if not self.db:
+                self.connect()
+
+            db = self.db[database]
+            coll = db[collection]
+
+            coll.bulk_write(requests, ordered=ordered)
+            return True
+        except Exception as e:
+            if settings.DEV_MODE:
+                raise
+
+            logger.critical(e, exc_info=1)
+            return False
+
     def update_one(self, database, query, newvalue):
         try:
             if not self.db:
@@ -172,14 +375,7 @@ class MongoBase:
             else:
                 host = self.get_replicaset_uri()
 
-            args = {'host': host,
-                    'ssl': True,
-                    'ssl_certfile': "/var/db/pki/node.pem",
-                    'ssl_ca_certs': "/var/db/pki/ca.pem",
-                    'read_preference': ReadPreference.PRIMARY_PREFERRED}
-            if primary:
-                args['replicaset'] = "Vulture"
-            self.db = MongoClient(**args)
+            self.db = get_client(host, replicaset="Vulture" if primary else None)
         except Exception as e:
             logger.error("connect: Error during mongoDB connexion: {}".format(str(e)), exc_info=1)
             return False
@@ -0,0 +1,92 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Targeted updates of per-node status fields'
+
+
+from django.conf import settings
+from toolkit.mongodb.mongo_base import MongoBase
+from pymongo import UpdateOne
+
+import logging
+logger = logging.getLogger('system')
+
+
+# Database of the djongo models
+MODELS_DATABASE = settings.DATABASES['default']['NAME']
+
+
+class StatusUpdater:
+    """
+    Batch of updates of the "status" DictField ({node_name: status}) of models instances
+      (Frontend, Backend, FilterPolicy, ...).
+    Only status.<node_name> is written with a $set, with one bulk_write per collection :
+      the rest of the document (ex: rendered configuration) is neither rewritten nor overwritten,
+      and nodes do not overwrite the status of each other.
+    """
+
+    def __init__(self, mongo=None):
+        self.mongo = mongo or MongoBase()
+        # { model: [UpdateOne, ...] }
+        self.requests = {}
+
+    def _add(self, obj, update):
+        pk = obj._meta.pk
+        self.requests.setdefault(type(obj), []).append(UpdateOne({pk.column: obj.pk}, update))
+
+    def set(self, obj, node_name, status):
+        """ Queue the update of the status of obj on node_name, if it changed
+        :return: True if an update has been queued
+        """
+        if obj.status.get(node_name) == status:
+            return False
+        obj.status[node_name] = status
+        if "." in node_name:
+            # A dotted key cannot be used as a path : fallback on the whole dict
+            self._add(obj, {'$set': {'status': dict(obj.status)}})
+        else:
+            self._add(obj, {'$set': {'status.{}'.format(node_name): status}})
+        return True
+
+    def unset(self, obj, node_name):
+        """ Queue the removal of the status of obj on node_name, if any
+        :return: True if an update has been queued
+        """
+        if node_name not in obj.status:
+            return False
+        obj.status.pop(node_name)
+        if "." in node_name:
+            self._add(obj, {'$set': {'status': dict(obj.status)}})
+        else:
+            self._add(obj, {'$unset': {'status.{}'.format(node_name): ""}})
+        return True
+
+    def flush(self):
+        """ Send the queued updates
+        :return: False if one of the bulk writes failed
+        """
+        result = True
+        for model, requests in self.requests.items():
+            logger.debug("StatusUpdater: {} status update(s) of {}".format(len(requests), model.__name__))
+            result &= self.mongo.bulk_write(MODELS_DATABASE, model._meta.db_table, requests)
+        self.requests = {}
+        return result
@@ -0,0 +1,98 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'Tests of the targeted status updates'
+
+
+# Django system imports
+from django.test import SimpleTestCase
+
+# Django project imports
+from toolkit.mongodb.status import MODELS_DATABASE, StatusUpdater
+
+# Extern modules imports
+from pymongo import UpdateOne
+from types import SimpleNamespace
+
+
+class Frontend:
+    """ Model instance with a per-node status, as read by the monitor """
+    _meta = SimpleNamespace(pk=SimpleNamespace(column="id"), db_table="services_frontend")
+
+    def __init__(self, pk, status):
+        self.pk = pk
+        self.status = status
+
+
+class MongoBase:
+    """ Records the bulk writes instead of sending them """
+
+    def __init__(self):
+        self.writes = []
+
+    def bulk_write(self, database, collection, requests):
+        self.writes.append((database, collection, requests))
+        return True
+
+
+class StatusUpdaterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.mongo = MongoBase()
+        self.updater = StatusUpdater(self.mongo)
+
+    def test_unchanged_status_is_not_written(self):
+        frontend = Frontend(1, {'node-1': "OPEN"})
+
+        self.assertFalse(self.updater.set(frontend, "node-1", "OPEN"))
+        self.assertFalse(self.updater.unset(frontend, "node-2"))
+        self.assertTrue(self.updater.flush())
+        self.assertEqual(self.mongo.writes, [])
+
+    def test_only_the_node_status_is_written(self):
+        opened = Frontend(1, {'node-1': "STOP", 'node-2': "OPEN"})
+        stopped = Frontend(2, {'node-1': "OPEN"})
+
+        self.assertTrue(self.updater.set(opened, "node-1", "OPEN"))
+        self.assertTrue(self.updater.unset(stopped, "node-1"))
+        self.assertTrue(self.updater.flush())
+        self.assertEqual(self.mongo.writes, [(MODELS_DATABASE, "services_frontend", [
+            UpdateOne({'id': 1}, {'$set': {'status.node-1': "OPEN"}}),
+            UpdateOne({'id': 2}, {'$unset': {'status.node-1': ""}})
+        ])])
+        self.assertEqual(opened.status, {'node-1': "OPEN", 'node-2': "OPEN"})
+        self.assertEqual(stopped.status, {})
+
+    def test_dotted_node_name(self):
+        frontend = Frontend(1, {'node-2': "OPEN"})
+
+        self.updater.set(frontend, "node-1.vulture.local", "STOP")
+        self.updater.flush()
+        self.assertEqual(self.mongo.writes[0][2], [
+            UpdateOne({'id': 1}, {'$set': {'status': {'node-2': "OPEN", 'node-1.vulture.local': "STOP"}}})
+        ])
+
+    def test_flush_empties_the_batch(self):
+        self.updater.set(Frontend(1, {}), "node-1", "OPEN")
+        self.updater.flush()
+        self.updater.flush()
+        self.assertEqual(len(self.mongo.writes), 1)
@@ -0,0 +1,179 @@
+#!/home/vlt-os/env/bin/python
+"""This file is part of Vulture OS.
+
+Vulture OS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Vulture OS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Vulture OS.  If not, see http://www.gnu.org/licenses/.
+"""
+__author__ = "Vulture OS"
+__credits__ = []
+__license__ = "GPLv3"
+__version__ = "4.0.0"
+__maintainer__ = "Vulture OS"
+__email__ = "contact@vultureproject.org"
+__doc__ = 'In-process enumeration of network interfaces, with getifaddrs(3)'
+
+
+# Extern modules imports
+from ctypes import (CDLL, POINTER, Structure, byref, c_char_p, c_uint, c_uint8, c_uint16, c_uint32,
+                    c_uint64, c_void_p, cast, get_errno, string_at)
+from ctypes.util import find_library
+from socket import AF_INET, AF_INET6, inet_ntop
+from sys import platform
+
+# Logger configuration imports
+import logging
+logger = logging.getLogger('system')
+
+
+# BSD sockaddr starts with its length, Linux ones do not
+BSD_SOCKADDR = not platform.startswith("linux")
+# Family of the entry holding the counters of the interface
+if BSD_SOCKADDR:
+    AF_LINK = 18
+else:
+    AF_LINK = 17  # AF_PACKET
+
+
+class sockaddr(Structure):
+    if BSD_SOCKADDR:
+        _fields_ = [('sa_len', c_uint8), ('sa_family', c_uint8)]
+    else:
+        _fields_ = [('sa_family', c_uint16)]
+
+
+class ifaddrs(Structure):
+    pass
+
+
+ifaddrs._fields_ = [
+    ('ifa_next', POINTER(ifaddrs)),
+    ('ifa_name', c_char_p),
+    ('ifa_flags', c_uint),
+    ('ifa_addr', POINTER(sockaddr)),
+    ('ifa_netmask', POINTER(sockaddr)),
+    # Broadcast address, or destination address of point-to-point interfaces
+    ('ifa_dstaddr', POINTER(sockaddr)),
+    ('ifa_data', c_void_p)
+]
+
+
+class if_data(Structure):
+    """ struct if_data of FreeBSD >= 11, pointed by ifa_data of AF_LINK entries """
+    _fields_ = [
+        ('ifi_type', c_uint8), ('ifi_physical', c_uint8), ('ifi_addrlen', c_uint8), ('ifi_hdrlen', c_uint8),
+        ('ifi_link_state', c_uint8), ('ifi_vhid', c_uint8), ('ifi_datalen', c_uint16),
+        ('ifi_mtu', c_uint32), ('ifi_metric', c_uint32), ('ifi_baudrate', c_uint64),
+        ('ifi_ipackets', c_uint64), ('ifi_ierrors', c_uint64), ('ifi_opackets', c_uint64),
+        ('ifi_oerrors', c_uint64), ('ifi_collisions', c_uint64), ('ifi_ibytes', c_uint64),
+        ('ifi_obytes', c_uint64)
+    ]
+
+
+class rtnl_link_stats(Structure):
+    """ struct rtnl_link_stats of Linux, pointed by ifa_data of AF_PACKET entries """
+    _fields_ = [
+        ('rx_packets', c_uint32), ('tx_packets', c_uint32), ('rx_bytes', c_uint32), ('tx_bytes', c_uint32),
+        ('rx_errors', c_uint32), ('tx_errors', c_uint32)
+    ]
+
+
+# Offset of the address in sockaddr_in and sockaddr_in6 (after family and port, and flowinfo for IPv6)
+ADDRESS_OFFSETS = {
+    AF_INET: (4, 4),
+    AF_INET6: (8, 16)
+}
+
+# IFF_UP and IFF_POINTOPOINT have the same value on FreeBSD and Linux
+IFF_UP = 0x1
+IFF_POINTOPOINT = 0x10
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = CDLL(find_library("c"), use_errno=True)
+        _libc.getifaddrs.argtypes = [POINTER(POINTER(ifaddrs))]
+        _libc.freeifaddrs.argtypes = [POINTER(ifaddrs)]
+    return _libc
+
+
+def _address(addr):
+    """ Textual address of a sockaddr, None if it is not an IPv4/IPv6 one """
+    if not addr:
+        return None
+    family = addr.contents.sa_family
+    if family not in ADDRESS_OFFSETS:
+        return None
+    offset, length = ADDRESS_OFFSETS[family]
+    return inet_ntop(family, string_at(cast(addr, c_void_p).value + offset, length))
+
+
+def _counters(data):
+    """ Traffic counters of an AF_LINK (AF_PACKET) entry """
+    if not data:
+        return {}
+    if BSD_SOCKADDR:
+        stats = cast(data, POINTER(if_data)).contents
+        return {'ibytes': stats.ifi_ibytes, 'obytes': stats.ifi_obytes,
+                'ipackets': stats.ifi_ipackets, 'opackets': stats.ifi_opackets,
+                'ierrors': stats.ifi_ierrors, 'oerrors': stats.ifi_oerrors}
+    stats = cast(data, POINTER(rtnl_link_stats)).contents
+    return {'ibytes': stats.rx_bytes, 'obytes': stats.tx_bytes,
+            'ipackets': stats.rx_packets, 'opackets': stats.tx_packets,
+            'ierrors': stats.rx_errors, 'oerrors': stats.tx_errors}
+
+
+def get_interfaces(prefix=None):
+    """ Enumerate network interfaces, their addresses and their counters with one getifaddrs call
+    :param prefix: Only return the interfaces whose name starts with it, ex: "tun"
+    :return: Dict {name: {up, addresses: [{family, address, netmask, destination}, ...],
+                          ibytes, obytes, ipackets, opackets, ierrors, oerrors}}
+    Raise OSError if getifaddrs fails
+    """
+    libc = _get_libc()
+    head = POINTER(ifaddrs)()
+    if libc.getifaddrs(byref(head)) != 0:
+        errno = get_errno()
+        raise OSError(errno, "getifaddrs failed")
+
+    result = {}
+    try:
+        entry = head
+        while entry:
+            ifa = entry.contents
+            entry = ifa.ifa_next
+            name = ifa.ifa_name.decode('utf8')
+            if prefix and not name.startswith(prefix):
+                continue
+
+            interface = result.setdefault(name, {'up': bool(ifa.ifa_flags & IFF_UP), 'addresses': []})
+            if not ifa.ifa_addr:
+                continue
+            family = ifa.ifa_addr.contents.sa_family
+            if family == AF_LINK:
+                interface.update(_counters(ifa.ifa_data))
+            elif family in ADDRESS_OFFSETS:
+                address = {
+                    'family': "inet" if family == AF_INET else "inet6",
+                    'address': _address(ifa.ifa_addr),
+                    'netmask': _address(ifa.ifa_netmask)
+                }
+                if ifa.ifa_flags & IFF_POINTOPOINT:
+                    address['destination'] = _address(ifa.ifa_dstaddr)
+                interface['addresses'].append(address)
+    finally:
+        libc.freeifaddrs(head)
+
+    return result
@@ -23,26 +23,66 @@ __email__ = "contact@vultureproject.org"
 __doc__ = 'System Utils Redis Toolkit'
 
 
-from redis import Redis
+from redis import ConnectionPool, Redis, UnixDomainSocketConnection
 from toolkit.network.network import get_hostname
+from threading import Lock
+import os
 
 import logging
 logger = logging.getLogger('debug')
 
 
+REDIS_SOCKET = '/var/sockets/redis/redis.sock'
+
+# Process-wide connection pools, keyed by (node, port) - (None, None) is the local unix socket
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = Lock()
+
+
+def reset_pools():
+    """ Forget the connection pools of the parent process, after a fork """
+    global _pools, _pools_pid, _pools_lock
+    _pools = {}
+    _pools_pid = os.getpid()
+    _pools_lock = Lock()
+
+
+os.register_at_fork(after_in_child=reset_pools)
+
+
+def get_pool(node=None, port=None):
+    """ Return the shared connection pool of the given node, or of the local unix socket.
+    Connections are opened when a command is sent, and dropped by the pool if broken
+    :param node: Hostname or IP address, None for the local unix socket
+    :param port: TCP port, default 6379
+    :return: ConnectionPool
+    """
+    if _pools_pid != os.getpid():
+        reset_pools()
+
+    key = (node, port)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            if node:
+                pool = ConnectionPool(host=node, port=port or 6379, socket_connect_timeout=1.0)
+            else:
+                pool = ConnectionPool(connection_class=UnixDomainSocketConnection, path=REDIS_SOCKET,
+                                      socket_connect_timeout=1.0)
+            _pools[key] = pool
+
+    return pool
+
+
 class RedisBase:
 
     def __init__(self, node=None, port=None):
         self.port = port
         self.node = node
-        self.db = '/var/sockets/redis/redis.sock'
+        self.db = REDIS_SOCKET
 
-        if node and port:
-            self.redis = Redis(host=node, port=port, socket_connect_timeout=1.0)
-        elif node:
-            self.redis = Redis(host=node, socket_connect_timeout=1.0)
-        else:
-            self.redis = Redis(unix_socket_path=self.db, socket_connect_timeout=1.0)
+        self.redis = Redis(connection_pool=get_pool(node, port))
 
     def get_master(self, node=None):
         """ return the master node of the redis cluster or query the given node
@@ -51,7 +91,7 @@ class RedisBase:
 
         try:
             if node:
-                redis = Redis(host=node, socket_connect_timeout=1.0)
+                redis = Redis(connection_pool=get_pool(node))
             else:
                 redis = self.redis
             redis_info = redis.info()
@@ -37,7 +37,7 @@ import django
 from django.conf import settings
 django.setup()
 
-from system.cluster.models import Cluster
+from system.cluster.models import Cluster, PRIORITY_BACKGROUND
 
 if __name__ == "__main__":
 
@@ -45,7 +45,7 @@ if __name__ == "__main__":
     if not node:
         print("Current node not found. Maybe the cluster has not been initiated yet.")
     else:
-        api_res = node.api_request("services.logrotate.logrotate.reload_conf")
+        api_res = node.api_request("services.logrotate.logrotate.reload_conf", priority=PRIORITY_BACKGROUND)
         if not api_res.get("status"):
             print("Error while building logrotate configuration: {}.".format(api_res.get("message")))
         else:
@@ -352,3 +352,74 @@ DOCUMENTATION_PATH = "/var/db/documentation"
 
 PREDATOR_HOST = "https://predator.vultureproject.org/"
 PREDATOR_VERSION = "v1"
+
+# Cluster daemon: number of MessageQueue actions executed in parallel
+CLUSTER_WORKERS = 4
+# Cluster daemon: time (in seconds) after which a running action is reported as failed
+CLUSTER_ACTION_TIMEOUT = 300
+# Cluster daemon: time (in seconds) after which a background action is not overtaken anymore by interactive ones
+CLUSTER_PRIORITY_AGING = 60
+# Cluster daemon: per-action timeout overrides
+CLUSTER_ACTION_TIMEOUTS = {
+    "gui.crontab.feed.security_update": 1800,
+    "system.zfs.zfs.create_snapshot": 900,
+    "system.zfs.zfs.restore_snapshot": 900,
+    "toolkit.yara.yara.fetch_yara_rules": 900,
+}
+
+# Monitor daemon: number of status collectors executed in parallel
+MONITOR_WORKERS = 16
+# Monitor daemon: time (in seconds) after which a status collector is ignored for the current pass
+MONITOR_COLLECTOR_TIMEOUT = 8
+# Time (in seconds) after which a status command ("service onestatus", admin sockets) is killed
+SERVICE_STATUS_TIMEOUT = 5
+# Time (in seconds) to wait for the Darwin manager to hot update a filter, which may reload its model
+#  Below CLUSTER_ACTION_TIMEOUT, so that the action reports the error of the manager
+DARWIN_UPDATE_FILTER_TIMEOUT = 240
+
+# Reconcile daemon: number of workers consuming the Darwin alerts list on each node
+RECONCILE_WORKERS = 2
+# Reconcile daemon: run the workers on every node, instead of the MongoDB primary only
+RECONCILE_ON_ALL_NODES = False
+# Reconcile daemon: time (in seconds) without report after which the alerts claimed by a worker
+#  are handled by another one
+RECONCILE_WORKER_TIMEOUT = 60
+# Reconcile daemon: MongoDB insertion time (in seconds) above which the workers pause between batches
+RECONCILE_MAX_WRITE_LATENCY = 0.5
+# Reconcile daemon: maximum number of Darwin alerts popped and written at once
+RECONCILE_BATCH_SIZE = 500
+# Reconcile daemon: time (in seconds) between flushes of the alerts log file,
+#  and between pops of the alerts list when no notification is received
+RECONCILE_FLUSH_INTERVAL = 2
+# Reconcile daemon: time (in seconds) during which an alert waits for its context, in the retry sorted set
+RECONCILE_CONTEXT_TIMEOUT = 2
+# Reconcile daemon: time (in seconds) between two checks of the context of a waiting alert
+RECONCILE_RETRY_INTERVAL = 1
+
+# Cache shared by the processes of the GUI on a node (log viewer searches)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/tmp/vulture/cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000
+        }
+    }
+}
+
+# Log viewer: the number of matching logs is not counted beyond this limit
+LOGVIEWER_COUNT_LIMIT = 100000
+# Log viewer: time (in seconds) during which the count and the page cursors of a search are cached
+LOGVIEWER_CACHE_TTL = 60
+# Log viewer: maximum number of page cursors kept for a search
+LOGVIEWER_MAX_CURSORS = 100
+# Log viewer: maximum execution time (in milliseconds) of a search on MongoDB
+LOGVIEWER_MAX_TIME_MS = 30000
+
+# Time (in seconds) during which the cluster topology (MongoDB primary, Redis master) is cached
+CLUSTER_TOPOLOGY_TTL = 10
+
+# Shared MongoClient connection pools (see toolkit.mongodb.mongo_base.get_client)
+MONGO_POOL_SIZE = 20
+MONGO_POOL_IDLE_MS = 60000